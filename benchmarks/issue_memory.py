@@ -0,0 +1,55 @@
+"""
+Memory held by parsed Issue objects.
+
+    PYTHONPATH=. python benchmarks/issue_memory.py [number of issues]
+"""
+import gc
+import sys
+import tracemalloc
+
+import youtrack
+from youtrack.xmlstream import iter_elements
+
+ISSUE = '''<issue id="%(project)s-%(n)d">
+  <field name="projectShortName" xsi:type="SingleField"><value>%(project)s</value></field>
+  <field name="numberInProject" xsi:type="SingleField"><value>%(n)d</value></field>
+  <field name="summary" xsi:type="SingleField"><value>Summary of issue %(n)d</value></field>
+  <field name="created" xsi:type="SingleField"><value>%(created)d</value></field>
+  <field name="updated" xsi:type="SingleField"><value>%(updated)d</value></field>
+  <field name="reporterName" xsi:type="SingleField"><value>user%(reporter)d</value></field>
+  <field name="commentsCount" xsi:type="SingleField"><value>%(comments)d</value></field>
+  <field name="votes" xsi:type="SingleField"><value>0</value></field>
+  <field name="Priority" xsi:type="CustomFieldValue"><value>%(priority)s</value></field>
+  <field name="Type" xsi:type="CustomFieldValue"><value>%(type)s</value></field>
+  <field name="State" xsi:type="CustomFieldValue"><value>%(state)s</value></field>
+  <field name="Subsystem" xsi:type="CustomFieldValue"><value>No subsystem</value></field>
+  <field name="Fix versions" xsi:type="CustomFieldValue"><value>1.0</value><value>2.0</value></field>
+  <field name="Assignee" xsi:type="SingleUserField"><value fullName="User">user%(assignee)d</value></field>
+</issue>
+'''
+
+
+def document(count):
+    body = ''.join(ISSUE % {'project': 'PRJ%d' % (n % 5), 'n': n, 'created': 1500000000000 + n,
+                            'updated': 1500000300000 + n, 'reporter': n % 50, 'comments': n % 7,
+                            'priority': ('Normal', 'Major', 'Critical')[n % 3], 'type': ('Bug', 'Task')[n % 2],
+                            'state': ('Open', 'Fixed', 'In Progress')[n % 3], 'assignee': n % 20}
+                   for n in range(count))
+    return ('<issues xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">%s</issues>' % body).encode('utf-8')
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    content = document(count)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    issues = [youtrack.Issue(e) for e in iter_elements(content)]
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print('%d issues: %.1f MB held, %d bytes per issue' % (len(issues), held / 2 ** 20, held // len(issues)))
+
+
+if __name__ == '__main__':
+    main()
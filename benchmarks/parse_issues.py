@@ -0,0 +1,90 @@
+"""
+Issue construction throughput on a large synthetic <issues> document, before and after single-pass parsing.
+
+    PYTHONPATH=. python benchmarks/parse_issues.py [number of issues]
+"""
+import sys
+import time
+from xml.dom import minidom, Node
+
+import youtrack
+from youtrack.xmlstream import iter_elements
+
+ISSUE = '''<issue id="A-%(n)d">
+  <field name="projectShortName"><value>A</value></field>
+  <field name="numberInProject"><value>%(n)d</value></field>
+  <field name="summary"><value>Summary of issue %(n)d</value></field>
+  <field name="description"><value>%(description)s</value></field>
+  <field name="created"><value>1500000000000</value></field>
+  <field name="updated"><value>1500000300000</value></field>
+  <field name="reporterName"><value>root</value></field>
+  <field name="Priority" xsi:type="CustomFieldValue"><value>Normal</value></field>
+  <field name="State" xsi:type="CustomFieldValue"><value>Open</value></field>
+  <field name="Fix versions" xsi:type="CustomFieldValue"><value>1.0</value><value>2.0</value></field>
+  <field name="Assignee" xsi:type="SingleUserField"><value fullName="John">john</value></field>
+  <field name="commentsCount"><value>2</value></field>
+  <comment id="1-%(n)d" author="root" text="first comment"/>
+  <comment id="2-%(n)d" author="john" text="second comment"/>
+  <links><issueLink typeName="Depend" source="A-%(n)d" target="A-1"/></links>
+  <attachments><fileUrl url="/_persistent/%(n)d.png" name="%(n)d.png"/></attachments>
+  <tag cssClass="c1">Star</tag>
+  <tag cssClass="c2">later</tag>
+</issue>
+'''
+
+
+class LegacyIssue(youtrack.Issue):
+    """ Issue construction as it was before single-pass parsing """
+
+    def _update(self, xml):
+        youtrack.YouTrackObject._update(self, xml)
+        if len(xml.getElementsByTagName('links')) > 0:
+            self.links = [youtrack.Link(e, self.youtrack) for e in xml.getElementsByTagName('issueLink')]
+        else:
+            self.links = None
+        if len(xml.getElementsByTagName('tag')) > 0:
+            self.tags = [self._text(e) for e in xml.getElementsByTagName('tag')]
+        else:
+            self.tags = None
+        if len(xml.getElementsByTagName('attachments')) > 0:
+            self.attachments = [youtrack.Attachment(e, self.youtrack) for e in xml.getElementsByTagName('fileUrl')]
+        else:
+            self.attachments = None
+
+    def _update_from_children(self, el):
+        for c in [e for e in el.childNodes if e.nodeType == Node.ELEMENT_NODE]:
+            self._update_field(c)
+
+
+def document(count):
+    body = ''.join(ISSUE % {'n': n, 'description': 'text ' * 50} for n in range(count))
+    return ('<issues xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">%s</issues>' % body).encode('utf-8')
+
+
+def measure(name, func, content, count):
+    start = time.perf_counter()
+    issues = func(content)
+    elapsed = time.perf_counter() - start
+    print('%-40s %8.0f issues/s' % (name, count / elapsed))
+    return issues
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    content = document(count)
+    print('%d issues, %.1f MB' % (count, len(content) / 2 ** 20))
+
+    def dom_children(c):
+        return [e for e in minidom.parseString(c).documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+
+    measure('legacy: minidom + repeated subtree walks', lambda c: [LegacyIssue(e) for e in dom_children(c)],
+            content, count)
+    measure('minidom + single pass', lambda c: [youtrack.Issue(e) for e in dom_children(c)], content, count)
+    measure('iter_elements + single pass', lambda c: [youtrack.Issue(e) for e in iter_elements(c)], content, count)
+    elements = dom_children(content)
+    measure('construction only, legacy', lambda c: [LegacyIssue(e) for e in elements], content, count)
+    measure('construction only, single pass', lambda c: [youtrack.Issue(e) for e in elements], content, count)
+
+
+if __name__ == '__main__':
+    main()
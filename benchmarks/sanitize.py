@@ -0,0 +1,48 @@
+"""
+Cost of response sanitization per MB, before and after the precompiled bytes-level stage.
+
+    PYTHONPATH=. python benchmarks/sanitize.py
+"""
+import re
+import timeit
+
+from youtrack.xmlstream import sanitize, iter_sanitized
+
+
+def legacy_sanitize(content):
+    # sanitization as previously done in Connection._req for every response
+    content = content.translate(None, '\0'.encode('utf-8'))
+    _illegal_unichrs = [(0x00, 0x08), (0x0B, 0x0C), (0x0E, 0x1F),
+                        (0x7F, 0x84), (0x86, 0x9F), (0xFDD0, 0xFDDF),
+                        (0xFFFE, 0xFFFF)]
+    _illegal_ranges = ["%s-%s" % (chr(low), chr(high))
+                       for (low, high) in _illegal_unichrs]
+    _illegal_xml_chars_re = re.compile('[%s]' % ''.join(_illegal_ranges))
+    return re.sub(_illegal_xml_chars_re, '', content.decode('utf-8')).encode('utf-8')
+
+
+def body(size_mb, dirty):
+    issue = ('<issue id="A-1"><field name="summary"><value>Привет, summary %s</value></field>'
+             '<field name="description"><value>%s</value></field></issue>')
+    one = issue % ('\x07' if dirty else '', 'text ' * 40)
+    return ('<issues>' + one * (size_mb * 2 ** 20 // len(one.encode())) + '</issues>').encode('utf-8')
+
+
+def measure(name, func, content, number=5):
+    seconds = min(timeit.repeat(lambda: func(content), number=number, repeat=3)) / number
+    print('%-32s %8.2f ms/MB' % (name, seconds * 1000 * 2 ** 20 / len(content)))
+
+
+def main():
+    for dirty in (False, True):
+        content = body(8, dirty)
+        print('%s body, %.1f MB' % ('dirty' if dirty else 'clean', len(content) / 2 ** 20))
+        measure('  legacy', legacy_sanitize, content)
+        measure('  sanitize', sanitize, content)
+        measure('  sanitize (json)', lambda c: sanitize(c, 'application/json'), content)
+        chunks = [content[i:i + 2 ** 16] for i in range(0, len(content), 2 ** 16)]
+        measure('  iter_sanitized, 64K chunks', lambda c: b''.join(iter_sanitized(chunks)), content)
+
+
+if __name__ == '__main__':
+    main()
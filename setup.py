@@ -95,6 +95,14 @@ setup(
     install_requires=[
         'httplib2',
     ],
+    extras_require={
+        'async': [
+            'aiohttp',
+        ],
+        'numpy': [
+            'numpy',
+        ],
+    },
     setup_requires=[
     ],
     tests_require=[
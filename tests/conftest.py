@@ -0,0 +1,56 @@
+import threading
+import urllib.parse
+
+import httplib2
+import pytest
+
+from youtrack.connection import Connection
+
+
+class FakeTransport:
+    """ Stands in for HttpPool, answers requests from handlers registered per path """
+
+    def __init__(self):
+        self.handlers = {}
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def route(self, method, path, handler):
+        """ handler is a bytes body or a callable(query, body, headers) returning (status, body[, headers]) """
+        self.handlers[(method, path)] = handler
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        url = urllib.parse.urlsplit(uri)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        with self._lock:
+            self.requests.append((method, url.path, query))
+        handler = self.handlers.get((method, url.path))
+        if handler is None:
+            return httplib2.Response({'status': '404', 'content-type': 'text/html'}), b'not found'
+        if callable(handler):
+            result = handler(query, body, headers or {})
+        else:
+            result = (200, handler)
+        status, content = result[:2]
+        info = {'status': str(status), 'content-type': 'application/xml; charset=UTF-8'}
+        if len(result) > 2:
+            info.update(result[2])
+        return httplib2.Response(info), content
+
+    def count(self, method, path):
+        return len([r for r in self.requests if r[0] == method and r[1] == path])
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def transport():
+    return FakeTransport()
+
+
+@pytest.fixture
+def connection(transport):
+    connection = Connection('http://youtrack.local', api_key='key')
+    connection.http = transport
+    return connection
@@ -0,0 +1,148 @@
+import asyncio
+import re
+from xml.dom import minidom
+
+import pytest
+from hamcrest import assert_that, is_, equal_to, instance_of, less_than_or_equal_to, same_instance
+
+import youtrack
+
+aiohttp = pytest.importorskip('aiohttp')
+web = pytest.importorskip('aiohttp.web')
+
+from youtrack.aio import AsyncConnection  # noqa: E402
+
+ISSUE = '<issue id="%s"><field name="summary"><value>Summary of %s</value></field></issue>'
+
+
+class FakeServer:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.users = 0
+        self.imports = 0
+
+    async def issue(self, request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        _id = request.match_info['id']
+        if _id == 'MISSING-1':
+            return web.Response(status=404, text='<error>Issue not found.</error>', content_type='application/xml')
+        return web.Response(text=ISSUE % (_id, _id), content_type='application/xml')
+
+    async def comments(self, request):
+        return web.Response(text='<comments><comment id="1" author="root" text="hi"/></comments>',
+                            content_type='application/xml')
+
+    async def file(self, request):
+        return web.Response(body=b'content of ' + request.match_info['name'].encode())
+
+    async def timetracking(self, request):
+        return web.Response(text='<settings enabled="false"/>', content_type='application/xml')
+
+    async def import_issues(self, request):
+        body = await request.read()
+        self.imports += 1
+        if b'poison' in body:
+            return web.Response(status=400, text='', content_type='text/plain')
+        items = ''.join('<item id="%s" imported="true"/>' % n.decode()
+                        for n in re.findall(rb'name="numberInProject">\s*<value>(\d+)', body))
+        return web.Response(text='<importResult>%s</importResult>' % items, content_type='application/xml')
+
+    async def user(self, request):
+        self.users += 1
+        await asyncio.sleep(0.01)
+        return web.Response(text='<user login="%s"/>' % request.match_info['login'], content_type='application/xml')
+
+    async def run(self, coro_factory):
+        app = web.Application()
+        app.router.add_get('/rest/admin/user/{login}', self.user)
+        app.router.add_get('/rest/issue/{id}', self.issue)
+        app.router.add_get('/rest/issue/{id}/comment', self.comments)
+        app.router.add_get('/_persistent/{name}', self.file)
+        app.router.add_get('/rest/admin/project/{id}/timetracking', self.timetracking)
+        app.router.add_put('/rest/import/{id}/issues', self.import_issues)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await coro_factory('http://127.0.0.1:%d' % port)
+        finally:
+            await runner.cleanup()
+
+
+class TestAsyncConnection:
+    def test_bounded_concurrent_get_issue(self):
+        server = FakeServer()
+
+        async def scenario(url):
+            async with AsyncConnection(url, api_key='key', max_concurrency=5) as yt:
+                return await asyncio.gather(*[yt.get_issue('A-%d' % i) for i in range(30)])
+
+        issues = asyncio.run(server.run(scenario))
+        assert_that(len(issues), is_(equal_to(30)))
+        assert_that(issues[7], is_(instance_of(youtrack.Issue)))
+        assert_that(issues[7]['summary'], is_(equal_to('Summary of A-7')))
+        assert_that(server.max_in_flight, is_(less_than_or_equal_to(5)))
+
+    def test_get_comments(self):
+        async def scenario(url):
+            async with AsyncConnection(url, api_key='key') as yt:
+                return await yt.get_comments('A-1')
+
+        comments = asyncio.run(FakeServer().run(scenario))
+        assert_that(comments[0]['author'], is_(equal_to('root')))
+
+    def test_error_status(self):
+        async def scenario(url):
+            async with AsyncConnection(url, api_key='key') as yt:
+                return await yt.get_issue('MISSING-1')
+
+        with pytest.raises(youtrack.YouTrackException):
+            asyncio.run(FakeServer().run(scenario))
+
+    def test_model_helpers_resolve_users(self):
+        server = FakeServer()
+
+        async def scenario(url):
+            async with AsyncConnection(url, api_key='key') as yt:
+                comments = await yt.get_comments('A-1')
+                authors = await asyncio.gather(*[comments[0].get_author() for _ in range(5)])
+                return authors, await yt.identities.user_list(['root'])
+
+        authors, users = asyncio.run(server.run(scenario))
+        assert_that(authors[0]['login'], is_(equal_to('root')))
+        assert_that(users[0], is_(same_instance(authors[4])))
+        assert_that(server.users, is_(equal_to(1)))
+
+    def test_model_helpers_awaited_twice(self):
+        async def scenario(url):
+            async with AsyncConnection(url, api_key='key') as yt:
+                issue = await yt.get_issue('A-1')
+                first, second = await issue.get_comments(), await issue.get_comments()
+                attachment = youtrack.Attachment(
+                    minidom.parseString(b'<fileUrl id="1-1" name="shot.png" url="http://host/_persistent/shot.png"/>'),
+                    yt)
+                return first, second, await attachment.get_content()
+
+        first, second, content = asyncio.run(FakeServer().run(scenario))
+        assert_that(second, is_(same_instance(first)))
+        assert_that(first[0]['author'], is_(equal_to('root')))
+        assert_that(content, is_(equal_to(b'content of shot.png')))
+
+    def test_import_issues_bisects_rejected_batches(self):
+        server = FakeServer()
+        issues = [{'numberInProject': str(n), 'summary': 'poison' if n == 3 else 'ok'} for n in range(1, 9)]
+
+        async def scenario(url):
+            async with AsyncConnection(url, api_key='key') as yt:
+                return await yt.import_issues('A', 'devs', issues)
+
+        response = asyncio.run(server.run(scenario))
+        assert_that(response.count('imported="true"'), is_(equal_to(7)))
+        # 1 + 2 halves + 2 quarters + 2 single issues
+        assert_that(server.imports, is_(equal_to(7)))
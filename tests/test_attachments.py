@@ -0,0 +1,212 @@
+import hashlib
+import http.server
+import json
+import os
+import threading
+from xml.dom import minidom
+
+import pytest
+from hamcrest import assert_that, is_, equal_to, instance_of
+
+import youtrack
+from youtrack.attachments import AttachmentDownloader, AttachmentMigration
+from youtrack.blobs import BlobStore
+from youtrack.connection import Connection
+from youtrack.multipart import MultipartBody
+from youtrack.transport import HttpPool
+
+FILES = {'/_persistent/log.txt': os.urandom(200000), '/_persistent/shot.png': os.urandom(5000)}
+FILES['/_persistent/unsized/log.txt'] = FILES['/_persistent/log.txt']
+FILES['/_persistent/unsized/shot.png'] = FILES['/_persistent/shot.png']
+FILES['/_persistent/from0/log.txt'] = FILES['/_persistent/log.txt']
+
+
+class Files(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('Range')))
+        data = FILES.get(self.path.split('?')[0])
+        if data is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/_persistent/unsized/'):
+            # no Content-Length, the body ends when the connection is closed
+            self.send_response(200)
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(data)
+            self.close_connection = True
+            return
+        start = 0
+        if self.headers.get('Range'):
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%d' % len(data))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if self.path.startswith('/_persistent/from0/'):
+                # a range the client didn't ask for
+                start = 0
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, len(data) - 1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Files.requests = []
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Files)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d' % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def attachment(_id, url):
+    return youtrack.Attachment(minidom.parseString(
+        ('<fileUrl id="%s" name="%s" url="http://host%s"/>' % (_id, url.rsplit('/', 1)[1], url)).encode()))
+
+
+class TestStream:
+    def test_stream_outliving_close(self, server):
+        pool = HttpPool(pool_size=2)
+        with pool.stream(server + '/_persistent/shot.png') as response:
+            pool.close()
+            assert_that(response.read(), is_(equal_to(FILES['/_persistent/shot.png'])))
+        assert_that(pool._streams, is_(equal_to({})))
+
+
+class TestAttachmentDownloader:
+    def test_download_resume_and_manifest(self, server, tmp_path):
+        connection = Connection(server, api_key='key', pool_size=2)
+        attachments = [attachment('1-1', '/_persistent/log.txt'), attachment('1-2', '/_persistent/shot.png'),
+                       attachment('1-3', '/_persistent/missing.txt')]
+        data = FILES['/_persistent/log.txt']
+        (tmp_path / '1-1-log.txt.part').write_bytes(data[:70000])
+
+        result = AttachmentDownloader(connection, str(tmp_path), max_workers=2, chunk_size=8192).download(attachments)
+        assert_that((result.resumed, result.downloaded, list(result.failed)),
+                    is_(equal_to((['1-1'], ['1-2'], ['1-3']))))
+        assert_that((tmp_path / '1-1-log.txt').read_bytes(), is_(equal_to(data)))
+        assert_that(('/_persistent/log.txt', 'bytes=70000-') in Files.requests, is_(equal_to(True)))
+        manifest = json.loads((tmp_path / 'manifest.json').read_text())
+        assert_that(manifest['1-1'], is_(equal_to({'path': '1-1-log.txt', 'size': len(data),
+                                                   'sha256': hashlib.sha256(data).hexdigest(),
+                                                   'url': '/_persistent/log.txt'})))
+
+        again = AttachmentDownloader(connection, str(tmp_path)).download(attachments[:2])
+        assert_that(sorted(again.skipped), is_(equal_to(['1-1', '1-2'])))
+
+    def test_stale_part_files_start_over(self, server, tmp_path):
+        connection = Connection(server, api_key='key', pool_size=2)
+        data = FILES['/_persistent/log.txt']
+        # longer than the content, and resumed from an offset the server doesn't honour
+        (tmp_path / '1-1-shot.png.part').write_bytes(os.urandom(6000))
+        (tmp_path / '1-2-log.txt.part').write_bytes(data[:70000])
+        attachments = [attachment('1-1', '/_persistent/shot.png'), attachment('1-2', '/_persistent/from0/log.txt')]
+
+        result = AttachmentDownloader(connection, str(tmp_path)).download(attachments)
+        assert_that(sorted(result.downloaded), is_(equal_to(['1-1', '1-2'])))
+        assert_that((tmp_path / '1-1-shot.png').read_bytes(), is_(equal_to(FILES['/_persistent/shot.png'])))
+        assert_that((tmp_path / '1-2-log.txt').read_bytes(), is_(equal_to(data)))
+
+    def test_same_attachment_listed_twice(self, server, tmp_path):
+        connection = Connection(server, api_key='key', pool_size=4)
+        attachments = [attachment('1-1', '/_persistent/log.txt') for _ in range(4)]
+        result = AttachmentDownloader(connection, str(tmp_path), max_workers=4, chunk_size=4096).download(attachments)
+        assert_that(result.ok, is_(equal_to(True)))
+        assert_that((tmp_path / '1-1-log.txt').read_bytes(), is_(equal_to(FILES['/_persistent/log.txt'])))
+
+
+class TestAttachmentMigration:
+    def test_migrate_overlaps_and_caches_issue_created(self, server, transport, connection):
+        source = Connection(server, api_key='key', pool_size=2)
+        items = [('B-1', attachment('1-1', '/_persistent/log.txt')),
+                 ('B-1', attachment('1-2', '/_persistent/shot.png')),
+                 ('B-2', attachment('2-1', '/_persistent/shot.png')), ('B-2', attachment('2-2', '/_persistent/gone'))]
+        received = []
+
+        def upload(issue_id):
+            def handler(query, body, headers):
+                received.append((issue_id, query['created'], b''.join(bytes(c) for c in body)))
+                return 200, b''
+            return handler
+
+        for issue_id in ('B-1', 'B-2'):
+            transport.route('GET', '/rest/issue/' + issue_id, b'<issue id="%s"><field name="created">'
+                            b'<value>1500000000000</value></field></issue>' % issue_id.encode())
+            transport.route('POST', '/rest/import/%s/attachment' % issue_id, upload(issue_id))
+
+        migration = AttachmentMigration(source, connection, download_workers=2, upload_workers=2,
+                                        max_buffered_bytes=100000)
+        result = migration.migrate(items)
+
+        assert_that(sorted(result.migrated), is_(equal_to([('B-1', '1-1'), ('B-1', '1-2'), ('B-2', '2-1')])))
+        assert_that(list(result.failed), is_(equal_to([('B-2', '2-2')])))
+        assert_that(result.bytes, is_(equal_to(200000 + 2 * 5000)))
+        assert_that(migration.budget.used, is_(equal_to(0)))
+        assert_that((transport.count('GET', '/rest/issue/B-1'), transport.count('GET', '/rest/issue/B-2')),
+                    is_(equal_to((1, 1))))
+        log = [body for issue_id, created, body in received if created == '1500000000000' and len(body) > 200000]
+        assert_that(FILES['/_persistent/log.txt'] in log[0], is_(equal_to(True)))
+
+
+class TestSpilledDownloads:
+    def test_content_past_the_budget_is_spilled(self, server, connection):
+        source = Connection(server, api_key='key')
+        migration = AttachmentMigration(source, connection, max_buffered_bytes=50000)
+        small, _ = migration.download(attachment('1-1', '/_persistent/unsized/shot.png'))
+        assert_that((small, migration.budget.used), is_(equal_to((FILES['/_persistent/shot.png'], 5000))))
+        large, _ = migration.download(attachment('1-2', '/_persistent/unsized/log.txt'))
+        assert_that(large, is_(instance_of(MultipartBody)))
+        assert_that((large.length, migration.budget.used), is_(equal_to((200000, 5000))))
+        assert_that(large.fileobj.read(), is_(equal_to(FILES['/_persistent/log.txt'])))
+        large.close()
+
+    def test_sized_content_past_the_budget_is_spilled(self, server, connection):
+        source = Connection(server, api_key='key')
+        migration = AttachmentMigration(source, connection, max_buffered_bytes=50000)
+        large, _ = migration.download(attachment('1-1', '/_persistent/log.txt'))
+        assert_that(large, is_(instance_of(MultipartBody)))
+        assert_that((large.length, migration.budget.used), is_(equal_to((200000, 0))))
+        assert_that(large.fileobj.read(), is_(equal_to(FILES['/_persistent/log.txt'])))
+        large.close()
+
+
+class TestBlobStoreTransfers:
+    def test_download_fetches_each_url_once(self, server, tmp_path):
+        connection = Connection(server, api_key='key', pool_size=2)
+        store = BlobStore(str(tmp_path / 'blobs'))
+        attachments = [attachment('1-%d' % i, '/_persistent/log.txt') for i in range(4)]
+        result = AttachmentDownloader(connection, str(tmp_path / 'files'), store=store).download(attachments)
+        assert_that((len(result.downloaded), len(result.deduplicated)), is_(equal_to((1, 3))))
+        assert_that(len(Files.requests), is_(equal_to(1)))
+        assert_that((tmp_path / 'files' / '1-3-log.txt').read_bytes(), is_(equal_to(FILES['/_persistent/log.txt'])))
+
+    def test_migration_uploads_from_store(self, server, transport, connection, tmp_path):
+        source = Connection(server, api_key='key')
+        received = []
+        for issue_id in ('B-1', 'B-2', 'B-3'):
+            transport.route('POST', '/rest/import/%s/attachment' % issue_id,
+                            lambda q, body, h: received.append(b''.join(bytes(c) for c in body)) or (200, b''))
+        items = [(issue_id, attachment(issue_id, '/_persistent/shot.png')) for issue_id in ('B-1', 'B-2', 'B-3')]
+        for issue_id, a in items:
+            a['created'] = '1500000000000'
+
+        result = AttachmentMigration(source, connection, store=BlobStore(str(tmp_path))).migrate(items)
+        assert_that((len(result.migrated), len(result.deduplicated)), is_(equal_to((3, 2))))
+        assert_that(len(Files.requests), is_(equal_to(1)))
+        assert_that(all(FILES['/_persistent/shot.png'] in body for body in received), is_(equal_to(True)))
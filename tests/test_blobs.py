@@ -0,0 +1,52 @@
+import hashlib
+import os
+import threading
+
+from hamcrest import assert_that, is_, equal_to
+
+from youtrack.blobs import BlobStore
+
+
+class TestBlobStore:
+    def test_identical_content_is_stored_once(self, tmp_path):
+        store = BlobStore(str(tmp_path))
+        first = store.fetch('/a', lambda f: f.write(b'log') and 'text/plain')
+        second = store.fetch('/b', lambda f: f.write(b'log') and 'text/plain')
+        digest = hashlib.sha256(b'log').hexdigest()
+        assert_that((first, second), is_(equal_to(((digest, 'text/plain', True), (digest, 'text/plain', True)))))
+        blobs = [name for _, _, names in os.walk(str(tmp_path)) for name in names]
+        assert_that(blobs, is_(equal_to([digest[2:]])))
+
+    def test_key_is_fetched_once(self, tmp_path):
+        store = BlobStore(str(tmp_path))
+        started = threading.Event()
+        calls = []
+
+        def download(f):
+            calls.append(1)
+            started.wait(5)
+            f.write(b'shot')
+            return 'image/png'
+
+        threads = [threading.Thread(target=store.fetch, args=('/shot', download)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+        assert_that((len(calls), store.fetched, store.hits), is_(equal_to((1, 1, 3))))
+
+        store.save()
+        reopened = BlobStore(str(tmp_path))
+        digest = hashlib.sha256(b'shot').hexdigest()
+        assert_that(reopened.fetch('/shot', None), is_(equal_to((digest, 'image/png', False))))
+
+    def test_copies_are_independent_of_the_store(self, tmp_path):
+        store = BlobStore(str(tmp_path / 'blobs'))
+        digest, _, _ = store.fetch('/a', lambda f: f.write(b'log') and 'text/plain')
+        exported = tmp_path / 'log.txt'
+        store.copy_to(digest, str(exported))
+        exported.write_bytes(b'edited')
+        with open(store.path(digest), 'rb') as f:
+            assert_that(f.read(), is_(equal_to(b'log')))
+        assert_that(sorted(os.listdir(str(tmp_path))), is_(equal_to(['blobs', 'log.txt'])))
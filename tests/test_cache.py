@@ -0,0 +1,100 @@
+from hamcrest import assert_that, is_, equal_to, same_instance
+
+from youtrack.cache import ResponseCache
+
+USER = b'<user login="root" fullName="Root" email="root@example.com"/>'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache:
+    def test_fresh_entries_are_served_without_request(self, connection, transport):
+        connection.cache = ResponseCache(ttl=60)
+        transport.route('GET', '/rest/admin/user/root', USER)
+        first = connection.get_user('root')
+        second = connection.get_user('root')
+        assert_that(second['fullName'], is_(equal_to('Root')))
+        assert_that(transport.count('GET', '/rest/admin/user/root'), is_(equal_to(1)))
+        assert_that(connection.cache.hits, is_(equal_to(1)))
+        assert_that(first['login'], is_(equal_to(second['login'])))
+
+    def test_stale_entries_are_revalidated(self, connection, transport):
+        clock = Clock()
+        connection.cache = ResponseCache(ttl=10, clock=clock)
+        seen = []
+
+        def user(query, body, headers):
+            seen.append(headers.get('If-None-Match'))
+            if headers.get('If-None-Match') == '"v1"':
+                return 304, b'', {'etag': '"v1"'}
+            return 200, USER, {'etag': '"v1"'}
+
+        transport.route('GET', '/rest/admin/user/root', user)
+        connection.get_user('root')
+        clock.now = 11
+        assert_that(connection.get_user('root')['email'], is_(equal_to('root@example.com')))
+        assert_that(seen, is_(equal_to([None, '"v1"'])))
+        assert_that(connection.cache.revalidations, is_(equal_to(1)))
+        connection.get_user('root')
+        assert_that(len(seen), is_(equal_to(2)))
+
+    def test_writes_invalidate(self, connection, transport):
+        connection.cache = ResponseCache()
+        transport.route('GET', '/rest/admin/project/A/version/1.0', b'<version name="1.0" isReleased="false"/>')
+        transport.route('POST', '/rest/admin/project/A/version/1.0', lambda q, b, h: (200, b''))
+        connection.get_version('A', '1.0')
+        connection._req('POST', '/admin/project/A/version/1.0?isReleased=true')
+        connection.get_version('A', '1.0')
+        assert_that(transport.count('GET', '/rest/admin/project/A/version/1.0'), is_(equal_to(2)))
+
+    def test_imports_invalidate_what_they_import(self, connection, transport):
+        connection.cache = ResponseCache()
+        names = iter(['Bob', 'Robert'])
+        transport.route('GET', '/rest/admin/user/bob', lambda q, b, h: (200, (
+            '<user login="bob" fullName="%s"/>' % next(names)).encode()))
+        transport.route('PUT', '/rest/import/users', b'<importResult/>')
+        assert_that(connection.get_user('bob')['fullName'], is_(equal_to('Bob')))
+        connection.import_users([{'login': 'bob', 'fullName': 'Robert', 'email': 'bob@example.com'}])
+        assert_that(connection.get_user('bob')['fullName'], is_(equal_to('Robert')))
+
+    def test_issue_writes_invalidate_issue_lists(self, connection, transport):
+        connection.cache = ResponseCache()
+        transport.route('GET', '/rest/issue/byproject/A', b'<issues/>')
+        transport.route('GET', '/rest/issue', b'<issueCompacts/>')
+        transport.route('POST', '/rest/issue/A-1', lambda q, b, h: (200, b''))
+        for _ in range(2):
+            connection.get_issues('A', '', 0, 10)
+            connection.get_all_issues('state: Open')
+            connection._req('POST', '/issue/A-1?summary=changed')
+        assert_that((transport.count('GET', '/rest/issue/byproject/A'), transport.count('GET', '/rest/issue')),
+                    is_(equal_to((2, 2))))
+
+    def test_hits_get_their_own_document(self, connection, transport):
+        connection.cache = ResponseCache()
+        transport.route('GET', '/rest/admin/user/root', b'<user login="root"/>')
+        first = connection._get('/admin/user/root')
+        first.documentElement.setAttribute('login', 'changed')
+        assert_that(connection._get('/admin/user/root').documentElement.getAttribute('login'), is_(equal_to('root')))
+        assert_that(transport.count('GET', '/rest/admin/user/root'), is_(equal_to(1)))
+
+    def test_response_older_than_a_write_is_not_kept(self):
+        cache = ResponseCache()
+        generation = cache.generation
+        cache.invalidate('/issue/A-1')
+        cache.put(('/issue/A-1', None), {}, b'<issue/>', generation)
+        assert_that(len(cache), is_(equal_to(0)))
+
+    def test_lru_eviction_by_size(self):
+        cache = ResponseCache(max_bytes=10)
+        for i in range(4):
+            cache.put(('/u/%d' % i, None), {}, b'12345')
+        assert_that(len(cache), is_(equal_to(2)))
+        assert_that(cache.size, is_(equal_to(10)))
+        entry, fresh = cache.get(('/u/0', None))
+        assert_that(entry, is_(same_instance(None)))
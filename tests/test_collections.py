@@ -0,0 +1,67 @@
+import threading
+import time
+
+from hamcrest import assert_that, is_, equal_to, greater_than
+
+VERSIONS = (b'<versions><version name="1.0" isReleased="true" url="/v/1.0"/>'
+            b'<version name="2.0" isReleased="false" url="/v/2.0"/><version name="3.0" url="/v/3.0"/></versions>')
+
+
+class Concurrency:
+    def __init__(self):
+        self.current = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, body):
+        def handler(query, request_body, headers):
+            with self.lock:
+                self.current += 1
+                self.peak = max(self.peak, self.current)
+            time.sleep(0.05)
+            with self.lock:
+                self.current -= 1
+            return 200, body
+        return handler
+
+
+class TestCollections:
+    def test_versions_fan_out_keeps_order(self, connection, transport):
+        concurrency = Concurrency()
+        transport.route('GET', '/rest/admin/project/A/version', VERSIONS)
+        for name in ('1.0', '2.0', '3.0'):
+            transport.route('GET', '/rest/admin/project/A/version/' + name,
+                            concurrency(('<version name="%s" description="d%s"/>' % (name, name)).encode()))
+        versions = connection.get_versions('A', max_workers=3)
+        assert_that([v['description'] for v in versions], is_(equal_to(['d1.0', 'd2.0', 'd3.0'])))
+        assert_that(concurrency.peak, is_(greater_than(1)))
+
+    def test_shallow_versions_make_no_follow_up_requests(self, connection, transport):
+        transport.route('GET', '/rest/admin/project/A/version', VERSIONS)
+        versions = connection.get_versions('A', shallow=True)
+        assert_that([(v['name'], v.get('isReleased', None)) for v in versions],
+                    is_(equal_to([('1.0', 'true'), ('2.0', 'false'), ('3.0', None)])))
+        assert_that(len(transport.requests), is_(equal_to(1)))
+
+    def test_custom_fields_serial(self, connection, transport):
+        transport.route('GET', '/rest/admin/customfield/field',
+                        b'<customFieldPrototypes><customFieldPrototype name="State" url="/f/State"/>'
+                        b'<customFieldPrototype name="Type" url="/f/Type"/></customFieldPrototypes>')
+        for name in ('State', 'Type'):
+            transport.route('GET', '/rest/admin/customfield/field/' + name,
+                            ('<customFieldPrototype name="%s" type="enum[1]"/>' % name).encode())
+        fields = connection.get_custom_fields(max_workers=1)
+        assert_that([(f['name'], f['type']) for f in fields],
+                    is_(equal_to([('State', 'enum[1]'), ('Type', 'enum[1]')])))
+
+    def test_user_bundles_resolve_members_in_batch(self, connection, transport):
+        transport.route('GET', '/rest/admin/customfield/userBundle',
+                        b'<userBundles><userFieldBundle name="devs" url="/b/devs"/></userBundles>')
+        transport.route('GET', '/rest/admin/customfield/userBundle/devs',
+                        b'<userBundle name="devs"><user login="root"/><user login="guest"/>'
+                        b'<userGroup name="team"/></userBundle>')
+        transport.route('GET', '/rest/admin/user/root', b'<user login="root"/>')
+        transport.route('GET', '/rest/admin/user/guest', b'<user login="guest"/>')
+        transport.route('GET', '/rest/admin/group/team', b'<group name="team"/>')
+        bundles = connection.get_all_bundles('user[1]')
+        assert_that([u['login'] for u in bundles[0].users], is_(equal_to(['root', 'guest'])))
+        assert_that([g['name'] for g in bundles[0].groups], is_(equal_to(['team'])))
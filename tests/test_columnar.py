@@ -0,0 +1,64 @@
+from xml.dom import minidom
+
+import pytest
+from hamcrest import assert_that, is_, equal_to, instance_of, none
+
+import youtrack
+from youtrack.columnar import IssueColumns, IntColumn, DateColumn, DictionaryColumn, ObjectColumn
+
+ISSUE = '''<issue id="A-%(n)d" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <field name="projectShortName"><value>A</value></field>
+  <field name="numberInProject"><value>%(n)d</value></field>
+  <field name="summary"><value>Summary %(n)d</value></field>
+  <field name="created"><value>%(created)d</value></field>
+  <field name="State" xsi:type="CustomFieldValue"><value>%(state)s</value></field>
+  %(extra)s
+</issue>'''
+
+
+def issue(n, state, extra=''):
+    xml = ISSUE % {'n': n, 'created': 1500000000000 + n, 'state': state, 'extra': extra}
+    return youtrack.Issue(minidom.parseString(xml))
+
+
+class TestIssueColumns:
+    def issues(self):
+        return [issue(1, 'Open'), issue(2, 'Fixed'),
+                issue(3, 'Open', '<field name="Fix versions" xsi:type="CustomFieldValue"><value>1.0</value>'
+                                 '<value>2.0</value></field>')]
+
+    def test_column_types(self):
+        columns = IssueColumns.from_issues(iter(self.issues()))
+        assert_that(len(columns), is_(equal_to(3)))
+        assert_that(columns['numberInProject'], is_(instance_of(IntColumn)))
+        assert_that(columns['created'], is_(instance_of(DateColumn)))
+        assert_that(columns['State'], is_(instance_of(DictionaryColumn)))
+        assert_that(columns['projectShortName'], is_(instance_of(DictionaryColumn)))
+        assert_that(columns['summary'], is_(instance_of(ObjectColumn)))
+        assert_that(list(columns['numberInProject'].values), is_(equal_to([1, 2, 3])))
+        assert_that(list(columns['State'].codes), is_(equal_to([0, 1, 0])))
+        assert_that(columns['State'].categories, is_(equal_to(['Open', 'Fixed'])))
+
+    def test_late_fields_are_backfilled(self):
+        columns = IssueColumns.from_issues(self.issues())
+        versions = columns['Fix versions']
+        assert_that(len(versions), is_(equal_to(3)))
+        assert_that(versions[0], is_(none()))
+        assert_that(versions[2], is_(equal_to(('1.0', '2.0'))))
+
+    def test_selected_fields(self):
+        columns = IssueColumns.from_issues(self.issues(), fields=['State', 'created'])
+        assert_that(sorted(columns.columns), is_(equal_to(['State', 'created'])))
+
+    def test_to_numpy(self):
+        numpy = pytest.importorskip('numpy')
+        columns = IssueColumns.from_issues(self.issues())
+        arrays = columns.to_numpy()
+        assert_that(arrays['numberInProject'].sum(), is_(equal_to(6)))
+        assert_that(str(arrays['created'].dtype), is_(equal_to('datetime64[ms]')))
+        assert_that(int((arrays['State'] == 0).sum()), is_(equal_to(2)))
+        assert_that(list(columns['Fix versions'].to_numpy()), is_(equal_to([-1, -1, 0])))
+        assert_that(arrays['summary'].dtype, is_(equal_to(numpy.dtype(object))))
+        columns.append(issue(4, 'Fixed'))
+        assert_that(len(arrays['numberInProject']), is_(equal_to(3)))
+        assert_that(list(columns.to_numpy()['State']), is_(equal_to([0, 1, 0, 1])))
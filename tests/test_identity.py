@@ -0,0 +1,76 @@
+import threading
+from xml.dom import minidom
+
+import pytest
+from hamcrest import assert_that, is_, equal_to, same_instance, none
+
+import youtrack
+from youtrack.identity import IdentityMap
+
+ISSUE = b'''<issue id="A-%d">
+  <field name="reporterName"><value>root</value></field>
+  <field name="updaterName"><value>guest</value></field>
+  <field name="Assignee"><value>root</value><value>ghost</value></field>
+  <field name="voterName"><value>guest</value></field>
+</issue>'''
+
+
+def user_handler(log):
+    lock = threading.Lock()
+
+    def for_login(login):
+        def respond(query, body, headers):
+            with lock:
+                log.append(login)
+            return 200, ('<user login="%s" email="%s@example.com"/>' % (login, login)).encode()
+        return respond
+    return for_login
+
+
+class TestIdentityMap:
+    def route_users(self, transport, logins):
+        log = []
+        for_login = user_handler(log)
+        for login in logins:
+            transport.route('GET', '/rest/admin/user/' + login, for_login(login))
+        return log
+
+    def test_accessors_share_users(self, connection, transport):
+        log = self.route_users(transport, ['root', 'guest'])
+        issues = [youtrack.Issue(minidom.parseString(ISSUE % i), connection) for i in range(50)]
+        reporters = [issue.get_reporter() for issue in issues]
+        assert_that(reporters[0], is_(same_instance(reporters[49])))
+        assert_that(issues[3].get_voters()[0], is_(same_instance(issues[7].get_updater())))
+        assert_that(sorted(log), is_(equal_to(['guest', 'root'])))
+
+    def test_batch_resolution(self, connection, transport):
+        connection.identities = IdentityMap(connection, ignore_missing=True)
+        log = self.route_users(transport, ['root', 'guest'])
+        issues = [youtrack.Issue(minidom.parseString(ISSUE % i), connection) for i in range(10)]
+        users = connection.identities.prefetch_issue_users(issues)
+        assert_that(sorted(users), is_(equal_to(['ghost', 'guest', 'root'])))
+        assert_that(users['ghost'], is_(none()))
+        assert_that(len(log), is_(equal_to(2)))
+        assert_that(issues[0].get_assignee(), is_(equal_to([users['root'], None])))
+        assert_that(connection.identities.user_by_email('guest@example.com'), is_(same_instance(users['guest'])))
+        assert_that(len(log), is_(equal_to(2)))
+
+    def test_unknown_login_raises(self, connection, transport):
+        self.route_users(transport, ['root', 'guest'])
+        issue = youtrack.Issue(minidom.parseString(ISSUE % 1), connection)
+        assert_that(issue.get_reporter()['login'], is_(equal_to('root')))
+        with pytest.raises(youtrack.YouTrackException):
+            issue.get_assignee()
+
+    def test_comment_author(self, connection, transport):
+        self.route_users(transport, ['root'])
+        comment = youtrack.Comment(minidom.parseString(b'<comment id="1" author="root" text="t"/>'), connection)
+        assert_that(comment.get_author()['login'], is_(equal_to('root')))
+
+    def test_deleted_user_is_discarded(self, connection, transport):
+        log = self.route_users(transport, ['root'])
+        transport.route('DELETE', '/rest/admin/user/root', b'')
+        connection.identities.user('root')
+        connection.delete_user('root')
+        connection.identities.user('root')
+        assert_that(log, is_(equal_to(['root', 'root'])))
@@ -0,0 +1,119 @@
+import re
+
+from hamcrest import assert_that, is_, equal_to, has_length
+
+from youtrack.importing import iter_issue_batches, ImportResult, ImportSession
+
+TT = b'<settings enabled="false"/>'
+
+
+def issue(n, summary='summary'):
+    return {'numberInProject': str(n), 'summary': summary}
+
+
+class ImportServer:
+    """ Answers import requests with an item per issue, rejects issues whose summary is 'bad' """
+
+    def __init__(self):
+        self.bodies = []
+
+    def __call__(self, query, body, headers):
+        self.bodies.append(body)
+        if b'poison' in body:
+            return 400, b'', {'content-type': 'text/plain'}
+        items = ''.join('<item id="%s" imported="%s"/>' % (n, 'false' if summary == 'bad' else 'true')
+                        for n, summary in re.findall(r'<issue>\s*<field name="numberInProject">\s*<value>(\d+)'
+                                                     r'</value>\s*</field>\s*<field name="summary">\s*<value>(\w+)',
+                                                     body.decode('utf-8')))
+        return 200, ('<importResult>%s</importResult>' % items).encode()
+
+
+class TestIssueBatches:
+    def test_split_by_count_and_size(self):
+        batches = list(iter_issue_batches((issue(n) for n in range(25)), [], batch_size=10))
+        assert_that([len(b) for b in batches], is_(equal_to([10, 10, 5])))
+        record = len(batches[-1].records[0])
+        batches = list(iter_issue_batches((issue(n) for n in range(10, 20)), [], batch_size=None,
+                                          max_bytes=len(b'<issues>\n</issues>') + 3 * record))
+        assert_that([len(b) for b in batches], is_(equal_to([3, 3, 3, 1])))
+
+    def test_body_is_well_formed(self):
+        batch = next(iter_issue_batches([issue(1, 'a < b & "c"')], []))
+        assert_that(batch.body().decode('utf-8'), is_(equal_to(
+            '<issues>\n  <issue>\n    <field name="numberInProject">\n      <value>1</value>\n    </field>\n'
+            '    <field name="summary">\n      <value>a &lt; b &amp; "c"</value>\n    </field>\n  </issue>\n'
+            '</issues>')))
+
+
+class TestImportIssues:
+    def test_results_per_batch(self, connection, transport):
+        server = ImportServer()
+        transport.route('GET', '/rest/admin/project/A/timetracking', TT)
+        transport.route('PUT', '/rest/import/A/issues', server)
+        issues = (issue(n, 'bad' if n == 7 else 'ok') for n in range(1, 13))
+        results = list(connection.iter_import_issues('A', 'devs', issues, batch_size=5))
+        assert_that(results, has_length(3))
+        assert_that([r.numbers for r in results][2], is_(equal_to(['11', '12'])))
+        assert_that(results[1].failed, is_(equal_to(['7'])))
+        assert_that(results[1].imported, is_(equal_to(['6', '8', '9', '10'])))
+        assert_that(transport.requests[-1][2], is_(equal_to({'assigneeGroup': 'devs'})))
+
+    def test_import_issues_merges_results(self, connection, transport):
+        transport.route('GET', '/rest/admin/project/A/timetracking', TT)
+        transport.route('PUT', '/rest/import/A/issues', ImportServer())
+        response = connection.import_issues('A', 'devs', [issue(n) for n in range(1, 5)], batch_size=3)
+        assert_that(response.count(b'imported="true"'), is_(equal_to(4)))
+        assert_that(connection.import_issues('A', 'devs', []), is_(equal_to(None)))
+
+
+class TestBisection:
+    def test_rejected_batches_are_bisected(self, connection, transport):
+        server = ImportServer()
+        transport.route('GET', '/rest/admin/project/A/timetracking', TT)
+        transport.route('PUT', '/rest/import/A/issues', server)
+        issues = [issue(n, 'poison' if n in (5, 12) else 'bad' if n == 3 else 'ok') for n in range(1, 17)]
+        result = ImportResult.collect(connection.iter_import_issues('A', 'devs', issues, batch_size=16))
+        assert_that(sorted(result.failed), is_(equal_to(['12', '3', '5'])))
+        assert_that(len(result.imported), is_(equal_to(13)))
+        assert_that(result.requests, is_(equal_to(len(server.bodies))))
+        # 1 + 2 halves + 4 quarters + 4 eighths + 4 single issues, instead of 1 + 16
+        assert_that(result.requests, is_(equal_to(15)))
+        assert_that(result.failed['3'], is_(equal_to('<item id="3" imported="false"/>')))
+
+    def test_only_failed_issues_are_reported(self, connection, transport, capsys):
+        transport.route('GET', '/rest/admin/project/A/timetracking', TT)
+        transport.route('PUT', '/rest/import/A/issues', ImportServer())
+        issues = [issue(n, 'poison' if n == 5 else 'ok') for n in range(1, 9)]
+        response = connection.import_issues('A', 'devs', issues)
+        assert_that(response.count(b'imported="true"'), is_(equal_to(7)))
+        errors = capsys.readouterr().err
+        assert_that(errors, is_(equal_to('Failed to import issue [ A-5 ]. Reason : no import result\n')))
+
+
+class TestImportSession:
+    def test_context_is_requested_once(self, connection, transport):
+        transport.route('GET', '/rest/admin/project/A/timetracking', TT)
+        transport.route('PUT', '/rest/import/A/issues', ImportServer())
+        transport.route('GET', '/rest/admin/project/A/customfield',
+                        b'<projectCustomFieldRefs><projectCustomField name="State" url="/s"/>'
+                        b'<projectCustomField name="Estimate" url="/e"/></projectCustomFieldRefs>')
+        transport.route('GET', '/rest/admin/project/A/customfield/State',
+                        b'<projectCustomField name="State" type="state[1]"><param name="bundle" value="States"/>'
+                        b'</projectCustomField>')
+        transport.route('GET', '/rest/admin/project/A/customfield/Estimate',
+                        b'<projectCustomField name="Estimate"/>')
+        transport.route('GET', '/rest/admin/customfield/field/Estimate',
+                        b'<customFieldPrototype name="Estimate" type="integer"/>')
+        transport.route('GET', '/rest/admin/customfield/stateBundle/States',
+                        b'<stateBundle name="States"><state isResolved="false">Open</state></stateBundle>')
+        session = ImportSession(connection, 'A')
+        for chunk in ([issue(1), issue(2)], [issue(3)]):
+            assert_that(session.import_issues(chunk, 'devs').ok, is_(equal_to(True)))
+        assert_that(session.field_types, is_(equal_to({'State': 'state[1]', 'Estimate': 'integer'})))
+        assert_that(session.bundles['State'].name, is_(equal_to('States')))
+        session.bundles
+        assert_that(transport.count('GET', '/rest/admin/project/A/timetracking'), is_(equal_to(1)))
+        assert_that(transport.count('GET', '/rest/admin/customfield/stateBundle/States'), is_(equal_to(1)))
+        session.refresh('time_tracking')
+        session.import_issues([issue(4)], 'devs')
+        assert_that(transport.count('GET', '/rest/admin/project/A/timetracking'), is_(equal_to(2)))
@@ -0,0 +1,73 @@
+import threading
+from xml.dom import minidom
+
+from hamcrest import assert_that, is_, equal_to
+
+import youtrack
+from youtrack.importing import dedup_links
+from youtrack.retry import RetryPolicy
+
+
+def link(source, target, type_name='Depend'):
+    return youtrack.Link(minidom.parseString(
+        ('<issueLink typeName="%s" source="%s" target="%s"/>' % (type_name, source, target)).encode()))
+
+
+class TestLink:
+    def test_equality_uses_fields(self):
+        assert_that(link('A-1', 'A-2'), is_(equal_to(link('A-1', 'A-2'))))
+        assert_that(link('A-1', 'A-2') == link('A-1', 'A-3'), is_(equal_to(False)))
+        assert_that(len({link('A-1', 'A-2'), link('A-1', 'A-2'), link('A-2', 'A-1')}), is_(equal_to(2)))
+
+    def test_dedup_keeps_first_occurrence(self):
+        links = [link('A-1', 'A-2'), {'typeName': 'Depend', 'source': 'A-3', 'target': 'A-4'}, link('A-1', 'A-2'),
+                 {'typeName': 'Depend', 'source': 'A-3', 'target': 'A-4'}]
+        assert_that(list(dedup_links(links)), is_(equal_to(links[:2])))
+
+    def test_outward_links(self, connection, transport):
+        transport.route('GET', '/rest/issue/A-1/link',
+                        b'<links><issueLink typeName="Depend" source="A-1" target="A-2"/>'
+                        b'<issueLink typeName="Depend" source="A-3" target="A-1"/></links>')
+        assert_that([link.target for link in connection.get_links('A-1', outward_only=True)], is_(equal_to(['A-2'])))
+
+
+class TestImportLinks:
+    def test_chunks_are_retried_on_their_own(self, connection, transport):
+        connection.retry = RetryPolicy(max_attempts=1)
+        bodies = []
+
+        def handler(query, body, headers):
+            bodies.append(body)
+            if b'A-13' in body and bodies.count(body) == 1:
+                return 500, b'<error>busy</error>'
+            return 200, b'<list/>'
+
+        transport.route('PUT', '/rest/import/links', handler)
+        links = [link('A-%d' % i, 'B-%d' % i) for i in range(20)] + [link('A-0', 'B-0')]
+        results = list(connection.iter_import_links(links, batch_size=5, max_workers=3, retries=1))
+        assert_that([len(r.links) for r in results], is_(equal_to([5, 5, 5, 5])))
+        assert_that([r.attempts for r in results], is_(equal_to([1, 1, 2, 1])))
+        assert_that(all(r.ok for r in results), is_(equal_to(True)))
+        assert_that(len(bodies), is_(equal_to(5)))
+
+    def test_rejected_chunks_are_not_retried(self, connection, transport):
+        transport.route('PUT', '/rest/import/links', lambda query, body, headers: (400, b'<error>bad link</error>'))
+        results = list(connection.iter_import_links([link('A-1', 'B-1')], retries=2))
+        assert_that([(r.attempts, r.ok) for r in results], is_(equal_to([(1, False)])))
+        assert_that(transport.count('PUT', '/rest/import/links'), is_(equal_to(1)))
+
+    def test_results_stream_while_later_chunks_run(self, connection, transport):
+        release = threading.Event()
+
+        def handler(query, body, headers):
+            if b'A-5' in body:
+                release.wait(5)
+            return 200, b'<list/>'
+
+        transport.route('PUT', '/rest/import/links', handler)
+        results = connection.iter_import_links((link('A-%d' % i, 'B-%d' % i) for i in range(10)), batch_size=5,
+                                               max_workers=2)
+        first = next(results)
+        assert_that((len(first.links), release.is_set()), is_(equal_to((5, False))))
+        release.set()
+        assert_that([len(r.links) for r in results], is_(equal_to([5])))
@@ -0,0 +1,70 @@
+import pickle
+from xml.dom import minidom
+
+from hamcrest import assert_that, is_, equal_to, none, same_instance
+
+import youtrack
+
+ISSUE = b'''<issue id="A-1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <field name="summary"><value>Summary</value></field>
+  <field name="Fix versions" xsi:type="CustomFieldValue"><value>1.0</value><value>2.0</value></field>
+  <field name="fixedVersion"><value>1.0, 2.0</value></field>
+  <field name="Estimation" value="5"/>
+  <comment id="1" author="root" text="comment"/>
+  <links><issueLink typeName="Depend" source="A-1" target="A-2"/></links>
+  <attachments><fileUrl url="http://host/_persistent/1.png" name="1.png"/></attachments>
+  <tag cssClass="c1">Star</tag>
+  <tag cssClass="c2">later</tag>
+</issue>'''
+
+
+class TestIssue:
+    def test_single_pass_construction(self):
+        issue = youtrack.Issue(minidom.parseString(ISSUE))
+        assert_that(issue['summary'], is_(equal_to('Summary')))
+        assert_that(issue['Fix versions'], is_(equal_to(['1.0', '2.0'])))
+        assert_that(issue['fixedVersion'], is_(equal_to(['1.0', '2.0'])))
+        assert_that(issue['Estimation'], is_(equal_to('5')))
+        assert_that(issue._attribute_types, is_(equal_to({'Fix versions': 'CustomFieldValue'})))
+        assert_that([(link['source'], link['target']) for link in issue.links], is_(equal_to([('A-1', 'A-2')])))
+        assert_that([a['url'] for a in issue.attachments], is_(equal_to(['/_persistent/1.png'])))
+        assert_that(issue.tags, is_(equal_to(['Star', 'later'])))
+
+    def test_no_links_tags_or_attachments(self):
+        issue = youtrack.Issue(minidom.parseString(b'<issue id="A-1"><field name="summary"><value>S</value>'
+                                                   b'</field></issue>'))
+        assert_that(issue.links, is_(none()))
+        assert_that(issue.tags, is_(none()))
+        assert_that(issue.attachments, is_(none()))
+
+
+class TestCompactStorage:
+    def test_data_view(self):
+        issue = youtrack.Issue(minidom.parseString(ISSUE))
+        assert_that(issue._data['summary'], is_(equal_to('Summary')))
+        assert_that(dict(issue._data)['id'], is_(equal_to('A-1')))
+        issue._data['summary'] = 'Changed'
+        assert_that(issue['summary'], is_(equal_to('Changed')))
+        del issue._data['summary']
+        assert_that(issue.get('summary', None), is_(none()))
+        assert_that('summary' in list(issue), is_(False))
+
+    def test_issues_share_values_and_have_no_dict(self):
+        first, second = [youtrack.Issue(minidom.parseString(ISSUE)) for _ in range(2)]
+        assert_that(first['Fix versions'][0], is_(same_instance(second['Fix versions'][0])))
+        assert_that(hasattr(first, '__dict__') and bool(first.__dict__), is_(False))
+
+    def test_pickle_round_trip(self):
+        issue = youtrack.Issue(minidom.parseString(ISSUE))
+        copy = pickle.loads(pickle.dumps(issue))
+        assert_that(dict(copy._data), is_(equal_to(dict(issue._data))))
+        assert_that(copy.tags, is_(equal_to(['Star', 'later'])))
+        assert_that(copy._attribute_types, is_(equal_to({'Fix versions': 'CustomFieldValue'})))
+
+    def test_field_types_are_per_issue(self):
+        typed = youtrack.Issue(minidom.parseString(ISSUE))
+        plain = youtrack.Issue(minidom.parseString(
+            b'<issue id="B-1"><field name="Fix versions"><value>1.0</value></field></issue>'))
+        assert_that(plain._attribute_types, is_(equal_to({})))
+        assert_that(typed.custom_fields, is_(equal_to([['1.0', '2.0']])))
+        assert_that(plain.custom_fields, is_(equal_to([])))
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+from hamcrest import assert_that, is_, equal_to, less_than_or_equal_to, greater_than
+
+from youtrack.limiter import ConcurrencyLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestConcurrencyLimiter:
+    def test_additive_increase_multiplicative_decrease(self):
+        clock = Clock()
+        limiter = ConcurrencyLimiter(initial=4, max_limit=6, warmup=2, clock=clock)
+        for _ in range(40):
+            started = limiter.acquire()
+            clock.now += 0.1
+            limiter.release(started)
+        assert_that(limiter.limit, is_(equal_to(6.0)))
+
+        # failures of requests in flight together lower the limit once
+        starts = [limiter.acquire() for _ in range(3)]
+        clock.now += 0.1
+        for started in starts:
+            limiter.release(started, overloaded=True)
+        assert_that(limiter.limit, is_(equal_to(3.0)))
+
+        # latency spike
+        started = limiter.acquire()
+        clock.now += 1
+        limiter.release(started)
+        assert_that(limiter.limit, is_(equal_to(1.5)))
+
+    def test_no_warmup(self):
+        clock = Clock()
+        limiter = ConcurrencyLimiter(initial=4, warmup=0, clock=clock)
+        started = limiter.acquire()
+        clock.now += 0.1
+        limiter.release(started)
+        assert_that(limiter.latency, is_(equal_to(0.1)))
+
+        started = limiter.acquire()
+        clock.now += 1
+        limiter.release(started)
+        assert_that(limiter.limit, is_(equal_to(4.25 * 0.5)))
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            ConcurrencyLimiter(initial=8, max_limit=4)
+
+    def test_connection_requests_stay_under_the_limit(self, connection, transport):
+        connection.limiter = ConcurrencyLimiter(initial=2, max_limit=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def handler(query, body, headers):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.pop()
+            return 200, b'<issue id="A-1"/>'
+
+        transport.route('GET', '/rest/issue/A-1', handler)
+        threads = [threading.Thread(target=connection.get_issue, args=('A-1',)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert_that(max(peak), is_(less_than_or_equal_to(2)))
+        assert_that(connection.limiter.in_flight, is_(equal_to(0)))
+
+        transport.route('GET', '/rest/issue/A-2', lambda q, b, h: (429, b'<error/>'))
+        connection.retry.max_attempts = 1
+        with pytest.raises(Exception):
+            connection.get_issue('A-2')
+        assert_that(connection.limiter.limit, is_(equal_to(1.0)))
+
+
+class TestTokenBucket:
+    def test_rate(self):
+        clock = Clock()
+        bucket = TokenBucket(rate=10, burst=5, clock=clock, sleep=clock.sleep)
+        for _ in range(25):
+            bucket.acquire()
+        assert_that(clock.now, is_(greater_than(1.99)))
+        assert_that(clock.now, is_(less_than_or_equal_to(2.01)))
@@ -0,0 +1,96 @@
+import http.server
+import io
+import os
+import threading
+
+import pytest
+from hamcrest import assert_that, is_, equal_to, none
+
+from youtrack.connection import Connection
+from youtrack.multipart import MultipartBody
+
+
+class Upload(http.server.BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        if 'Content-Length' in self.headers:
+            body = self.rfile.read(int(self.headers['Content-Length']))
+        else:
+            body = b''
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                chunk = self.rfile.read(size + 2)[:size]
+                if not size:
+                    break
+                body += chunk
+        self.received.append((self.path, dict((k.lower(), v) for k, v in self.headers.items()), body))
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Upload.received = []
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Upload)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:%d' % httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class Stream(io.RawIOBase):
+    """ Non-seekable stream of unknown length """
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.data.read(size)
+
+
+def part(body):
+    head, rest = body.split(b'\r\n\r\n', 1)
+    return head, rest[:rest.rindex(b'\r\n--')]
+
+
+class TestMultipartUpload:
+    def test_mapped_file(self, server, tmp_path):
+        path = tmp_path / 'log.txt'
+        data = os.urandom(300000)
+        path.write_bytes(data)
+        connection = Connection(server, api_key='key')
+        connection.import_attachment('A-1', 'log.txt', MultipartBody.from_path(str(path), chunk_size=4096), 'root',
+                                     None, None, created='1500000000000')
+        url, headers, body = Upload.received[0]
+        assert_that(url.split('?')[0], is_(equal_to('/rest/import/A-1/attachment')))
+        assert_that(headers['content-type'].startswith('multipart/form-data; boundary='), is_(equal_to(True)))
+        head, content = part(body)
+        assert_that(content, is_(equal_to(data)))
+        assert_that(b'filename="log.txt"' in head, is_(equal_to(True)))
+
+    def test_stream_of_unknown_length_is_chunked(self, server):
+        connection = Connection(server, api_key='key')
+        data = b'x' * 100000
+        connection.create_attachment('A-1', 'data.bin', Stream(data), 'root', created='1500000000000')
+        url, headers, body = Upload.received[0]
+        assert_that(headers.get('content-length'), is_(none()))
+        assert_that(headers['transfer-encoding'], is_(equal_to('chunked')))
+        assert_that(part(body)[1], is_(equal_to(data)))
+
+    def test_file_object_is_rewound_on_retry(self):
+        body = MultipartBody('a.txt', io.BytesIO(b'0123456789'), length=None, chunk_size=3)
+        assert_that(body.headers()['Content-Length'], is_(equal_to(str(len(b''.join(body))))))
+        assert_that(b''.join(body), is_(equal_to(b''.join(body))))
+        with pytest.raises(ValueError):
+            once = MultipartBody('a.txt', Stream(b'abc'))
+            list(once)
+            list(once)
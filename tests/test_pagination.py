@@ -0,0 +1,42 @@
+from hamcrest import assert_that, is_, equal_to
+
+
+def issues_page(total):
+    def handler(query, body, headers):
+        after, _max = int(query['after']), int(query['max'])
+        ids = range(after, min(after + _max, total))
+        return 200, ('<issues>%s</issues>' % ''.join('<issue id="A-%d"/>' % i for i in ids)).encode()
+    return handler
+
+
+class TestIterIssues:
+    def test_walks_all_pages(self, connection, transport):
+        transport.route('GET', '/rest/issue', issues_page(250))
+        ids = [issue['id'] for issue in connection.iter_issues('project: A', page_size=100)]
+        assert_that(ids, is_(equal_to(['A-%d' % i for i in range(250)])))
+        assert_that([r[2]['after'] for r in transport.requests], is_(equal_to(['0', '100', '200'])))
+
+    def test_stops_on_full_last_page(self, connection, transport):
+        transport.route('GET', '/rest/issue', issues_page(200))
+        assert_that(len(list(connection.iter_issues(page_size=100))), is_(equal_to(200)))
+        assert_that(transport.count('GET', '/rest/issue'), is_(equal_to(3)))
+
+
+class TestIterUsers:
+    def users_page(self, total):
+        def handler(query, body, headers):
+            start = int(query['start'])
+            xml = ''.join('<user login="u%d" url="/u%d"/>' % (i, i) for i in range(start, min(start + 10, total)))
+            return 200, ('<userRefs>%s</userRefs>' % xml).encode()
+        return handler
+
+    def test_streams_all_users(self, connection, transport):
+        transport.route('GET', '/rest/admin/user/', self.users_page(45))
+        users = list(connection.iter_users(prefetch=3))
+        assert_that([u['login'] for u in users], is_(equal_to(['u%d' % i for i in range(45)])))
+        assert_that(connection.get_users_ten(40)[-1]['login'], is_(equal_to('u44')))
+
+    def test_params_are_passed(self, connection, transport):
+        transport.route('GET', '/rest/admin/user/', self.users_page(5))
+        connection.get_users({'group': 'devs'})
+        assert_that(transport.requests[0][2], is_(equal_to({'start': '0', 'group': 'devs'})))
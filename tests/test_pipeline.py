@@ -0,0 +1,79 @@
+import re
+import threading
+
+from hamcrest import assert_that, is_, equal_to, greater_than
+
+from youtrack.pipeline import ImportPipeline, ProjectImport
+
+TT = b'<settings enabled="false"/>'
+
+
+class Server:
+    """ Records the order of import requests, imports every issue """
+
+    def __init__(self, transport, projects):
+        self.events = []
+        self.lock = threading.Lock()
+        for project in projects:
+            transport.route('GET', '/rest/admin/project/%s/timetracking' % project, TT)
+            transport.route('PUT', '/rest/import/%s/issues' % project, self.issues(project))
+        transport.route('PUT', '/rest/import/links', self.links)
+
+    def log(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def issues(self, project):
+        def handler(query, body, headers):
+            numbers = re.findall(rb'<field name="numberInProject">\s*<value>(\d+)', body)
+            self.log(('issues', project))
+            items = ''.join('<item id="%s" imported="true"/>' % n.decode() for n in numbers)
+            return 200, ('<importResult>%s</importResult>' % items).encode()
+        return handler
+
+    def links(self, query, body, headers):
+        self.log(('links', body.count(b'<link ')))
+        return 200, b'<importResult/>'
+
+
+def issues(count):
+    return [{'numberInProject': str(n), 'summary': 's'} for n in range(1, count + 1)]
+
+
+class TestImportPipeline:
+    def test_links_wait_for_both_projects(self, connection, transport):
+        server = Server(transport, ['A', 'B'])
+        work_items = []
+        connection.import_work_items = lambda issue_id, items: work_items.append(issue_id)
+        links = [{'typeName': 'Depend', 'source': 'A-1', 'target': 'B-2'},
+                 {'typeName': 'Depend', 'source': 'B-1', 'target': 'A-3'},
+                 {'typeName': 'Depend', 'source': 'A-2', 'target': 'X-1'}]
+        progress = []
+        pipeline = ImportPipeline(connection, batch_size=2, progress=progress.append)
+        stats = pipeline.run([ProjectImport('A', 'devs', issues(5), links=links, work_items={'A-1': [1, 2]}),
+                              ProjectImport('B', 'devs', issues(3))])
+        assert_that(stats['A'].done, is_(equal_to({'issues': 5, 'work_items': 2, 'attachments': 0, 'links': 3})))
+        assert_that(stats['B'].done['issues'], is_(equal_to(3)))
+        assert_that(work_items, is_(equal_to(['A-1'])))
+        # the link to a project outside the run may go first, those between A and B wait for both
+        assert_that(server.events.index(('links', 2)),
+                    is_(greater_than(max(i for i, e in enumerate(server.events) if e == ('issues', 'B')))))
+        assert_that(all(s.complete for s in stats.values()), is_(equal_to(True)))
+        assert_that(len(progress), is_(greater_than(3)))
+
+    def test_links_to_failed_project_are_skipped(self, connection, transport):
+        Server(transport, ['A'])
+        links = [{'typeName': 'Depend', 'source': 'A-1', 'target': 'B-1'}]
+        stats = ImportPipeline(connection).run([ProjectImport('A', 'devs', issues(1), links=links),
+                                                ProjectImport('B', 'devs', issues(1))])
+        assert_that(len(stats['B'].errors), is_(equal_to(1)))
+        assert_that(stats['A'].failed['links'], is_(equal_to(1)))
+        assert_that(stats['A'].done['links'], is_(equal_to(0)))
+
+    def test_rejected_links_count_as_failed(self, connection, transport):
+        Server(transport, ['A'])
+        transport.route('PUT', '/rest/import/links', lambda q, b, h: (400, b'<error>Unknown link type</error>'))
+        links = [{'typeName': 'Nope', 'source': 'A-1', 'target': 'A-2'},
+                 {'typeName': 'Nope', 'source': 'A-2', 'target': 'A-1'}]
+        stats = ImportPipeline(connection).run([ProjectImport('A', 'devs', issues(2), links=links)])
+        assert_that((stats['A'].done['links'], stats['A'].failed['links']), is_(equal_to((0, 2))))
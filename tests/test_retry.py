@@ -0,0 +1,120 @@
+import httplib2
+import pytest
+from hamcrest import assert_that, is_, equal_to, instance_of
+
+import youtrack
+from youtrack.retry import RetryPolicy, CircuitOpenError, AUTH, THROTTLED, SERVER, TRANSPORT
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def error(status, **headers):
+    info = {'status': str(status)}
+    info.update(headers)
+    return youtrack.YouTrackException('/issue', httplib2.Response(info), b'')
+
+
+def policy(clock, **kwargs):
+    return RetryPolicy(sleep=clock.sleep, clock=clock, random=lambda: 1.0, **kwargs)
+
+
+class TestRetryPolicy:
+    def test_classify(self):
+        kinds = [RetryPolicy.classify(e) for e in (error(401), error(429), error(500), error(404),
+                                                   ConnectionResetError(), ValueError())]
+        assert_that(kinds, is_(equal_to([AUTH, THROTTLED, SERVER, None, TRANSPORT, None])))
+
+    def test_server_errors_back_off_exponentially(self, connection, transport):
+        clock = Clock()
+        connection.retry = policy(clock, max_attempts=4, backoff=0.5, max_backoff=1.5)
+        responses = iter([(504, b'<error/>'), (502, b'<error/>'), (500, b'<error/>'), (200, b'<issue id="A-1"/>')])
+        transport.route('GET', '/rest/issue/A-1', lambda q, b, h: next(responses))
+        assert_that(connection.get_issue('A-1')['id'], is_(equal_to('A-1')))
+        assert_that(clock.sleeps, is_(equal_to([0.5, 1.0, 1.5])))
+
+    def test_retry_after_and_non_retried_errors(self, connection, transport):
+        clock = Clock()
+        connection.retry = policy(clock, max_retry_after=60)
+        responses = iter([(429, b'<error/>', {'retry-after': '7'}), (200, b'<issue id="A-1"/>')])
+        transport.route('GET', '/rest/issue/A-1', lambda q, b, h: next(responses))
+        transport.route('GET', '/rest/issue/A-2', lambda q, b, h: (503, b'<error/>', {'retry-after': '600'}))
+        transport.route('GET', '/rest/issue/A-3', lambda q, b, h: (400, b'<error/>'))
+        connection.get_issue('A-1')
+        for issue_id in ('A-2', 'A-3'):
+            with pytest.raises(youtrack.YouTrackException):
+                connection.get_issue(issue_id)
+        assert_that(clock.sleeps, is_(equal_to([7.0])))
+        assert_that((transport.count('GET', '/rest/issue/A-2'), transport.count('GET', '/rest/issue/A-3')),
+                    is_(equal_to((1, 1))))
+
+    def test_api_key_connection_raises_auth_errors(self, connection, transport):
+        transport.route('GET', '/rest/issue/A-1', lambda q, b, h: (401, b'<error/>'))
+        with pytest.raises(youtrack.YouTrackException):
+            connection.get_issue('A-1')
+        assert_that(transport.count('GET', '/rest/issue/A-1'), is_(equal_to(1)))
+
+    def test_budget_bounds_retries(self, connection, transport):
+        clock = Clock()
+        connection.retry = policy(clock, budget=3, breaker_min_calls=1000)
+        transport.route('GET', '/rest/issue/A-1', lambda q, b, h: (500, b'<error/>'))
+        for _ in range(3):
+            with pytest.raises(youtrack.YouTrackException):
+                connection.get_issue('A-1')
+        assert_that((connection.retry.retries, transport.count('GET', '/rest/issue/A-1')), is_(equal_to((3, 6))))
+
+    def test_circuit_breaker(self, connection, transport):
+        clock = Clock()
+        connection.retry = policy(clock, max_attempts=1, breaker_window=4, breaker_min_calls=4, breaker_cooldown=10)
+        healthy = [False]
+        transport.route('GET', '/rest/issue/A-1',
+                        lambda q, b, h: (200, b'<issue id="A-1"/>') if healthy[0] else (502, b'<error/>'))
+        for _ in range(4):
+            with pytest.raises(youtrack.YouTrackException):
+                connection.get_issue('A-1')
+        with pytest.raises(CircuitOpenError):
+            connection.get_issue('A-1')
+        assert_that((connection.retry.state, transport.count('GET', '/rest/issue/A-1')), is_(equal_to(('open', 4))))
+
+        clock.now += 10
+        assert_that(connection.retry.state, is_(equal_to('half-open')))
+        with pytest.raises(youtrack.YouTrackException) as e:
+            connection.get_issue('A-1')
+        assert_that(e.value, is_(instance_of(youtrack.YouTrackException)))
+        assert_that(connection.retry.state, is_(equal_to('open')))
+
+        clock.now += 10
+        healthy[0] = True
+        connection.get_issue('A-1')
+        assert_that(connection.retry.state, is_(equal_to('closed')))
+
+    def test_server_errors_on_post_are_not_retried(self, connection, transport):
+        connection.retry = policy(Clock())
+        transport.route('POST', '/rest/issue/A-1/execute', lambda q, b, h: (502, b'<error/>'))
+        with pytest.raises(youtrack.YouTrackException):
+            connection._req('POST', '/issue/A-1/execute?command=fixed')
+        assert_that(transport.count('POST', '/rest/issue/A-1/execute'), is_(equal_to(1)))
+
+    def test_interrupted_probe_lets_the_next_one_through(self, connection):
+        clock = Clock()
+        retry = policy(clock, max_attempts=1, breaker_window=1, breaker_min_calls=1, breaker_cooldown=10)
+        retry.failed(error(502), 0)
+        clock.now += 10
+
+        def interrupted():
+            raise KeyboardInterrupt()
+
+        with pytest.raises(KeyboardInterrupt):
+            retry.call(connection, 'GET', interrupted)
+        assert_that(retry.call(connection, 'GET', lambda: 'ok'), is_(equal_to('ok')))
+        assert_that(retry.state, is_(equal_to('closed')))
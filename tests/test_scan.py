@@ -0,0 +1,70 @@
+import json
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from hamcrest import assert_that, is_, equal_to, less_than_or_equal_to
+
+from youtrack.scan import ShardedIssueScan, IssueShard
+
+START = date(2020, 1, 1)
+
+
+class Dataset:
+    """ 'created' of issue A-i is START + i days, B issues every second day """
+
+    def __init__(self):
+        self.issues = [('A-%d' % i, 'A', START + timedelta(days=i)) for i in range(60)] + \
+                      [('B-%d' % i, 'B', START + timedelta(days=2 * i)) for i in range(20)]
+
+    def select(self, _filter):
+        result = self.issues
+        project = re.search(r'project: \{(\w+)\}', _filter)
+        if project:
+            result = [i for i in result if i[1] == project.group(1)]
+        window = re.search(r'created: (\S+) \.\. (\S+)', _filter)
+        if window:
+            start, end = (date.fromisoformat(d) for d in window.groups())
+            result = [i for i in result if start <= i[2] <= end]
+        return sorted(result, key=lambda i: i[2])
+
+    def count(self, query, body, headers):
+        return 200, json.dumps({'value': len(self.select(query['filter']))}).encode()
+
+    def issues_page(self, query, body, headers):
+        after, _max = int(query['after']), int(query['max'])
+        xml = ''.join('<issue id="%s"><field name="created"><value>%d</value></field></issue>' %
+                      (_id, datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp() * 1000)
+                      for _id, _, d in self.select(query['filter'])[after:after + _max])
+        return 200, ('<issues>%s</issues>' % xml).encode()
+
+
+class TestShardedIssueScan:
+    def test_scan_returns_every_issue_once(self, connection, transport):
+        dataset = Dataset()
+        transport.route('GET', '/rest/issue/count', dataset.count)
+        transport.route('GET', '/rest/issue', dataset.issues_page)
+        scan = ShardedIssueScan(connection, projects=['A', 'B'], end=START + timedelta(days=80), shard_size=15,
+                                page_size=4, max_workers=4)
+        ids = [issue['id'] for issue in scan]
+        assert_that(sorted(ids), is_(equal_to(sorted(i[0] for i in dataset.issues))))
+        assert_that(max(s.count for s in scan.shards), is_(less_than_or_equal_to(15)))
+        assert_that(sum(s.count for s in scan.shards), is_(equal_to(80)))
+
+    def test_shard_split_covers_window(self):
+        shard = IssueShard('#Unresolved', 'A', date(2020, 1, 1), date(2020, 1, 10))
+        left, right = shard.split()
+        assert_that((left.start, left.end, right.start, right.end),
+                    is_(equal_to((date(2020, 1, 1), date(2020, 1, 5), date(2020, 1, 6), date(2020, 1, 10)))))
+        assert_that(left.filter, is_(equal_to('#Unresolved project: {A} created: 2020-01-01 .. 2020-01-05')))
+
+    def test_default_window_covers_server_time_zones(self, connection, transport):
+        filters = []
+        created = datetime(2020, 1, 1, 2, tzinfo=timezone.utc).timestamp() * 1000
+        transport.route('GET', '/rest/issue', lambda q, b, h: (
+            200, b'<issues><issue id="A-1"><field name="created"><value>%d</value></field></issue></issues>' % created))
+        transport.route('GET', '/rest/issue/count',
+                        lambda q, b, h: filters.append(q['filter']) or (200, b'{"value": 1}'))
+        scan = ShardedIssueScan(connection, projects=['A'])
+        list(scan)
+        tomorrow = date.today() + timedelta(days=1)
+        assert_that(filters, is_(equal_to(['project: {A} created: 2019-12-31 .. %s' % tomorrow.isoformat()])))
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import httplib2
+import pytest
+from hamcrest import assert_that, is_, less_than_or_equal_to, equal_to
+
+from youtrack import transport
+from youtrack.connection import Connection
+
+
+class FakeHttp:
+    instances = []
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def __init__(self, **kwargs):
+        FakeHttp.instances.append(self)
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        with FakeHttp.lock:
+            FakeHttp.active += 1
+            FakeHttp.max_active = max(FakeHttp.max_active, FakeHttp.active)
+        time.sleep(0.01)
+        with FakeHttp.lock:
+            FakeHttp.active -= 1
+        return httplib2.Response({'status': '200'}), b''
+
+    def close(self):
+        pass
+
+
+class TestHttpPool:
+    @pytest.fixture(autouse=True)
+    def fake_http(self, monkeypatch):
+        FakeHttp.instances = []
+        FakeHttp.active = 0
+        FakeHttp.max_active = 0
+        monkeypatch.setattr(transport.httplib2, 'Http', FakeHttp)
+
+    def test_pool_bounds_concurrency(self):
+        pool = transport.HttpPool(pool_size=3)
+        threads = [threading.Thread(target=pool.request, args=('http://localhost/',)) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert_that(len(FakeHttp.instances), is_(less_than_or_equal_to(3)))
+        assert_that(FakeHttp.max_active, is_(less_than_or_equal_to(3)))
+
+    def test_pool_reuses_instances(self):
+        pool = transport.HttpPool(pool_size=3)
+        for _ in range(5):
+            pool.request('http://localhost/')
+        assert_that(len(FakeHttp.instances), is_(equal_to(1)))
+
+    def test_invalid_pool_size(self):
+        with pytest.raises(ValueError):
+            transport.HttpPool(pool_size=0)
+
+
+class TestSharedAuth:
+    def test_concurrent_401_logs_in_once(self, monkeypatch):
+        monkeypatch.setattr(transport.httplib2, 'Http', FakeHttp)
+        connection = Connection('http://localhost', api_key='key')
+        connection._credentials = ('user', 'password')
+        logins = []
+        rejected = httplib2.Response({'status': '401'})
+
+        def login(login, password):
+            time.sleep(0.01)
+            logins.append(login)
+            connection.headers = {'Cookie': 'fresh'}
+
+        def request(uri, method='GET', body=None, headers=None, **kwargs):
+            if headers.get('Cookie') != 'fresh':
+                return rejected, b''
+            return httplib2.Response({'status': '200'}), b''
+
+        monkeypatch.setattr(connection, '_login', login)
+        monkeypatch.setattr(connection.http, 'request', request)
+        threads = [threading.Thread(target=connection._req, args=('GET', '/issue/A-1')) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert_that(len(logins), is_(equal_to(1)))
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from hamcrest import assert_that, is_, equal_to, less_than_or_equal_to, instance_of
+
+import youtrack
+from youtrack.retry import RetryPolicy
+
+WORK_ITEMS = (b'<workItems><workItem url="/w/1"><date>1500000000000</date><duration>30</duration>'
+              b'<description>fix &amp; test</description><worktype><name>Development</name></worktype>'
+              b'<author login="root"/></workItem></workItems>')
+
+
+class TestBulkWorkItems:
+    def test_export_then_import(self, connection, transport):
+        for i in range(1, 6):
+            transport.route('GET', '/rest/issue/A-%d/timetracking/workitem' % i, WORK_ITEMS)
+        bodies = {}
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def importer(issue_id):
+            def handler(query, body, headers):
+                with lock:
+                    active[0] += 1
+                    active[1] = max(active)
+                    bodies[issue_id] = body
+                # hold the slot so overlapping requests are seen
+                time.sleep(0.01)
+                with lock:
+                    active[0] -= 1
+                return 200, b''
+            return handler
+
+        for i in range(1, 6):
+            transport.route('PUT', '/rest/import/issue/A-%d/workitems' % i, importer('A-%d' % i))
+        transport.route('PUT', '/rest/import/issue/A-6/workitems', lambda q, b, h: (500, b'<error>down</error>'))
+        connection.retry = RetryPolicy(max_attempts=1)
+
+        exported = connection.get_work_items_for_issues(['A-%d' % i for i in range(1, 6)], max_workers=2)
+        assert_that(sorted(exported), is_(equal_to(['A-1', 'A-2', 'A-3', 'A-4', 'A-5'])))
+        exported['A-6'] = exported['A-1']
+
+        result = connection.import_work_items_bulk(exported, max_workers=2)
+        assert_that(sorted(result.done), is_(equal_to(['A-1', 'A-2', 'A-3', 'A-4', 'A-5'])))
+        assert_that(result.work_items, is_(equal_to(5)))
+        assert_that(result.failed['A-6'], is_(instance_of(youtrack.YouTrackException)))
+        assert_that(active[1], is_(less_than_or_equal_to(2)))
+        assert_that(bodies['A-3'], is_(equal_to(
+            b'<workItems><workItem><date>1500000000000</date><duration>30</duration>'
+            b'<description>fix &amp; test</description><worktype><name>Development</name></worktype>'
+            b'<author login="root"></author></workItem></workItems>')))
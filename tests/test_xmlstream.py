@@ -0,0 +1,76 @@
+import random
+import re
+import types
+
+from hamcrest import assert_that, is_, equal_to, instance_of, same_instance
+
+import youtrack
+from youtrack.xmlstream import iter_elements, sanitize, iter_sanitized
+
+COMMENTS = (b'<comments>\n'
+            b'  <comment id="1" author="root" text="first"><replies><comment id="9"/></replies></comment>\n'
+            b'  <comment id="2" author="guest" text="second"/>\n'
+            b'</comments>')
+
+
+ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x84\x86-\x9f\ufdd0-\ufddf\ufffe\uffff]')
+
+
+def noisy_text(seed, length=2000):
+    rnd = random.Random(seed)
+    alphabet = [chr(c) for c in range(0x00, 0x250)]
+    alphabet += ['\u00a0', '\u0416', '\u4e2d', '\ufdd5', '\ufeff', '\ufffe', '\uffff', '\U0001f600']
+    return ''.join(rnd.choice(alphabet) for _ in range(length))
+
+
+class TestSanitize:
+    def test_matches_character_level_removal(self):
+        for seed in range(20):
+            text = noisy_text(seed)
+            expected = ILLEGAL.sub('', text).encode('utf-8')
+            assert_that(sanitize(text.encode('utf-8')), is_(equal_to(expected)))
+
+    def test_clean_body_is_not_copied(self):
+        content = '<issue summary="\u041f\u0440\u0438\u0432\u0435\u0442 \u00a9"/>'.encode('utf-8')
+        assert_that(sanitize(content, 'application/xml'), is_(same_instance(content)))
+
+    def test_non_xml_is_untouched(self):
+        content = b'{"value": "\x07"}'
+        assert_that(sanitize(content, 'application/json'), is_(same_instance(content)))
+
+    def test_chunks_split_inside_sequences(self):
+        for seed in range(5):
+            content = noisy_text(seed).encode('utf-8')
+            chunks = [content[i:i + 3] for i in range(0, len(content), 3)]
+            assert_that(b''.join(iter_sanitized(chunks)), is_(equal_to(sanitize(content))))
+
+
+class TestIterElements:
+    def test_top_level_elements_only(self):
+        elements = list(iter_elements(COMMENTS))
+        assert_that([e.getAttribute('id') for e in elements], is_(equal_to(['1', '2'])))
+        assert_that(len(elements[0].getElementsByTagName('comment')), is_(equal_to(1)))
+
+    def test_chunked_source(self):
+        chunks = [COMMENTS[i:i + 7] for i in range(0, len(COMMENTS), 7)]
+        elements = list(iter_elements(iter(chunks), bufsize=16))
+        assert_that([e.getAttribute('author') for e in elements], is_(equal_to(['root', 'guest'])))
+
+    def test_empty_list(self):
+        assert_that(list(iter_elements(b'<issues/>')), is_(equal_to([])))
+
+
+class TestListEndpoints:
+    def test_iter_all_issues_is_lazy(self, connection, transport):
+        transport.route('GET', '/rest/issue', b'<issues><issue id="A-1"/><issue id="A-2"/></issues>')
+        issues = connection.iter_all_issues('project: A')
+        assert_that(issues, is_(instance_of(types.GeneratorType)))
+        first = next(issues)
+        assert_that(first, is_(instance_of(youtrack.Issue)))
+        assert_that(first['id'], is_(equal_to('A-1')))
+        assert_that([i['id'] for i in issues], is_(equal_to(['A-2'])))
+
+    def test_get_comments(self, connection, transport):
+        transport.route('GET', '/rest/issue/A-1/comment', COMMENTS)
+        comments = connection.get_comments('A-1')
+        assert_that([c['text'] for c in comments], is_(equal_to(['first', 'second'])))
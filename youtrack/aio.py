@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio version of the YouTrack REST API client, requires aiohttp
+"""
+import asyncio
+import base64
+import json
+import urllib.parse
+
+import httplib2
+
+import youtrack
+from youtrack.connection import urlquote, _parse_response, _users_xml, _links_xml, \
+    _import_bad_fields, _work_items_xml, Connection
+from youtrack.identity import AsyncIdentityMap
+from youtrack.importing import IssueBatchResult, bisect_batch_async, iter_issue_batches
+from youtrack.retry import AUTH, RetryPolicy
+from youtrack.xmlstream import iter_elements, sanitize
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncConnection(object):
+    """ Awaitable counterpart of Connection for the read and import methods.
+
+        Returns the same YouTrackObject model classes as Connection. Their helpers that call back into the
+        connection return awaitables here, for the methods this class has: Issue.get_comments(),
+        get_attachments(), get_links(), Attachment.get_content() (bytes) and the user and group lookups.
+        The others (Issue.events(), Project.get_subsystems() and alike) are not available. At most
+        max_concurrency requests are in flight at a time, the rest wait for a free slot.
+
+        Example:
+            async with AsyncConnection(url, login, password) as yt:
+                issues = await asyncio.gather(*[yt.get_issue(i) for i in ids])
+    """
+
+    def __init__(self, url, login=None, password=None, api_key=None, max_concurrency=100, retry=None):
+        if aiohttp is None:
+            raise ImportError('AsyncConnection requires aiohttp')
+        if url:
+            url = url.rstrip('/')
+        self.url = url
+        self.base_url = url + "/rest"
+        self.max_concurrency = max_concurrency
+        self._credentials = (login, password)
+        self._api_key = api_key
+        self.retry = retry if retry is not None else RetryPolicy()
+        # User and Group lookups of the model helpers, awaitable
+        self.identities = AsyncIdentityMap(self)
+        self._semaphore = None
+        self._auth_lock = None
+        self.session = None
+        self.headers = {}
+
+    async def open(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._auth_lock = asyncio.Lock()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency, ssl=False),
+            cookie_jar=aiohttp.CookieJar(unsafe=True))
+        if self._api_key is None:
+            await self._login(*self._credentials)
+        else:
+            self.headers = {'X-YouTrack-ApiKey': self._api_key}
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _login(self, login, password):
+        response, content = await self._request(
+            self.base_url + "/user/login?login=" + urllib.parse.quote_plus(login) + "&password=" +
+            urllib.parse.quote_plus(password), 'POST', {'Content-Length': '0'})
+        if response.status != 200:
+            raise youtrack.YouTrackException('/user/login', response, content)
+        # the session cookie is kept by the session cookie jar
+        self.headers = {'Cache-Control': 'no-cache',
+                        'Authorization': 'Basic ' + base64.b64encode(bytes(login + ':' + password, 'utf-8')).decode()}
+
+    async def _relogin(self, stale_headers):
+        async with self._auth_lock:
+            if self.headers is stale_headers:
+                await self._login(*self._credentials)
+
+    async def _request(self, uri, method, headers, body=None):
+        async with self._semaphore:
+            async with self.session.request(method, uri, headers=headers, data=body) as r:
+                content = await r.read()
+        info = {k.lower(): ', '.join(r.headers.getall(k)) for k in r.headers.keys()}
+        info['status'] = str(r.status)
+        response = httplib2.Response(info)
+        response.reason = r.reason
+        return response, content
+
+    async def _req(self, method, url, body=None, ignore_status=None, content_type=None, accept_header=None):
+        # same decisions as RetryPolicy.call(), with waits that don't block the loop
+        tries = 0
+        relogged = False
+        while True:
+            probe = self.retry.check()
+            headers = self.headers
+            try:
+                result = await self._req_once(method, url, body, ignore_status, content_type, accept_header)
+            except Exception as e:
+                retry = self.retry.failed(e, tries, method)
+                if retry is None:
+                    raise
+                kind, delay = retry
+                if kind == AUTH:
+                    if relogged or self._api_key is not None:
+                        raise
+                    await self._relogin(headers)
+                    relogged = True
+                if delay:
+                    await asyncio.sleep(delay)
+                tries += 1
+            else:
+                self.retry.succeeded()
+                return result
+            finally:
+                self.retry.abandon(probe)
+
+    async def _req_once(self, method, url, body, ignore_status, content_type, accept_header):
+        headers = self.headers.copy()
+        if method == 'PUT' or method == 'POST':
+            if content_type is None:
+                content_type = 'application/xml; charset=UTF-8'
+            headers['Content-Type'] = content_type
+            headers['Content-Length'] = str(len(body)) if body else '0'
+
+        if accept_header is not None:
+            headers['Accept'] = accept_header
+
+        response, content = await self._request(self.base_url + url, method, headers, body)
+        content = sanitize(content, response.get('content-type'))
+        if response.status != 200 and response.status != 201 and (ignore_status != response.status):
+            raise youtrack.YouTrackException(url, response, content)
+
+        return response, content
+
+    async def _req_xml(self, method, url, body=None, ignore_status=None):
+        response, content = await self._req(method, url, body, ignore_status)
+        return _parse_response(method, response, content)
+
+    async def _get(self, url):
+        return await self._req_xml('GET', url)
+
+    async def _get_list(self, url, cls, **kwargs):
+        response, content = await self._req('GET', url, **kwargs)
+        return [cls(e, self) for e in iter_elements(content)]
+
+    async def get_issue(self, _id):
+        return youtrack.Issue(await self._get("/issue/" + _id), self)
+
+    async def get_issues(self, project_id, _filter, after, _max, updated_after=None, wikify=None):
+        params = {'after': str(after),
+                  'max': str(_max),
+                  'filter': _filter}
+        if updated_after is not None:
+            params['updatedAfter'] = updated_after
+        if wikify is not None:
+            params['wikifyDescription'] = wikify
+        return await self._get_list('/issue/byproject/' + urlquote(project_id) + "?" +
+                                    urllib.parse.urlencode(params), youtrack.Issue)
+
+    async def get_all_issues(self, _filter='', after=0, _max=999999, with_fields=()):
+        url_jobby = [('with', field) for field in with_fields] + \
+                    [('after', str(after)),
+                     ('max', str(_max)),
+                     ('filter', _filter)]
+        return await self._get_list('/issue' + "?" + urllib.parse.urlencode(url_jobby), youtrack.Issue)
+
+    async def get_number_of_issues(self, _filter='', wait_for_server=True):
+        final_url = '/issue/count?' + urllib.parse.urlencode([('filter', _filter)])
+        while True:
+            response, content = await self._req('GET', final_url, accept_header='application/json')
+            number_of_issues = json.loads(content.replace(b'callback', b'').strip(b'();'))['value']
+            if not wait_for_server or number_of_issues != -1:
+                return number_of_issues
+            await asyncio.sleep(5)
+
+    async def get_changes_for_issue(self, issue):
+        return [youtrack.IssueChange(change, self) for change in
+                (await self._get("/issue/%s/changes" % issue)).getElementsByTagName('change')]
+
+    def get_comments(self, _id):
+        # a task, not a coroutine: Issue.get_comments() keeps it, to be awaited again by later calls
+        return asyncio.ensure_future(self._get_list('/issue/' + _id + '/comment', youtrack.Comment))
+
+    async def get_attachments(self, _id):
+        return await self._get_list('/issue/' + _id + '/attachment', youtrack.Attachment)
+
+    async def get_attachment_content(self, url):
+        """ Content of the attachment at url, bytes """
+        response, content = await self._request(self.url + url, 'GET', dict(self.headers))
+        if response.status != 200:
+            raise youtrack.YouTrackException(url, response, content)
+        return content
+
+    async def get_links(self, _id, outward_only=False):
+        links = await self._get_list('/issue/' + urlquote(_id) + '/link', youtrack.Link)
+        return [link for link in links if link.source == _id or not outward_only]
+
+    async def export_issue_links(self):
+        return await self._get_list('/export/links', youtrack.Link)
+
+    async def get_work_items(self, issue_id):
+        try:
+            return await self._get_list('/issue/%s/timetracking/workitem' % urlquote(issue_id), youtrack.WorkItem,
+                                        accept_header='application/xml; charset=UTF-8')
+        except youtrack.YouTrackException as e:
+            print("Can't get work items.", str(e))
+            return []
+
+    async def get_user(self, login):
+        return youtrack.User(await self._get("/admin/user/" + urlquote(login.encode('utf8'))), self)
+
+    async def get_users_ten(self, start):
+        return await self._get_list("/admin/user/?start=%s" % str(start), youtrack.User)
+
+    async def get_group(self, name):
+        return youtrack.Group(await self._get("/admin/group/" + urlquote(name.encode('utf-8'))), self)
+
+    async def get_groups(self):
+        return await self._get_list('/admin/group', youtrack.Group)
+
+    async def get_project(self, project_id):
+        return youtrack.Project(await self._get("/admin/project/" + urlquote(project_id)), self)
+
+    async def get_project_ids(self):
+        response, content = await self._req('GET', '/admin/project/')
+        return [e.getAttribute('id') for e in iter_elements(content)]
+
+    async def get_project_time_tracking_settings(self, project_id):
+        try:
+            cont = await self._get('/admin/project/' + project_id + '/timetracking')
+            return youtrack.ProjectTimeTrackingSettings(cont, self)
+        except youtrack.YouTrackException as e:
+            if e.response.status != 404:
+                raise e
+
+    async def get_builds(self, project_id):
+        return await self._get_list('/admin/project/' + urlquote(project_id) + '/build', youtrack.Build)
+
+    async def get_version(self, project_id, name):
+        return youtrack.Version(
+            await self._get("/admin/project/" + urlquote(project_id) + "/version/" + urlquote(name)), self)
+
+    async def get_versions(self, project_id):
+        xml = await self._get('/admin/project/' + urlquote(project_id) + '/version?showReleased=true')
+        return await asyncio.gather(*[self.get_version(project_id, v.getAttribute('name')) for v in
+                                      xml.documentElement.getElementsByTagName('version')])
+
+    async def get_custom_field(self, name):
+        return youtrack.CustomField(await self._get("/admin/customfield/field/" + urlquote(name.encode('utf-8'))),
+                                    self)
+
+    async def get_custom_fields(self):
+        response, content = await self._req('GET', '/admin/customfield/field')
+        return await asyncio.gather(*[self.get_custom_field(e.getAttribute('name')) for e in iter_elements(content)])
+
+    async def get_project_custom_field(self, project_id, name):
+        if isinstance(name, str):
+            name = name.encode('utf8')
+        return youtrack.ProjectCustomField(
+            await self._get("/admin/project/" + urlquote(project_id) + "/customfield/" + urlquote(name)), self)
+
+    async def get_project_custom_fields(self, project_id):
+        xml = await self._get('/admin/project/' + urlquote(project_id) + '/customfield')
+        return await asyncio.gather(*[self.get_project_custom_field(project_id, e.getAttribute('name')) for e in
+                                      xml.getElementsByTagName('projectCustomField')])
+
+    async def get_bundle(self, field_type, name):
+        field_type = Connection.get_field_type(field_type)
+        response = await self._get('/admin/customfield/%s/%s' % (Connection.bundle_paths[field_type],
+                                                                 urlquote(name.encode('utf-8'))))
+        return Connection.bundle_types[field_type](response, self)
+
+    async def import_users(self, users):
+        if len(users) <= 0:
+            return
+        for u in users:
+            self.identities.discard_user(u['login'])
+        return (await self._req_xml('PUT', '/import/users', _users_xml(users), 400)).toxml()
+
+    async def import_links(self, links):
+        res = await self._req_xml('PUT', '/import/links', _links_xml(links), 400)
+        return res.toxml() if hasattr(res, "toxml") else res
+
+    async def import_issues_xml(self, project_id, assignee_group, xml):
+        return (await self._req_xml('PUT', '/import/' + urlquote(project_id) + '/issues?' +
+                                    urllib.parse.urlencode({'assigneeGroup': assignee_group}),
+                                    xml, 400)).toxml()
+
+    async def import_issues(self, project_id, assignee_group, issues):
+        """ Import issues, returns import result as xml string.
+            A batch rejected as a whole is halved until the offending issues are isolated, as by
+            Connection.iter_import_issues(); the halves are sent concurrently.
+        """
+        if len(issues) <= 0:
+            return
+        bad_fields = _import_bad_fields(await self.get_project_time_tracking_settings(project_id))
+        url = '/import/' + urlquote(project_id) + '/issues?' + urllib.parse.urlencode({'assigneeGroup': assignee_group})
+
+        async def send(batch):
+            return IssueBatchResult(batch, await self._req_xml('PUT', url, batch.body(), 400))
+
+        batch = next(iter_issue_batches(issues, bad_fields, None, None))
+        result = Connection._merge_issue_results(project_id, await bisect_batch_async(send, batch))
+        return result.toxml() if hasattr(result, "toxml") else result
+
+    async def import_work_items(self, issue_id, work_items):
+        xml = _work_items_xml(work_items)
+        if xml:
+            await self._req_xml('PUT', '/import/issue/%s/workitems' % urlquote(issue_id), xml)
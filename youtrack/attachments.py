@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk transfer of issue attachments
+"""
+import calendar
+import collections
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+import httplib2
+
+import youtrack
+from youtrack.multipart import MultipartBody
+
+MANIFEST = 'manifest.json'
+
+
+def attachment_key(attachment):
+    """ Attachment id, or a digest of its url for attachments listed without one """
+    return attachment.get('id', None) or hashlib.sha1(attachment['url'].encode('utf-8')).hexdigest()[:16]
+
+
+def _stream_to(connection, url, f, chunk_size=2 ** 16):
+    # writes the content at url to binary file f, returns its content type
+    with connection.http.stream(connection.url + url, headers=dict(connection.headers)) as response:
+        if response.status != 200:
+            raise youtrack.YouTrackException(url, httplib2.Response(response), response.read())
+        for chunk in iter(lambda: response.read(chunk_size), b''):
+            f.write(chunk)
+        return response.getheader('Content-Type')
+
+
+def _name(attachment):
+    return attachment.get('name', None) or 'attachment'
+
+
+def _size(content):
+    return len(content) if isinstance(content, bytes) else content.length
+
+
+def _file_name(attachment):
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', _name(attachment))
+    return '%s-%s' % (attachment_key(attachment), name)
+
+
+def _content_range(response):
+    # (first byte, total size) of a Content-Range header, None for what it doesn't tell
+    match = re.match(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)', response.getheader('Content-Range') or '')
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    return int(start) if start is not None else None, int(total) if total != '*' else None
+
+
+class DownloadResult(object):
+    """ Outcome of AttachmentDownloader.download(): manifest entries of the files on disk by attachment id,
+        ids of attachments downloaded, resumed, deduplicated (served from the blob store without a request) and
+        skipped as already complete, and failed ones mapped to the error
+    """
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.downloaded = []
+        self.resumed = []
+        self.deduplicated = []
+        self.skipped = []
+        self.failed = {}
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __repr__(self):
+        return '<DownloadResult downloaded=%d resumed=%d deduplicated=%d skipped=%d failed=%d>' % (
+            len(self.downloaded), len(self.resumed), len(self.deduplicated), len(self.skipped), len(self.failed))
+
+
+class AttachmentDownloader(object):
+    """ Streams attachments to files in directory, max_workers at a time, over the connection's pool.
+
+        Each attachment is written to '<id>-<name>' chunk by chunk, through a '.part' file renamed once complete.
+        An interrupted download is resumed from the size of its '.part' file with a Range request. A manifest
+        (manifest.json in directory) records path, size and SHA-256 of every complete file. Attachments listed in it
+        whose file is still there with the recorded size are not requested again.
+
+        With a BlobStore, content is fetched into the store and the files are hard links to (or copies of) the
+        stored blobs; an url fetched once, in this run or an earlier one, is not requested again. Downloads into the
+        store are not resumed.
+
+        Example:
+            downloader = AttachmentDownloader(connection, '/backup/attachments', max_workers=16)
+            result = downloader.download(a for issue_id in ids for a in connection.iter_attachments(issue_id))
+    """
+
+    def __init__(self, connection, directory, max_workers=8, chunk_size=2 ** 16, store=None):
+        self.connection = connection
+        self.store = store
+        self.directory = directory
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        # a lock per file name: attachments listed twice must not write to one part file at once
+        self._writing = collections.defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_manifest(self, manifest):
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+
+    def _complete(self, entry):
+        path = os.path.join(self.directory, entry['path'])
+        return os.path.isfile(path) and os.path.getsize(path) == entry['size']
+
+    def _fetch_stored(self, attachment):
+        url = attachment['url']
+        digest, _, fetched = self.store.fetch(self.connection.url + url, lambda f: _stream_to(
+            self.connection, url, f, self.chunk_size))
+        name = _file_name(attachment)
+        self.store.copy_to(digest, os.path.join(self.directory, name))
+        entry = {'path': name, 'size': self.store.size(digest), 'sha256': digest, 'url': url}
+        return entry, 'downloaded' if fetched else 'deduplicated'
+
+    def fetch(self, attachment):
+        """ Downloads one attachment, returns (manifest entry, 'downloaded', 'resumed' or 'deduplicated') """
+        if self.store is not None:
+            return self._fetch_stored(attachment)
+        name = _file_name(attachment)
+        with self._lock:
+            lock = self._writing[name]
+        with lock:
+            return self._fetch(attachment, name)
+
+    def _fetch(self, attachment, name):
+        path = os.path.join(self.directory, name)
+        part = path + '.part'
+        digest = hashlib.sha256()
+        size = 0
+        if os.path.exists(part):
+            with open(part, 'rb') as f:
+                for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                    digest.update(chunk)
+                    size += len(chunk)
+        resumed = size > 0
+        headers = dict(self.connection.headers)
+        if resumed:
+            headers['Range'] = 'bytes=%d-' % size
+        url = attachment['url']
+        with self.connection.http.stream(self.connection.url + url, headers=headers) as response:
+            if resumed and response.status in (206, 416):
+                start, total = _content_range(response)
+                # the part file is to be continued from its end, or holds the whole content already
+                stale = start != size if response.status == 206 else total != size
+            else:
+                stale = False
+            if response.status == 416 and resumed:
+                response.read()
+            elif stale:
+                # not read: the connection is closed along with the rest of the body
+                pass
+            elif response.status not in (200, 206):
+                raise youtrack.YouTrackException(url, httplib2.Response(response), response.read())
+            else:
+                if response.status == 200 and resumed:
+                    # the server ignored the range, start over
+                    digest = hashlib.sha256()
+                    size = 0
+                    resumed = False
+                with open(part, 'ab' if resumed else 'wb') as f:
+                    for chunk in iter(lambda: response.read(self.chunk_size), b''):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+        if stale:
+            # the content changed since the part file was written, start over
+            os.remove(part)
+            return self._fetch(attachment, name)
+        os.replace(part, path)
+        return {'path': name, 'size': size, 'sha256': digest.hexdigest(), 'url': url}, \
+            'resumed' if resumed else 'downloaded'
+
+    def download(self, attachments):
+        """ Downloads the attachments of any iterable, returns DownloadResult. The manifest is saved when done,
+            and every 100 completed files before that.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = self.load_manifest()
+        result = DownloadResult(manifest)
+
+        def pending():
+            for attachment in attachments:
+                entry = manifest.get(attachment_key(attachment))
+                if entry is not None and self._complete(entry):
+                    result.skipped.append(attachment_key(attachment))
+                else:
+                    yield (attachment,)
+
+        completed = 0
+        for (attachment,), outcome in self.connection._map_bounded(self.fetch, pending(), self.max_workers):
+            key = attachment_key(attachment)
+            if isinstance(outcome, Exception):
+                result.failed[key] = outcome
+                continue
+            entry, how = outcome
+            manifest[key] = entry
+            getattr(result, how).append(key)
+            completed += 1
+            if completed % 100 == 0:
+                self.save_manifest(manifest)
+        self.save_manifest(manifest)
+        if self.store is not None:
+            self.store.save()
+        return result
+
+
+class ByteBudget(object):
+    """ Bounds the bytes held in memory at a time. acquire(n) blocks until n more bytes fit in the limit; an amount
+        larger than the whole limit is let through once nothing else is held, so it can't block forever.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size):
+        with self._cond:
+            self._cond.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+
+    def try_acquire(self, size):
+        """ acquire() without waiting, False when size doesn't fit now """
+        with self._cond:
+            if self.used and self.used + size > self.limit:
+                return False
+            self.used += size
+            return True
+
+    def release(self, size):
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
+class MigrationResult(object):
+    """ Outcome of AttachmentMigration.migrate(): (issue id, attachment key) of the attachments migrated and of
+        those among them whose content came from the blob store without a request, failed ones mapped to the error,
+        and the bytes uploaded
+    """
+
+    def __init__(self):
+        self.migrated = []
+        self.deduplicated = []
+        self.failed = {}
+        self.bytes = 0
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __repr__(self):
+        return '<MigrationResult migrated=%d failed=%d bytes=%d>' % (len(self.migrated), len(self.failed), self.bytes)
+
+
+class AttachmentMigration(object):
+    """ Copies attachments from the source connection to issues of the target connection.
+
+        Downloads and uploads run on pools of their own and overlap: an attachment is uploaded as soon as it was
+        downloaded while the next ones are still being fetched. Content is held in memory between the two, and
+        max_buffered_bytes bounds how much of it at a time; downloads wait while the budget is spent. Content of
+        unknown length is read into memory while it fits and spilled to a temporary file past that. Attachments
+        without a creation time get the creation time of the target issue, requested once per issue.
+
+        With a BlobStore, content is downloaded to the store instead of memory, once per url, and uploaded from the
+        stored file. Every attachment is still uploaded, the target has no means to share content between them.
+
+        Example:
+            migration = AttachmentMigration(source, target, max_buffered_bytes=2 ** 27)
+            result = migration.migrate((issue_id, a) for issue_id in ids for a in source.iter_attachments(issue_id))
+    """
+
+    def __init__(self, source, target, download_workers=4, upload_workers=4, max_buffered_bytes=64 * 2 ** 20,
+                 store=None):
+        self.source = source
+        self.store = store
+        self.target = target
+        self.download_workers = download_workers
+        self.upload_workers = upload_workers
+        self.budget = ByteBudget(max_buffered_bytes)
+        self._created = {}
+        self._lock = threading.Lock()
+
+    def issue_created(self, issue_id):
+        """ Creation time of a target issue, or the current time when it can't be read """
+        with self._lock:
+            future = self._created.get(issue_id)
+            owner = future is None
+            if owner:
+                future = self._created[issue_id] = concurrent.futures.Future()
+        if owner:
+            try:
+                created = self.target.get_issue(issue_id)['created']
+            except youtrack.YouTrackException:
+                created = str(calendar.timegm(time.gmtime()) * 1000)
+            except BaseException as e:
+                # not cached, the next attachment of the issue asks again
+                with self._lock:
+                    del self._created[issue_id]
+                future.set_exception(e)
+                raise
+            future.set_result(created)
+        return future.result()
+
+    @staticmethod
+    def _spill(attachment, response, chunks=(), chunk_size=2 ** 16):
+        # the chunks read so far and the rest of the body in a temporary file, as a body uploading it
+        spill = tempfile.TemporaryFile()
+        try:
+            spill.writelines(chunks)
+            for chunk in iter(lambda: response.read(chunk_size), b''):
+                spill.write(chunk)
+            spill.seek(0)
+        except BaseException:
+            spill.close()
+            raise
+        return MultipartBody(_name(attachment), spill, response.getheader('Content-Type'))
+
+    def _read_unsized(self, attachment, response, chunk_size=2 ** 16):
+        # content of unknown length: kept in memory while the budget allows, spilled to a temporary file past it
+        chunks = []
+        held = 0
+        try:
+            for chunk in iter(lambda: response.read(chunk_size), b''):
+                chunks.append(chunk)
+                if not self.budget.try_acquire(len(chunk)):
+                    break
+                held += len(chunk)
+            else:
+                held = 0
+                return b''.join(chunks)
+            return self._spill(attachment, response, chunks, chunk_size)
+        finally:
+            # what is returned in memory stays charged to the budget until uploaded
+            self.budget.release(held)
+
+    def download(self, attachment):
+        """ Content of the attachment and its content type. The content is bytes charged to the byte budget, or a
+            MultipartBody reading a temporary file for content that doesn't fit in the budget at the time.
+        """
+        url = attachment['url']
+        with self.source.http.stream(self.source.url + url, headers=dict(self.source.headers)) as response:
+            if response.status != 200:
+                raise youtrack.YouTrackException(url, httplib2.Response(response), response.read())
+            length = response.getheader('Content-Length')
+            if length is None:
+                content = self._read_unsized(attachment, response)
+            elif int(length) > self.budget.limit or not self.budget.try_acquire(int(length)):
+                content = self._spill(attachment, response)
+            else:
+                try:
+                    content = response.read()
+                except BaseException:
+                    self.budget.release(int(length))
+                    raise
+                # the actual size is what gets released
+                self.budget.release(int(length) - len(content))
+            return content, response.getheader('Content-Type')
+
+    def upload(self, issue_id, attachment, content, content_type):
+        """ Uploads content, bytes or a MultipartBody, as the attachment to the target issue """
+        created = attachment.get('created', None) or self.issue_created(issue_id)
+        author = attachment.get('authorLogin', None) or ''
+        size = _size(content)
+        if isinstance(content, bytes):
+            content = io.BytesIO(content)
+        return self.target.import_attachment(issue_id, _name(attachment), content, author, content_type, size,
+                                             created=created, group=attachment.get('group', None) or '')
+
+    def _download(self, issue_id, attachment):
+        # (content, content type, fetched): bytes in memory, or a body reading the blob store
+        if self.store is None:
+            return self.download(attachment) + (True,)
+        digest, content_type, fetched = self.store.fetch(self.source.url + attachment['url'], lambda f: _stream_to(
+            self.source, attachment['url'], f))
+        return self.store.body(digest, _name(attachment), content_type), content_type, fetched
+
+    def _upload(self, issue_id, attachment, content, content_type):
+        try:
+            return self.upload(issue_id, attachment, content, content_type)
+        finally:
+            if isinstance(content, bytes):
+                self.budget.release(len(content))
+            else:
+                content.close()
+
+    def transfer(self, issue_id, attachment):
+        """ Copies one attachment, returns the target's response """
+        content, content_type, _ = self._download(issue_id, attachment)
+        return self._upload(issue_id, attachment, content, content_type)
+
+    def migrate(self, items):
+        """ Copies attachments given as (target issue id, Attachment) pairs from any iterable,
+            returns MigrationResult
+        """
+        result = MigrationResult()
+        uploads = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.upload_workers) as pool:
+            downloads = self.source._map_bounded(self._download, items, self.download_workers)
+            for (issue_id, attachment), outcome in downloads:
+                key = (issue_id, attachment_key(attachment))
+                if isinstance(outcome, Exception):
+                    result.failed[key] = outcome
+                    continue
+                content, content_type, fetched = outcome
+                future = pool.submit(self._upload, issue_id, attachment, content, content_type)
+                uploads[future] = key, _size(content), fetched
+            for future in concurrent.futures.as_completed(uploads):
+                key, size, fetched = uploads[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    result.failed[key] = e
+                else:
+                    result.migrated.append(key)
+                    if not fetched:
+                        result.deduplicated.append(key)
+                    result.bytes += size
+        if self.store is not None:
+            self.store.save()
+        return result
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Content addressed store of attachment content on local disk
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from youtrack.multipart import MultipartBody
+
+INDEX = 'index.json'
+
+
+class _HashingWriter(object):
+    # binary file wrapper hashing what is written through it
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.f.write(data)
+
+
+class BlobStore(object):
+    """ Files on disk named after the SHA-256 of their content, each stored once whatever number of urls it was
+        fetched from.
+
+        fetch() maps a key, such as the url of an attachment, to the digest of its content. Content is downloaded
+        and hashed the first time a key is fetched, and the same content fetched under another key is kept in the
+        file already there. Concurrent fetches of one key download it once. The key index is written to index.json
+        in directory by save(), so a store opened on the same directory later serves the keys fetched before.
+
+        Example:
+            store = BlobStore('/var/cache/youtrack-blobs')
+            downloader = AttachmentDownloader(connection, '/backup/attachments', store=store)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX)
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {}
+        self.hits = 0
+        self.fetched = 0
+        self._fetching = {}
+        self._lock = threading.Lock()
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def __contains__(self, digest):
+        return os.path.isfile(self.path(digest))
+
+    def size(self, digest):
+        return os.path.getsize(self.path(digest))
+
+    def lookup(self, key):
+        """ (digest, content type) of the content stored for key, or None """
+        with self._lock:
+            entry = self.index.get(key)
+        if entry is not None and entry[0] in self:
+            return tuple(entry)
+        return None
+
+    def add(self, download):
+        """ Stores the content download(f) writes to binary file f, returns (digest, value returned by download) """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer = _HashingWriter(f)
+                value = download(writer)
+            digest = writer.digest.hexdigest()
+            path = self.path(digest)
+            if os.path.exists(path):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return digest, value
+
+    def fetch(self, key, download):
+        """ (digest, content type, fetched) for key. Unless the content is stored already, download(f) is called to
+            write it to binary file f and return its content type; fetched tells whether it was.
+        """
+        entry = self.lookup(key)
+        if entry is not None:
+            with self._lock:
+                self.hits += 1
+            return entry + (False,)
+        with self._lock:
+            future = self._fetching.get(key)
+            owner = future is None
+            if owner:
+                future = self._fetching[key] = concurrent.futures.Future()
+        if not owner:
+            with self._lock:
+                self.hits += 1
+            return future.result() + (False,)
+        try:
+            digest, content_type = self.add(download)
+        except BaseException as e:
+            with self._lock:
+                del self._fetching[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self.index[key] = [digest, content_type]
+            self.fetched += 1
+            del self._fetching[key]
+        future.set_result((digest, content_type))
+        return digest, content_type, True
+
+    def copy_to(self, digest, path):
+        """ Puts a copy of the content at path, which may be edited without changing the store """
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, open(self.path(digest), 'rb') as blob:
+                shutil.copyfileobj(blob, f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def body(self, digest, name, content_type=None):
+        """ MultipartBody uploading the stored content, see Connection.import_attachment() """
+        return MultipartBody.from_path(self.path(digest), name, content_type)
+
+    def save(self):
+        with self._lock:
+            index = dict(self.index)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.index_path)
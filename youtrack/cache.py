@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import collections
+import re
+import threading
+import time
+
+# resources read back from what the import API writes, None for all
+_IMPORTED = (
+    (re.compile(r'^/import/users$'), lambda m: ['/admin/user']),
+    (re.compile(r'^/import/issue/([^/]+)(/.*)?$'), lambda m: ['/issue/' + m.group(1)]),
+    (re.compile(r'^/import/links$'), lambda m: ['/issue']),
+    (re.compile(r'^/import/[^/]+/issues$'), lambda m: ['/issue']),
+    (re.compile(r'^/import/([^/]+)/attachment$'), lambda m: ['/issue/' + m.group(1)]),
+    (re.compile(r'^/import(/.*)?$'), lambda m: None),
+)
+
+# lists and counts of issues, which a write to any issue may change
+_ISSUE_LISTS = ['/issue/byproject', '/issue/count', '/issue/intellisense']
+
+
+def _written_paths(path):
+    # paths whose entries a write to path makes stale, None for all
+    for pattern, paths in _IMPORTED:
+        match = pattern.match(path)
+        if match:
+            paths = paths(match)
+            break
+    else:
+        paths = [path]
+    if paths is not None and any(p.startswith('/issue/') for p in paths):
+        # '/issue' itself, the issues of a filter, is dropped as the resource the issue is nested in
+        paths += _ISSUE_LISTS
+    return paths
+
+
+class CacheEntry(object):
+    __slots__ = ('response', 'content', 'stored')
+
+    def __init__(self, response, content, stored):
+        self.response = response
+        self.content = content
+        self.stored = stored
+
+    @property
+    def validators(self):
+        headers = {}
+        if 'etag' in self.response:
+            headers['If-None-Match'] = self.response['etag']
+        if 'last-modified' in self.response:
+            headers['If-Modified-Since'] = self.response['last-modified']
+        return headers
+
+
+class ResponseCache(object):
+    """ LRU cache of GET responses for Connection, bounded by entry count and total body size.
+
+        Entries younger than ttl seconds are served without a request. Older ones are revalidated with
+        If-None-Match / If-Modified-Since when the server sent an ETag or Last-Modified, and fetched again
+        otherwise. PUT, POST and DELETE requests drop the entries of the written resource, its sub-resources and
+        the resources it belongs to, both before they are sent and once answered; writes to the import API drop
+        the entries of the resources they import (users, issues). Writes to an issue drop the issue lists and
+        counts as well. A GET response is not kept when an invalidation happened while it was in flight. Bodies
+        larger than max_entry_size are not kept. Bodies are kept as bytes and parsed for every caller, who may
+        change what they get.
+
+        Example:
+            connection = Connection(url, api_key=key, cache=ResponseCache(ttl=300))
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 2 ** 20, max_entry_size=2 ** 20, ttl=60, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_size = max_entry_size
+        self.ttl = ttl
+        self.clock = clock
+        self.size = 0
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        # counts invalidations, see put()
+        self.generation = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Returns (entry, fresh), entry is None when nothing is cached for the key """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            fresh = self.clock() - entry.stored < self.ttl
+            if fresh:
+                self.hits += 1
+            return entry, fresh
+
+    def put(self, key, response, content, generation=None):
+        """ Stores a response. generation is the value of self.generation when the request was sent: the response
+            may predate a write then and is not stored if anything was invalidated since.
+        """
+        if len(content) > self.max_entry_size or 'no-store' in response.get('cache-control', ''):
+            self.discard(key)
+            return None
+        entry = CacheEntry(response, content, self.clock())
+        with self._lock:
+            self._remove(key)
+            if generation is not None and generation != self.generation:
+                return entry
+            self._entries[key] = entry
+            self.size += len(content)
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+        return entry
+
+    def revalidated(self, key, entry):
+        """ Marks an entry confirmed by a 304 response as fresh again """
+        with self._lock:
+            entry.stored = self.clock()
+            self.revalidations += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry.content)
+
+    def discard(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate(self, url):
+        """ Drops entries for url, the resources below it and the resources it is nested in """
+        paths = _written_paths(url.split('?', 1)[0].rstrip('/'))
+        with self._lock:
+            self.generation += 1
+            for key in list(self._entries):
+                cached = key[0].split('?', 1)[0].rstrip('/')
+                if paths is None or any(cached == path or cached.startswith(path + '/') or
+                                        path.startswith(cached + '/') for path in paths):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Column-by-column storage of issue query results, NumPy arrays are available when NumPy is installed
+"""
+from array import array
+
+from youtrack.youtrack import EXISTING_FIELD_TYPES
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NULL = -2 ** 63
+DICTIONARY_TYPES = ('CustomFieldValue', 'SingleUserField', 'MultiUserField')
+DICTIONARY_FIELDS = ('projectShortName',)
+
+
+def _require_numpy():
+    if numpy is None:
+        raise ImportError('NumPy is required for to_numpy()')
+
+
+class Column(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def append(self, value):
+        raise NotImplementedError
+
+    def pad(self, length):
+        while len(self) < length:
+            self.append(None)
+
+    def to_numpy(self):
+        raise NotImplementedError
+
+
+class IntColumn(Column):
+    """ int64 values, missing ones are stored as NULL """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.values = array('q')
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        value = self.values[i]
+        return None if value == NULL else value
+
+    def append(self, value):
+        try:
+            self.values.append(int(value) if value is not None else NULL)
+        except (TypeError, ValueError):
+            self.values.append(NULL)
+
+    def to_numpy(self):
+        _require_numpy()
+        # a copy: a view would keep the array from growing with later appends
+        return numpy.array(self.values, dtype=numpy.int64)
+
+    def mask(self):
+        """ True for rows holding a value """
+        _require_numpy()
+        return self.to_numpy() != NULL
+
+
+class DateColumn(IntColumn):
+    """ milliseconds since epoch, as datetime64[ms] in NumPy with NaT for missing values """
+
+    def to_numpy(self):
+        return super().to_numpy().view('datetime64[ms]')
+
+    def mask(self):
+        _require_numpy()
+        return super().to_numpy() != NULL
+
+
+class DictionaryColumn(Column):
+    """ Dictionary-encoded values: a code per row pointing into categories, -1 for missing.
+        A multi-valued row is encoded as one category holding the tuple of its values.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.codes = array('i')
+        self.categories = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return None if code < 0 else self.categories[code]
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        if isinstance(value, list):
+            value = tuple(value)
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def to_numpy(self):
+        _require_numpy()
+        return numpy.array(self.codes, dtype=numpy.int32)
+
+
+class ObjectColumn(Column):
+    def __init__(self, name):
+        super().__init__(name)
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def append(self, value):
+        self.values.append(value)
+
+    def to_numpy(self):
+        _require_numpy()
+        result = numpy.empty(len(self.values), dtype=object)
+        result[:] = self.values
+        return result
+
+
+class IssueColumns(object):
+    """ Issues stored as one column per field.
+
+        integer and date fields of EXISTING_FIELD_TYPES become int64 columns, enum and user custom fields and
+        project short names become dictionary-encoded columns, other fields are kept as Python objects.
+        Issues are consumed one at a time, so a generator such as Connection.iter_issues() is never
+        materialized as a list.
+
+        Example:
+            columns = IssueColumns.from_issues(connection.iter_issues('project: A', page_size=500))
+            states = columns['State']
+            open_count = (states.to_numpy() == states.categories.index('Open')).sum()
+    """
+
+    def __init__(self, fields=None, dictionary_fields=DICTIONARY_FIELDS):
+        self.fields = set(fields) if fields is not None else None
+        self.dictionary_fields = set(dictionary_fields)
+        self.columns = {}
+        self.length = 0
+
+    @classmethod
+    def from_issues(cls, issues, fields=None, dictionary_fields=DICTIONARY_FIELDS):
+        columns = cls(fields, dictionary_fields)
+        columns.extend(issues)
+        return columns
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def _column_type(self, name, attribute_type):
+        field_type = EXISTING_FIELD_TYPES.get(name)
+        if field_type == 'integer':
+            return IntColumn
+        if field_type == 'date':
+            return DateColumn
+        if name in self.dictionary_fields or attribute_type in DICTIONARY_TYPES or \
+                (field_type is not None and field_type.startswith('user')):
+            return DictionaryColumn
+        return ObjectColumn
+
+    def _column(self, name, attribute_type):
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = self._column_type(name, attribute_type)(name)
+            column.pad(self.length)
+        return column
+
+    def append(self, issue):
+        attribute_types = issue._attribute_types
+        for name in issue._data:
+            if self.fields is not None and name not in self.fields:
+                continue
+            self._column(name, attribute_types.get(name)).append(issue[name])
+        self.length += 1
+        for column in self.columns.values():
+            if len(column) < self.length:
+                column.append(None)
+
+    def extend(self, issues):
+        for issue in issues:
+            self.append(issue)
+
+    def to_numpy(self):
+        """ dict of field name to NumPy array """
+        return {name: column.to_numpy() for name, column in self.columns.items()}
@@ -2,22 +2,28 @@
 import calendar
 import time
 from datetime import datetime
-import httplib2
 from xml.dom import minidom
 import sys
 import youtrack
-from xml.dom import Node
 import urllib
 import urllib.parse
 import urllib.request
 import urllib.error
 from xml.sax.saxutils import escape, quoteattr
 import json
-import tempfile
 import functools
-import re
-import io
 import base64
+import collections
+import threading
+import concurrent.futures
+from youtrack.identity import IdentityMap
+from youtrack.importing import _import_bad_fields, _issue_xml, iter_issue_batches, bisect_batch, dedup_links, \
+    IssueBatchResult, LinkBatchResult, WorkItemsResult  # noqa: F401
+from youtrack.attachments import AttachmentMigration
+from youtrack.multipart import MultipartBody
+from youtrack.retry import RetryPolicy, SERVER, THROTTLED, TRANSPORT
+from youtrack.transport import HttpPool
+from youtrack.xmlstream import iter_elements, sanitize
 
 
 def urlquote(s):
@@ -30,30 +36,98 @@ def utf8encode(source):
     return source
 
 
-def relogin_on_401(f):
-    @functools.wraps(f)
-    def wrapped(self, *args, **kwargs):
-        attempts = 10
-        while attempts:
+def _parse_response(method, response, content):
+    if 'content-type' in response:
+        if (response["content-type"].find('application/xml') != -1 or response["content-type"].find(
+                'text/xml') != -1) and content:
             try:
-                return f(self, *args, **kwargs)
-            except youtrack.YouTrackException as e:
-                if e.response.status not in (401, 403, 500, 504):
-                    raise e
-                if e.response.status == 504:
-                    time.sleep(30)
-                else:
-                    self._login(*self._credentials)
-                attempts -= 1
-        return f(self, *args, **kwargs)
+                return minidom.parseString(content)
+            except youtrack.YouTrackBroadException:
+                return ""
+        elif response['content-type'].find('application/json') != -1 and content:
+            try:
+                return json.loads(content)
+            except youtrack.YouTrackBroadException:
+                return ""
+
+    if method == 'PUT' and ('location' in response.keys()):
+        return 'Created: ' + response['location']
+    else:
+        return content
+
+
+def _users_xml(users):
+    known_attrs = ('login', 'fullName', 'email', 'jabber')
+
+    xml = '<list>\n'
+    for u in users:
+        xml += '  <user ' + "".join(k + '=' + quoteattr(u[k]) + ' ' for k in u if k in known_attrs) + '/>\n'
+    xml += '</list>'
+    return xml.encode('utf-8')
+
+
+def _link_xml(link):
+    # ignore typeOutward and typeInward returned by getLinks()
+    return '  <link ' + "".join(attr + '=' + quoteattr(link[attr]) + ' ' for attr in link
+                                if attr not in ['typeInward', 'typeOutward']) + '/>\n'
+
+
+def _links_xml(links):
+    return ('<list>\n' + ''.join(_link_xml(link) for link in links) + '</list>').encode('utf-8')
+
+
+def _work_item_value(work_item, name):
+    # work items are objects with attributes, or WorkItem objects as returned by get_work_items()
+    value = getattr(work_item, name, None)
+    if value is None and hasattr(work_item, 'get'):
+        value = work_item.get(name, None)
+    return value
+
+
+def _iter_work_item_xml(work_item, with_author=False):
+    yield '<workItem>'
+    yield '<date>%s</date>' % _work_item_value(work_item, 'date')
+    yield '<duration>%s</duration>' % _work_item_value(work_item, 'duration')
+    description = _work_item_value(work_item, 'description')
+    if description is not None:
+        yield '<description>%s</description>' % escape(description)
+    worktype = _work_item_value(work_item, 'worktype')
+    if worktype is not None:
+        yield '<worktype><name>%s</name></worktype>' % worktype
+    if with_author:
+        yield '<author login=%s></author>' % quoteattr(_work_item_value(work_item, 'authorLogin'))
+    yield '</workItem>'
 
-    return wrapped
+
+def _work_item_xml(work_item, with_author=False):
+    return ''.join(_iter_work_item_xml(work_item, with_author))
+
+
+def _work_items_xml(work_items):
+    parts = [part.encode('utf-8') for work_item in work_items
+             for part in _iter_work_item_xml(work_item, with_author=True)]
+    if not parts:
+        return ''
+    return b''.join([b'<workItems>'] + parts + [b'</workItems>'])
 
 
 class Connection(object):
-    def __init__(self, url, login=None, password=None, proxy_info=None, api_key=None):
-        self.http = httplib2.Http(disable_ssl_certificate_validation=True) if proxy_info is None else httplib2.Http(
-            proxy_info=proxy_info, disable_ssl_certificate_validation=True)
+    def __init__(self, url, login=None, password=None, proxy_info=None, api_key=None, pool_size=10, cache=None,
+                 retry=None, limiter=None):
+        http_kwargs = {'disable_ssl_certificate_validation': True}
+        if proxy_info is not None:
+            http_kwargs['proxy_info'] = proxy_info
+        # one pool and one auth state shared by all threads using this connection
+        self.http = HttpPool(pool_size, **http_kwargs)
+        self._auth_lock = threading.Lock()
+        # optional youtrack.cache.ResponseCache for GET responses
+        self.cache = cache
+        # User and Group objects shared by Issue, Comment and Attachment accessors
+        self.identities = IdentityMap(self)
+        # youtrack.retry.RetryPolicy deciding which failed requests are made again
+        self.retry = retry if retry is not None else RetryPolicy()
+        # optional youtrack.limiter.ConcurrencyLimiter adapting the number of requests in flight
+        self.limiter = limiter
 
         # Remove the last character of the url ends with "/"
         if url:
@@ -65,6 +139,7 @@ class Connection(object):
             self._credentials = (login, password)
             self._login(*self._credentials)
         else:
+            self._credentials = None
             self.headers = {'X-YouTrack-ApiKey': api_key}
 
     def _login(self, login, password):
@@ -78,11 +153,26 @@ class Connection(object):
                         'Cache-Control': 'no-cache',
                         'Authorization': 'Basic ' + base64.b64encode(bytes(login + ':' + password, 'utf-8')).decode()}
 
-    @relogin_on_401
+    def _relogin(self, stale_headers):
+        # threads failing with the same stale headers trigger only one login. False when there is no session to
+        # renew, with an api key
+        if self._credentials is None:
+            return False
+        with self._auth_lock:
+            if self.headers is stale_headers:
+                self._login(*self._credentials)
+        return True
+
     def _req(self, method, url, body=None, ignore_status=None, content_type=None, accept_header=None):
+        return self.retry.call(self, method, lambda: self._send_once(method, url, body, ignore_status, content_type,
+                                                                     accept_header))
+
+    def _send_once(self, method, url, body, ignore_status, content_type, accept_header):
         headers = self.headers
         headers = headers.copy()
-        if method == 'PUT' or method == 'POST':
+        if isinstance(body, MultipartBody):
+            headers.update(body.headers())
+        elif method == 'PUT' or method == 'POST':
             if content_type is None:
                 content_type = 'application/xml; charset=UTF-8'
             headers['Content-Type'] = content_type
@@ -91,39 +181,44 @@ class Connection(object):
         if accept_header is not None:
             headers['Accept'] = accept_header
 
-        response, content = self.http.request(self.base_url + url, method, headers=headers, body=body)
-        content = content.translate(None, '\0'.encode('utf-8'))
-        _illegal_unichrs = [(0x00, 0x08), (0x0B, 0x0C), (0x0E, 0x1F),
-                            (0x7F, 0x84), (0x86, 0x9F), (0xFDD0, 0xFDDF),
-                            (0xFFFE, 0xFFFF)]
-        _illegal_ranges = ["%s-%s" % (chr(low), chr(high))
-                           for (low, high) in _illegal_unichrs]
-        _illegal_xml_chars_re = re.compile('[%s]' % ''.join(_illegal_ranges))
-        content = re.sub(_illegal_xml_chars_re, '', content.decode('utf-8')).encode('utf-8')
+        key = entry = generation = None
+        if self.cache is not None:
+            if method == 'GET':
+                key = (url, accept_header)
+                generation = self.cache.generation
+                entry, fresh = self.cache.get(key)
+                if fresh:
+                    return entry.response, entry.content
+                if entry is not None:
+                    headers.update(entry.validators)
+            else:
+                self.cache.invalidate(url)
+
+        if self.limiter is None:
+            response, content = self.http.request(self.base_url + url, method, headers=headers, body=body)
+        else:
+            with self.limiter.slot() as slot:
+                response, content = self.http.request(self.base_url + url, method, headers=headers, body=body)
+                slot.overloaded = response.status >= 500 or response.status == 429
+        if self.cache is not None and method != 'GET':
+            # again, GET requests in flight meanwhile may have stored what was there before the write
+            self.cache.invalidate(url)
+        if entry is not None and response.status == 304:
+            self.cache.revalidated(key, entry)
+            return entry.response, entry.content
+        content = sanitize(content, response.get('content-type'))
         if response.status != 200 and response.status != 201 and (ignore_status != response.status):
+            if key is not None:
+                self.cache.discard(key)
             raise youtrack.YouTrackException(url, response, content)
 
+        if key is not None and response.status == 200:
+            self.cache.put(key, response, content, generation)
         return response, content
 
     def _req_xml(self, method, url, body=None, ignore_status=None):
         response, content = self._req(method, url, body, ignore_status)
-        if 'content-type' in response:
-            if (response["content-type"].find('application/xml') != -1 or response["content-type"].find(
-                    'text/xml') != -1) and content is not None and content != '':
-                try:
-                    return minidom.parseString(content)
-                except youtrack.YouTrackBroadException:
-                    return ""
-            elif response['content-type'].find('application/json') != -1 and content is not None and content != '':
-                try:
-                    return json.loads(content)
-                except youtrack.YouTrackBroadException:
-                    return ""
-
-        if method == 'PUT' and ('location' in response.keys()):
-            return 'Created: ' + response['location']
-        else:
-            return content
+        return _parse_response(method, response, content)
 
     def _get(self, url):
         return self._req_xml('GET', url)
@@ -131,6 +226,59 @@ class Connection(object):
     def _put(self, url):
         return self._req_xml('PUT', url, '<empty/>\n\n')
 
+    @staticmethod
+    def _fan_out(fetch, args, max_workers):
+        # fetch(*a) for every a in args with up to max_workers requests in flight, results in order of args
+        if max_workers <= 1 or len(args) <= 1:
+            return [fetch(*a) for a in args]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(args))) as executor:
+            return list(executor.map(lambda a: fetch(*a), args))
+
+    @staticmethod
+    def _map_bounded(fetch, args, max_workers):
+        # yields (a, fetch(*a) or the exception raised) for every a in args as they complete, consuming args lazily
+        # with at most 2 * max_workers calls submitted at a time
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            args = iter(args)
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < 2 * max_workers:
+                    a = next(args, None)
+                    if a is None:
+                        exhausted = True
+                    else:
+                        pending[executor.submit(fetch, *a)] = a
+                if not pending:
+                    break
+                done, _ = concurrent.futures.wait(list(pending), return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    a = pending.pop(future)
+                    error = future.exception()
+                    yield a, error if error is not None else future.result()
+
+    @staticmethod
+    def _map_ordered(fetch, args, max_workers):
+        # yields fetch(*a) for every a in args in order of args, consuming args lazily with at most max_workers
+        # calls submitted at a time; a call raising stops the iteration with its exception
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = collections.deque()
+            try:
+                for a in args:
+                    if len(pending) >= max_workers:
+                        yield pending.popleft().result()
+                    pending.append(executor.submit(fetch, *a))
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _iter(self, url, cls, tag_name=None, **kwargs):
+        # the request is made right away, elements are parsed lazily while iterating
+        response, content = self._req('GET', url, **kwargs)
+        return (cls(e, self) for e in iter_elements(content) if tag_name is None or e.tagName == tag_name)
+
     def get_issue(self, _id):
         return youtrack.Issue(self._get("/issue/" + _id), self)
 
@@ -175,19 +323,23 @@ class Connection(object):
     def delete_issue(self, issue_id):
         return self._req('DELETE', '/issue/%s' % issue_id)
 
+    def iter_changes_for_issue(self, issue):
+        return self._iter("/issue/%s/changes" % issue, youtrack.IssueChange, 'change')
+
     def get_changes_for_issue(self, issue):
-        return [youtrack.IssueChange(change, self) for change in
-                self._get("/issue/%s/changes" % issue).getElementsByTagName('change')]
+        return list(self.iter_changes_for_issue(issue))
+
+    def iter_comments(self, _id):
+        return self._iter('/issue/' + _id + '/comment', youtrack.Comment)
 
     def get_comments(self, _id):
-        response, content = self._req('GET', '/issue/' + _id + '/comment')
-        xml = minidom.parseString(content)
-        return [youtrack.Comment(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_comments(_id))
+
+    def iter_attachments(self, _id):
+        return self._iter('/issue/' + _id + '/attachment', youtrack.Attachment)
 
     def get_attachments(self, _id):
-        response, content = self._req('GET', '/issue/' + _id + '/attachment')
-        xml = minidom.parseString(content)
-        return [youtrack.Attachment(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_attachments(_id))
 
     def get_attachment_content(self, url):
         f = urllib.request.urlopen(urllib.request.Request(self.url + url, headers=self.headers))
@@ -197,74 +349,18 @@ class Connection(object):
         return self._req('DELETE', '/issue/%s/attachment/%s' % (issue_id, attachment_id))
 
     def create_attachment_from_attachment(self, issue_id, a):
-        content = None
-        try:
-            content = a.getContent()
-            content_length = None
-            if 'content-length' in content.headers.dict:
-                content_length = int(content.headers.dict['content-length'])
-            print('Importing attachment for issue ', issue_id)
-            try:
-                print('Name: ', utf8encode(a.name))
-            except Exception as e:
-                print(e)
-            try:
-                print('Author: ', a.authorLogin)
-            except Exception as e:
-                print(e)
-            return self.import_attachment(issue_id, a.name, content, a.authorLogin,
-                                          content_length=content_length,
-                                          content_type=content.info().type,
-                                          created=a.created if hasattr(a, 'created') else None,
-                                          group=utf8encode(a.group) if hasattr(a, 'group') else '')
-        except urllib.error.HTTPError as e:
-            print("Can't create attachment")
-            try:
-                err_content = e.read()
-                issue_id = issue_id
-                attach_name = a.name
-                attach_url = a.url
-                if isinstance(err_content, str):
-                    err_content = err_content.encode('utf-8')
-                if isinstance(issue_id, str):
-                    issue_id = issue_id.encode('utf-8')
-                if isinstance(attach_name, str):
-                    attach_name = attach_name.encode('utf-8')
-                if isinstance(attach_url, str):
-                    attach_url = attach_url.encode('utf-8')
-                print("HTTP CODE: ", e.code)
-                print("REASON: ", err_content)
-                print("IssueId: ", issue_id)
-                print("Attachment filename: ", attach_name)
-                print("Attachment URL: ", attach_url)
-            except youtrack.YouTrackBroadException:
-                pass
-        except youtrack.YouTrackBroadException as e:
-            try:
-                print(content.geturl())
-                print(content.getcode())
-                print(content.info())
-            except youtrack.YouTrackBroadException:
-                pass
-            raise e
+        """ Copies attachment a, read through the connection it was listed from, to issue issue_id of this connection.
+            AttachmentMigration copies many at a time.
+        """
+        return AttachmentMigration(a.youtrack, self).transfer(issue_id, a)
 
     def _process_attachments(self, author_login, content, content_length, content_type, created, group, issue_id, name,
                              url_prefix='/issue/'):
-        if content_type is not None:
-            content.contentType = content_type
-        if content_length is not None:
-            content.contentLength = content_length
-        elif not isinstance(content, io.IOBase):
-            tmp = tempfile.NamedTemporaryFile(mode='w+b')
-            tmp.write(content.read())
-            tmp.flush()
-            tmp.seek(0)
-            content = tmp
-
-        # post_data = {'attachment': content}
-        post_data = {name: content}
-        headers = self.headers.copy()
-        # headers['Content-Type'] = contentType
+        """ Uploads content, a binary file object, a memory mapped file or a MultipartBody, as multipart form data.
+            The content is streamed in chunks over the connection pool, see MultipartBody.
+        """
+        if not isinstance(content, MultipartBody):
+            content = MultipartBody(name, content, content_type, content_length)
         # name without extension to workaround: http://youtrack.jetbrains.net/issue/JT-6110
         params = {  # 'name': os.path.splitext(name)[0],
             'authorLogin': author_login.encode('utf-8'),
@@ -279,17 +375,9 @@ class Connection(object):
             except youtrack.YouTrackException:
                 params['created'] = str(calendar.timegm(datetime.now().timetuple()) * 1000)
 
-        url = self.base_url + url_prefix + issue_id + "/attachment?" + urllib.parse.urlencode(params)
-        r = urllib.request.Request(url,
-                                   headers=headers, data=post_data)
-        # r.set_proxy('localhost:8888', 'http')
-        try:
-            res = urllib.request.urlopen(r)
-        except urllib.error.HTTPError as e:
-            if e.code == 201:
-                return e.msg + ' ' + name
-            raise e
-        return res
+        url = url_prefix + issue_id + "/attachment?" + urllib.parse.urlencode(params)
+        response, content = self._req('POST', url, content)
+        return _parse_response('POST', response, content)
 
     def create_attachment(self, issue_id, name, content, author_login='', content_type=None, content_length=None,
                           created=None, group=''):
@@ -302,14 +390,8 @@ class Connection(object):
                                          name, '/import/')
 
     def get_links(self, _id, outward_only=False):
-        response, content = self._req('GET', '/issue/' + urlquote(_id) + '/link')
-        xml = minidom.parseString(content)
-        res = []
-        for c in [e for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]:
-            link = youtrack.Link(c, self)
-            if link.source == _id or not outward_only:
-                res.append(link)
-        return res
+        links = self._iter('/issue/' + urlquote(_id) + '/link', youtrack.Link)
+        return [link for link in links if link.source == _id or not outward_only]
 
     def get_user(self, login):
         """ http://confluence.jetbrains.net/display/YTD2/GET+user
@@ -338,17 +420,11 @@ class Connection(object):
         """
         if len(users) <= 0:
             return
-
-        known_attrs = ('login', 'fullName', 'email', 'jabber')
-
-        xml = '<list>\n'
         for u in users:
-            xml += '  <user ' + "".join(k + '=' + quoteattr(u[k]) + ' ' for k in u if k in known_attrs) + '/>\n'
-        xml += '</list>'
+            self.identities.discard_user(u['login'])
+
         # TODO: convert response xml into python objects
-        if isinstance(xml, str):
-            xml = xml.encode('utf-8')
-        return self._req_xml('PUT', '/import/users', xml, 400).toxml()
+        return self._req_xml('PUT', '/import/users', _users_xml(users), 400).toxml()
 
     def import_issues_xml(self, project_id, assignee_group, xml):
         return self._req_xml('PUT', '/import/' + urlquote(project_id) + '/issues?' +
@@ -361,17 +437,69 @@ class Connection(object):
             Example: importLinks([{'login':'vadim', 'fullName':'vadim', 'email':'eee@ss.com', 'jabber':'fff@fff.com'},
                                   {'login':'maxim', 'fullName':'maxim', 'email':'aaa@ss.com', 'jabber':'www@fff.com'}])
         """
-        xml = '<list>\n'
-        for l in links:
-            # ignore typeOutward and typeInward returned by getLinks()
-            xml += '  <link ' + "".join(attr + '=' + quoteattr(l[attr]) +
-                                        ' ' for attr in l if attr not in ['typeInward', 'typeOutward']) + '/>\n'
-        xml += '</list>'
         # TODO: convert response xml into python objects
-        res = self._req_xml('PUT', '/import/links', xml, 400)
+        res = self._req_xml('PUT', '/import/links', _links_xml(links), 400)
         return res.toxml() if hasattr(res, "toxml") else res
 
-    def import_issues(self, project_id, assignee_group, issues):
+    def _import_link_chunk(self, links, retries):
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                return LinkBatchResult(links, self._req_xml('PUT', '/import/links', _links_xml(links), 400), attempts)
+            except Exception as e:
+                # the server rejecting the links would reject them again, only failures on its side are retried
+                if RetryPolicy.classify(e) not in (SERVER, THROTTLED, TRANSPORT) or attempts > retries:
+                    return LinkBatchResult(links, '', attempts, str(e))
+
+    def iter_import_links(self, links, batch_size=1000, max_workers=4, retries=2):
+        """ Imports links in chunks of batch_size with up to max_workers requests in flight and yields
+            a LinkBatchResult per chunk, in order, as soon as it and the chunks before it are done. links may be
+            any iterable, it is consumed as chunks are sent. Repeated links are dropped. A chunk failed by a server
+            or connection error is sent again on its own up to retries times, the result of its last attempt is
+            reported; one rejected by the server is reported at once.
+        """
+        def chunks():
+            chunk = []
+            for link in dedup_links(links):
+                chunk.append(link)
+                if len(chunk) >= batch_size:
+                    yield chunk, retries
+                    chunk = []
+            if chunk:
+                yield chunk, retries
+
+        yield from self._map_ordered(self._import_link_chunk, chunks(), max_workers)
+
+    def _import_issues_url(self, project_id, assignee_group):
+        return '/import/' + urlquote(project_id) + '/issues?' + \
+            urllib.parse.urlencode({'assigneeGroup': assignee_group})
+
+    def import_issue_batch(self, project_id, assignee_group, batch):
+        """ Sends one IssueBatch, returns IssueBatchResult """
+        url = self._import_issues_url(project_id, assignee_group)
+        return IssueBatchResult(batch, self._req_xml('PUT', url, batch.body(), 400))
+
+    def iter_import_issues(self, project_id, assignee_group, issues, batch_size=100, max_bytes=4 * 2 ** 20,
+                           bisect=True, bad_fields=None):
+        """ Imports issues from any iterable, yields an IssueBatchResult for every request made.
+            Issues are encoded as they are consumed and sent batch_size at a time, or fewer when their records
+            exceed max_bytes, so memory use does not depend on the number of issues.
+            With bisect, batches rejected as a whole are halved until the offending issues are isolated,
+            see bisect_batch(). ImportResult.collect() sums the results up.
+            bad_fields are the fields left out of the records, they are worked out from the project's time
+            tracking settings when not given (see ImportSession).
+        """
+        if bad_fields is None:
+            bad_fields = _import_bad_fields(self.get_project_time_tracking_settings(project_id))
+        send = functools.partial(self.import_issue_batch, project_id, assignee_group)
+        for batch in iter_issue_batches(issues, bad_fields, batch_size, max_bytes):
+            if bisect:
+                yield from bisect_batch(send, batch)
+            else:
+                yield send(batch)
+
+    def import_issues(self, project_id, assignee_group, issues, batch_size=None, max_bytes=None):
         """ Import issues, returns import result (http://confluence.jetbrains.net/display/YTD2/Import+Issues)
             Accepts return of getIssues()
             Example: importIssues([{'numberInProject':'1', 'summary':'some problem', 'description':'some description',
@@ -380,116 +508,39 @@ class Connection(object):
                                     'comment':[{'author':'yamaxim', 'text':'comment text', 'created':'1267030230127'}]},
                                    {'numberInProject':'2', 'summary':'some problem', 'description':'some description',
                                     'priority':'1'}])
+            All issues are sent in one request unless batch_size or max_bytes is given, see iter_import_issues().
         """
-        if len(issues) <= 0:
-            return
-
-        bad_fields = ['id', 'projectShortName', 'votes', 'commentsCount',
-                      'historyUpdated', 'updatedByFullName', 'updaterFullName',
-                      'reporterFullName', 'links', 'attachments', 'jiraId',
-                      'entityId', 'tags', 'sprint']
-
-        tt_settings = self.get_project_time_tracking_settings(project_id)
-        if tt_settings and tt_settings['Enabled'] and tt_settings['TimeSpentField']:
-            bad_fields.append(tt_settings['TimeSpentField'])
-
-        xml = '<issues>\n'
-        issue_records = dict([])
-
-        for issue in issues:
-            record = ""
-            record += '  <issue>\n'
-
-            comments = None
-            if getattr(issue, "getComments", None):
-                comments = issue.get_comments()
-
-            for issue_attr in issue:
-                attr_value = issue[issue_attr]
-                if attr_value is None:
-                    continue
-                if isinstance(attr_value, str):
-                    attr_value = attr_value.encode('utf-8')
-                if isinstance(issue_attr, str):
-                    issue_attr = issue_attr.encode('utf-8')
-                if issue_attr == 'comments':
-                    comments = attr_value
-                else:
-                    # ignore bad fields from getIssue()
-                    if issue_attr not in bad_fields:
-                        record += '    <field name="' + issue_attr + '">\n'
-                        if isinstance(attr_value, list) or getattr(attr_value, '__iter__', False):
-                            for v in attr_value:
-                                if isinstance(v, str):
-                                    v = v.encode('utf-8')
-                                record += '      <value>' + escape(v.strip()) + '</value>\n'
-                        else:
-                            record += '      <value>' + escape(attr_value.strip()) + '</value>\n'
-                        record += '    </field>\n'
-
-            if comments:
-                for comment in comments:
-                    record += '    <comment'
-                    for ca in comment:
-                        val = comment[ca]
-                        if isinstance(ca, str):
-                            ca = ca.encode('utf-8')
-                        if isinstance(val, str):
-                            val = val.encode('utf-8')
-                        record += ' ' + ca + '=' + quoteattr(val)
-                    record += '/>\n'
-
-            record += '  </issue>\n'
-            xml += record
-            issue_records[issue.numberInProject] = record
-
-        xml += '</issues>'
-
-        # print xml
-        # TODO: convert response xml into python objects
-
-        if isinstance(xml, str):
-            xml = xml.encode('utf-8')
-
-        if isinstance(assignee_group, str):
-            assignee_group = assignee_group.encode('utf-8')
+        response = self._merge_issue_results(
+            project_id, self.iter_import_issues(project_id, assignee_group, issues, batch_size, max_bytes))
+        return response.toxml().encode('utf-8') if hasattr(response, 'toxml') else response
+
+    @classmethod
+    def _merge_issue_results(cls, project_id, results):
+        # reports the IssueBatchResults and merges their items in the importResult of the first one not rejected:
+        # '' when all were rejected, None when there were none
+        document = None
+        for result in results:
+            cls._report_issue_batch(project_id, result)
+            if result.rejected:
+                document = document or ""
+            elif not document:
+                document = result.document
+            else:
+                # several requests were made, their items are reported in one importResult
+                for item in result.items.values():
+                    document.documentElement.appendChild(document.importNode(item, True))
+        return document
 
-        url = '/import/' + urlquote(project_id) + '/issues?' + urllib.parse.urlencode({'assigneeGroup': assignee_group})
-        if isinstance(url, str):
-            url = url.encode('utf-8')
-        result = self._req_xml('PUT', url, xml, 400)
-        if (result == "") and (len(issues) > 1):
-            for issue in issues:
-                self.import_issues(project_id, assignee_group, [issue])
-        response = ""
-        try:
-            response = result.toxml().encode('utf-8')
-        except youtrack.YouTrackBroadException:
-            sys.stderr.write("can't parse response")
-            sys.stderr.write("request was")
-            sys.stderr.write(xml)
-            return response
-        item_elements = minidom.parseString(response).getElementsByTagName("item")
-        if len(item_elements) != len(issues):
-            sys.stderr.write(response)
-        else:
-            for item in item_elements:
-                _id = item.attributes["id"].value
-                imported = item.attributes["imported"].value.lower()
-                if imported == "true":
-                    print("Issue [ %s-%s ] imported successfully" % (project_id, _id))
-                else:
-                    sys.stderr.write("")
-                    sys.stderr.write("Failed to import issue [ %s-%s ]." % (project_id, _id))
-                    sys.stderr.write("Reason : ")
-                    sys.stderr.write(item.toxml())
-                    sys.stderr.write("Request was :")
-                    if isinstance(issue_records[_id], str):
-                        sys.stderr.write(issue_records[_id].encode('utf-8'))
-                    else:
-                        sys.stderr.write(issue_records[_id])
-                print("")
-        return response
+    @staticmethod
+    def _report_issue_batch(project_id, result):
+        for _id in result.imported:
+            print("Issue [ %s-%s ] imported successfully" % (project_id, _id))
+        for _id in result.failed:
+            if _id in result.items or result.rejected:
+                reason = result.reason(_id)
+            else:
+                reason = 'not in the import result'
+            sys.stderr.write("Failed to import issue [ %s-%s ]. Reason : %s\n" % (project_id, _id, reason))
 
     def get_projects(self):
         projects = {}
@@ -504,29 +555,32 @@ class Connection(object):
 
     def get_project_ids(self):
         response, content = self._req('GET', '/admin/project/')
-        xml = minidom.parseString(content)
-        return [e.getAttribute('id') for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return [e.getAttribute('id') for e in iter_elements(content)]
+
+    def iter_project_assignee_groups(self, project_id):
+        return self._iter('/admin/project/' + urlquote(project_id) + '/assignee/group', youtrack.Group)
 
     def get_project_assignee_groups(self, project_id):
-        response, content = self._req('GET', '/admin/project/' + urlquote(project_id) + '/assignee/group')
-        xml = minidom.parseString(content)
-        return [youtrack.Group(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_project_assignee_groups(project_id))
 
     def get_group(self, name):
         return youtrack.Group(self._get("/admin/group/" + urlquote(name.encode('utf-8'))), self)
 
+    def iter_groups(self):
+        return self._iter('/admin/group', youtrack.Group)
+
     def get_groups(self):
-        response, content = self._req('GET', '/admin/group')
-        xml = minidom.parseString(content)
-        return [youtrack.Group(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_groups())
 
     def delete_group(self, name):
+        self.identities.discard_group(name)
         return self._req('DELETE', "/admin/group/" + urlquote(name.encode('utf-8')))
 
+    def iter_user_groups(self, user_name):
+        return self._iter('/admin/user/%s/group' % urlquote(user_name.encode('utf-8')), youtrack.Group)
+
     def get_user_groups(self, user_name):
-        response, content = self._req('GET', '/admin/user/%s/group' % urlquote(user_name.encode('utf-8')))
-        xml = minidom.parseString(content)
-        return [youtrack.Group(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_user_groups(user_name))
 
     def set_user_group(self, user_name, group_name):
         if isinstance(user_name, str):
@@ -553,15 +607,17 @@ class Connection(object):
     def get_role(self, name):
         return youtrack.Role(self._get("/admin/role/" + urlquote(name)), self)
 
+    def iter_roles(self):
+        return self._iter('/admin/role', youtrack.Role)
+
     def get_roles(self):
-        response, content = self._req('GET', '/admin/role')
-        xml = minidom.parseString(content)
-        return [youtrack.Role(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_roles())
+
+    def iter_group_roles(self, group_name):
+        return self._iter('/admin/group/%s/role' % urlquote(group_name), youtrack.UserRole)
 
     def get_group_roles(self, group_name):
-        response, content = self._req('GET', '/admin/group/%s/role' % urlquote(group_name))
-        xml = minidom.parseString(content)
-        return [youtrack.UserRole(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_group_roles(group_name))
 
     def create_role(self, role):
         url_role_name = urlquote(utf8encode(role.name))
@@ -585,65 +641,81 @@ class Connection(object):
         content = self._req('POST', '/admin/role/%s/permission/%s' % (url_role_name, url_prm_name))
         return content
 
+    def iter_role_permissions(self, role):
+        return self._iter('/admin/role/%s/permission' % urlquote(role.name), youtrack.Permission)
+
     def get_role_permissions(self, role):
-        response, content = self._req('GET', '/admin/role/%s/permission' % urlquote(role.name))
-        xml = minidom.parseString(content)
-        return [youtrack.Permission(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_role_permissions(role))
+
+    def iter_permissions(self):
+        return self._iter('/admin/permission', youtrack.Permission)
 
     def get_permissions(self):
-        response, content = self._req('GET', '/admin/permission')
-        xml = minidom.parseString(content)
-        return [youtrack.Permission(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_permissions())
 
     def get_subsystem(self, project_id, name):
         response, content = self._req('GET', '/admin/project/' + project_id + '/subsystem/' + urlquote(name))
         xml = minidom.parseString(content)
         return youtrack.Subsystem(xml, self)
 
+    def iter_subsystems(self, project_id):
+        return self._iter('/admin/project/' + project_id + '/subsystem', youtrack.Subsystem)
+
     def get_subsystems(self, project_id):
-        response, content = self._req('GET', '/admin/project/' + project_id + '/subsystem')
-        xml = minidom.parseString(content)
-        return [youtrack.Subsystem(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_subsystems(project_id))
 
-    def get_versions(self, project_id):
+    def get_versions(self, project_id, max_workers=4, shallow=False):
+        """ Versions of the project, requested one by one with up to max_workers requests at a time.
+            With shallow=True they are built from the list response only, with the attributes it carries.
+        """
         response, content = self._req('GET', '/admin/project/' + urlquote(project_id) + '/version?showReleased=true')
-        xml = minidom.parseString(content)
-        return [self.get_version(project_id, v.getAttribute('name')) for v in
-                xml.documentElement.getElementsByTagName('version')]
+        versions = [v for v in iter_elements(content) if v.tagName == 'version']
+        if shallow:
+            return [youtrack.Version(v, self) for v in versions]
+        return self._fan_out(self.get_version, [(project_id, v.getAttribute('name')) for v in versions], max_workers)
 
     def get_version(self, project_id, name):
         return youtrack.Version(
             self._get("/admin/project/" + urlquote(project_id) + "/version/" + urlquote(name)), self)
 
+    def iter_builds(self, project_id):
+        return self._iter('/admin/project/' + urlquote(project_id) + '/build', youtrack.Build)
+
     def get_builds(self, project_id):
-        response, content = self._req('GET', '/admin/project/' + urlquote(project_id) + '/build')
-        xml = minidom.parseString(content)
-        return [youtrack.Build(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_builds(project_id))
+
+    def _users_page(self, start, params=None):
+        query = '&' + urllib.parse.urlencode(params) if params else ''
+        return list(self._iter("/admin/user/?start=%s%s" % (str(start), query), youtrack.User))
+
+    def iter_users(self, params=None, prefetch=4, start=0):
+        """ Yields users matching params (e.g. {'q': 'john', 'group': 'devs'}) as the server pages them, 10 at a time.
+            Up to prefetch pages are requested ahead of the one being consumed. Listed users only have login and url,
+            see Connection.identities for details.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(prefetch, 1)) as executor:
+            pending = collections.deque()
+            try:
+                while True:
+                    while len(pending) < max(prefetch, 1):
+                        pending.append(executor.submit(self._users_page, start, params))
+                        start += 10
+                    page = pending.popleft().result()
+                    if not page:
+                        return
+                    yield from page
+            finally:
+                for future in pending:
+                    future.cancel()
 
     def get_users(self, params=None):
-        if params is None:
-            params = {}
-        users = []
-        position = 0
-        user_search_params = urllib.parse.urlencode(params)
-        while True:
-            response, content = self._req('GET', "/admin/user/?start=%s&%s" % (str(position), user_search_params))
-            position += 10
-            xml = minidom.parseString(content)
-            new_users = [youtrack.User(e, self) for e in xml.documentElement.childNodes if
-                         e.nodeType == Node.ELEMENT_NODE]
-            if not len(new_users):
-                return users
-            users += new_users
+        return list(self.iter_users(params))
 
     def get_users_ten(self, start):
-        response, content = self._req('GET', "/admin/user/?start=%s" % str(start))
-        xml = minidom.parseString(content)
-        users = [youtrack.User(e, self) for e in xml.documentElement.childNodes if
-                 e.nodeType == Node.ELEMENT_NODE]
-        return users
+        return self._users_page(start)
 
     def delete_user(self, login):
+        self.identities.discard_user(login)
         return self._req('DELETE', "/admin/user/" + urlquote(login.encode('utf-8')))
 
     # TODO this function is deprecated
@@ -724,7 +796,7 @@ class Connection(object):
             '/admin/project/' + urlquote(project_id) + '/version/' + urlquote(name.encode('utf-8')) + "?" +
             urllib.parse.urlencode(params))
 
-    def get_issues(self, project_id, _filter, after, _max, updated_after=None, wikify=None):
+    def iter_project_issues(self, project_id, _filter, after, _max, updated_after=None, wikify=None):
         # response, content = self._req('GET', '/project/issues/' + urlquote(projectId) + "?" +
         params = {'after': str(after),
                   'max': str(_max),
@@ -733,10 +805,11 @@ class Connection(object):
             params['updatedAfter'] = updated_after
         if wikify is not None:
             params['wikifyDescription'] = wikify
-        response, content = self._req('GET', '/issue/byproject/' + urlquote(project_id) + "?" +
-                                      urllib.parse.urlencode(params))
-        xml = minidom.parseString(content)
-        return [youtrack.Issue(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return self._iter('/issue/byproject/' + urlquote(project_id) + "?" + urllib.parse.urlencode(params),
+                          youtrack.Issue)
+
+    def get_issues(self, project_id, _filter, after, _max, updated_after=None, wikify=None):
+        return list(self.iter_project_issues(project_id, _filter, after, _max, updated_after, wikify))
 
     def get_number_of_issues(self, _filter='', wait_for_server=True):
         while True:
@@ -745,34 +818,44 @@ class Connection(object):
             response, content = self._req('GET', final_url, None, None, None, 'application/json')
             result = eval(content.replace('callback'.encode('utf-8'), ''.encode('utf-8')))
             number_of_issues = result['value']
-            if not wait_for_server:
+            # -1 means the server is still counting
+            if not wait_for_server or number_of_issues != -1:
                 return number_of_issues
-            if number_of_issues != -1:
-                break
-
-        time.sleep(5)
-        return self.get_number_of_issues(_filter, False)
+            time.sleep(5)
 
     def get_all_sprints(self, agile_id):
         response, content = self._req('GET', '/agile/' + agile_id + "/sprints?")
-        xml = minidom.parseString(content)
         return [(e.getAttribute('name'), e.getAttribute('start'), e.getAttribute('finish')) for e in
-                xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+                iter_elements(content)]
 
-    def get_all_issues(self, _filter='', after=0, _max=999999, with_fields=()):
+    def iter_all_issues(self, _filter='', after=0, _max=999999, with_fields=()):
         url_jobby = [('with', field) for field in with_fields] + \
                     [('after', str(after)),
                      ('max', str(_max)),
                      ('filter', _filter)]
-        response, content = self._req('GET', '/issue' + "?" +
-                                      urllib.parse.urlencode(url_jobby))
-        xml = minidom.parseString(content)
-        return [youtrack.Issue(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return self._iter('/issue' + "?" + urllib.parse.urlencode(url_jobby), youtrack.Issue)
+
+    def get_all_issues(self, _filter='', after=0, _max=999999, with_fields=()):
+        return list(self.iter_all_issues(_filter, after, _max, with_fields))
+
+    def iter_issues(self, _filter='', page_size=100, with_fields=(), after=0):
+        """ Yields all issues matching the filter, requesting them page_size at a time.
+            The next page is fetched in background while the current one is being consumed.
+        """
+        fetch = functools.partial(self.get_all_issues, _filter, _max=page_size, with_fields=with_fields)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fetch, after=after)
+            while future is not None:
+                page = future.result()
+                after += len(page)
+                future = executor.submit(fetch, after=after) if len(page) >= page_size else None
+                yield from page
+
+    def iter_issue_links(self):
+        return self._iter('/export/links', youtrack.Link)
 
     def export_issue_links(self):
-        response, content = self._req('GET', '/export/links')
-        xml = minidom.parseString(content)
-        return [youtrack.Link(e, self) for e in xml.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE]
+        return list(self.iter_issue_links())
 
     def execute_command(self, issue_id, command, comment=None, group=None, run_as=None, disable_notifications=False):
         if isinstance(command, str):
@@ -802,11 +885,13 @@ class Connection(object):
     def get_custom_field(self, name):
         return youtrack.CustomField(self._get("/admin/customfield/field/" + urlquote(name.encode('utf-8'))), self)
 
-    def get_custom_fields(self):
+    def get_custom_fields(self, max_workers=4, shallow=False):
+        """ See get_versions() for max_workers and shallow, the list response only holds field names """
         response, content = self._req('GET', '/admin/customfield/field')
-        xml = minidom.parseString(content)
-        return [self.get_custom_field(e.getAttribute('name')) for e in xml.documentElement.childNodes if
-                e.nodeType == Node.ELEMENT_NODE]
+        fields = list(iter_elements(content))
+        if shallow:
+            return [youtrack.CustomField(e, self) for e in fields]
+        return self._fan_out(self.get_custom_field, [(e.getAttribute('name'),) for e in fields], max_workers)
 
     def create_custom_field(self, cf):
         params = dict([])
@@ -846,11 +931,14 @@ class Connection(object):
         return youtrack.ProjectCustomField(
             self._get("/admin/project/" + urlquote(project_id) + "/customfield/" + urlquote(name)), self)
 
-    def get_project_custom_fields(self, project_id):
+    def get_project_custom_fields(self, project_id, max_workers=4, shallow=False):
+        """ See get_versions() for max_workers and shallow, the list response only holds field names """
         response, content = self._req('GET', '/admin/project/' + urlquote(project_id) + '/customfield')
-        xml = minidom.parseString(content)
-        return [self.get_project_custom_field(project_id, e.getAttribute('name')) for e in
-                xml.getElementsByTagName('projectCustomField')]
+        fields = [e for e in iter_elements(content) if e.tagName == 'projectCustomField']
+        if shallow:
+            return [youtrack.ProjectCustomField(e, self) for e in fields]
+        return self._fan_out(self.get_project_custom_field, [(project_id, e.getAttribute('name')) for e in fields],
+                             max_workers)
 
     def create_project_custom_field(self, project_id, pcf):
         return self.create_project_custom_field_detailed(project_id, pcf.name, pcf.emptyText, pcf.params)
@@ -873,10 +961,11 @@ class Connection(object):
     def delete_project_custom_field(self, project_id, pcf_name):
         self._req('DELETE', '/admin/project/' + urlquote(project_id) + "/customfield/" + urlquote(pcf_name))
 
+    def iter_issue_link_types(self):
+        return self._iter('/admin/issueLinkType', youtrack.IssueLinkType, 'issueLinkType')
+
     def get_issue_link_types(self):
-        response, content = self._req('GET', '/admin/issueLinkType')
-        xml = minidom.parseString(content)
-        return [youtrack.IssueLinkType(e, self) for e in xml.getElementsByTagName('issueLinkType')]
+        return list(self.iter_issue_link_types())
 
     def create_issue_link_types(self, issue_link_types):
         for ilt in issue_link_types:
@@ -900,50 +989,58 @@ class Connection(object):
     def get_events(self, issue_id):
         return self._get('/event/issueEvents/' + urlquote(issue_id))
 
+    def iter_work_items(self, issue_id):
+        return self._iter('/issue/%s/timetracking/workitem' % urlquote(issue_id), youtrack.WorkItem,
+                          accept_header='application/xml; charset=UTF-8')
+
     def get_work_items(self, issue_id):
         try:
-            response, content = self._req('GET',
-                                          '/issue/%s/timetracking/workitem' % urlquote(issue_id),
-                                          accept_header='application/xml; charset=UTF-8')
-            xml = minidom.parseString(content)
-            return [youtrack.WorkItem(e, self) for e in xml.documentElement.childNodes if
-                    e.nodeType == Node.ELEMENT_NODE]
+            return list(self.iter_work_items(issue_id))
         except youtrack.YouTrackException as e:
             print("Can't get work items.", str(e))
             return []
 
+    def get_work_items_for_issues(self, issue_ids, max_workers=8):
+        """ Work items of many issues, requested up to max_workers at a time. Returns a dict of issue id to
+            the list of its work items, issues whose work items can't be read are left out.
+        """
+        result = {}
+        for (issue_id,), work_items in self._map_bounded(lambda i: list(self.iter_work_items(i)),
+                                                         ((issue_id,) for issue_id in issue_ids), max_workers):
+            if not isinstance(work_items, Exception):
+                result[issue_id] = work_items
+        return result
+
+    def _bulk_work_items(self, send, work_items, max_workers):
+        result = WorkItemsResult()
+        pairs = work_items.items() if hasattr(work_items, 'items') else work_items
+        for (issue_id, items), outcome in self._map_bounded(send, pairs, max_workers):
+            result.add(issue_id, items, outcome)
+        return result
+
+    def import_work_items_bulk(self, work_items, max_workers=8):
+        """ Imports work items of many issues, given as a dict or an iterable of (issue id, work items) pairs,
+            one request per issue with up to max_workers requests in flight. Returns WorkItemsResult.
+        """
+        return self._bulk_work_items(self.import_work_items, work_items, max_workers)
+
+    def create_work_items_bulk(self, work_items, max_workers=8):
+        """ create_work_item() for many issues, see import_work_items_bulk() """
+        def send(issue_id, items):
+            for work_item in items:
+                self.create_work_item(issue_id, work_item)
+        return self._bulk_work_items(send, work_items, max_workers)
+
     def create_work_item(self, issue_id, work_item):
-        xml = '<workItem>'
-        xml += '<date>%s</date>' % work_item.date
-        xml += '<duration>%s</duration>' % work_item.duration
-        if hasattr(work_item, 'description') and work_item.description is not None:
-            xml += '<description>%s</description>' % escape(work_item.description)
-        if hasattr(work_item, 'worktype') and work_item.worktype is not None:
-            xml += '<worktype><name>%s</name></worktype>' % work_item.worktype
-        xml += '</workItem>'
-        if isinstance(xml, str):
-            xml = xml.encode('utf-8')
+        xml = _work_item_xml(work_item).encode('utf-8')
         self._req_xml('POST',
                       '/issue/%s/timetracking/workitem' % urlquote(issue_id), xml)
 
     def import_work_items(self, issue_id, work_items):
-        xml = ''
-        for work_item in work_items:
-            xml += '<workItem>'
-            xml += '<date>%s</date>' % work_item.date
-            xml += '<duration>%s</duration>' % work_item.duration
-            if hasattr(work_item, 'description') and work_item.description is not None:
-                xml += '<description>%s</description>' % escape(work_item.description)
-            if hasattr(work_item, 'worktype') and work_item.worktype is not None:
-                xml += '<worktype><name>%s</name></worktype>' % work_item.worktype
-            xml += '<author login=%s></author>' % quoteattr(work_item.authorLogin)
-            xml += '</workItem>'
-        if isinstance(xml, str):
-            xml = xml.encode('utf-8')
+        xml = _work_items_xml(work_items)
         if xml:
-            xml = '<workItems>' + xml + '</workItems>'
-            self._req_xml('PUT',
-                          '/import/issue/%s/workitems' % urlquote(issue_id), xml)
+            return self._req_xml('PUT',
+                                 '/import/issue/%s/workitems' % urlquote(issue_id), xml)
 
     def get_search_intelli_sense(self, query,
                                  context=None, caret=None, options_limit=None):
@@ -1009,7 +1106,8 @@ class Connection(object):
         return self._req_xml(
             'PUT', '/admin/project/' + project_id + '/timetracking', xml)
 
-    def get_all_bundles(self, field_type):
+    def get_all_bundles(self, field_type, max_workers=4, shallow=False):
+        """ See get_versions() for max_workers and shallow, shallow bundles only have a name and no values """
         field_type = self.get_field_type(field_type)
         if field_type == "enum":
             tag_name = "enumFieldBundle"
@@ -1017,10 +1115,11 @@ class Connection(object):
             tag_name = "userFieldBundle"
         else:
             tag_name = self.bundle_paths[field_type]
-        names = [e.getAttribute("name") for e in self._get('/admin/customfield/' +
-                                                           self.bundle_paths[field_type]).getElementsByTagName(
-            tag_name)]
-        return [self.get_bundle(field_type, name) for name in names]
+        response, content = self._req('GET', '/admin/customfield/' + self.bundle_paths[field_type])
+        bundles = [e for e in iter_elements(content) if e.tagName == tag_name]
+        if shallow:
+            return [self.bundle_types[field_type](e, self) for e in bundles]
+        return self._fan_out(self.get_bundle, [(field_type, e.getAttribute('name')) for e in bundles], max_workers)
 
     @staticmethod
     def get_field_type(field_type):
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import concurrent.futures
+import threading
+
+import youtrack
+
+# Issue fields holding user logins
+ISSUE_USER_FIELDS = ('reporterName', 'updaterName', 'Assignee', 'voterName')
+
+
+def _logins(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class IdentityMap(object):
+    """ One User object per login and one Group object per name for a Connection.
+
+        Users and groups are requested once and served from memory afterwards. Users are also indexed by email
+        when the server returns it. Whole collections are resolved with users() / groups(), which requests the
+        missing ones concurrently on a pool of max_workers threads. Logins and names the server does not know
+        raise YouTrackException, as Connection.get_user() does; with ignore_missing they map to None instead.
+
+        Example:
+            connection.identities.prefetch_issue_users(issues)
+            reporters = [issue.get_reporter() for issue in issues]
+    """
+
+    def __init__(self, connection, max_workers=8, ignore_missing=False):
+        self.connection = connection
+        self.max_workers = max_workers
+        self.ignore_missing = ignore_missing
+        self._users = {}
+        self._users_by_email = {}
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def _fetch_user(self, login):
+        try:
+            return self.connection.get_user(login)
+        except youtrack.YouTrackException as e:
+            if e.response.status != 404 or not self.ignore_missing:
+                raise
+            return None
+
+    def _fetch_group(self, name):
+        try:
+            return self.connection.get_group(name)
+        except youtrack.YouTrackException as e:
+            if e.response.status != 404 or not self.ignore_missing:
+                raise
+            return None
+
+    def _store_user(self, login, user):
+        with self._lock:
+            user = self._users.setdefault(login, user)
+            if user is not None and user.get('email', None):
+                self._users_by_email.setdefault(user['email'], user)
+        return user
+
+    def _store_group(self, name, group):
+        with self._lock:
+            return self._groups.setdefault(name, group)
+
+    def _resolve(self, keys, known, fetch, store):
+        keys = list(dict.fromkeys(k for k in keys if k))
+        missing = [k for k in keys if k not in known]
+        if len(missing) == 1 or self.max_workers == 1:
+            for key in missing:
+                store(key, fetch(key))
+        elif missing:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                for key, value in zip(missing, executor.map(fetch, missing)):
+                    store(key, value)
+        return {k: known[k] for k in keys}
+
+    def user(self, login):
+        if not login:
+            return None
+        user = self._users.get(login, False)
+        if user is False:
+            user = self._store_user(login, self._fetch_user(login))
+        return user
+
+    def users(self, logins):
+        """ dict of login to User (or None) for all the logins, unknown ones are requested concurrently """
+        return self._resolve(logins, self._users, self._fetch_user, self._store_user)
+
+    def user_list(self, logins):
+        """ Users (or None) in the order of logins """
+        users = self.users(logins)
+        return [users.get(login) for login in logins]
+
+    def user_by_email(self, email):
+        """ User with the email among the users resolved so far """
+        return self._users_by_email.get(email)
+
+    def group(self, name):
+        if not name:
+            return None
+        group = self._groups.get(name, False)
+        if group is False:
+            group = self._store_group(name, self._fetch_group(name))
+        return group
+
+    def groups(self, names):
+        return self._resolve(names, self._groups, self._fetch_group, self._store_group)
+
+    def prefetch_issue_users(self, issues):
+        """ Resolves reporters, updaters, assignees and voters of all the issues in one batch """
+        logins = []
+        for issue in issues:
+            for field in ISSUE_USER_FIELDS:
+                logins.extend(_logins(issue.get(field, None)))
+        return self.users(logins)
+
+    def discard_user(self, login):
+        with self._lock:
+            user = self._users.pop(login, None)
+            if user is not None and self._users_by_email.get(user.get('email', None)) is user:
+                del self._users_by_email[user['email']]
+
+    def discard_group(self, name):
+        with self._lock:
+            self._groups.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._users_by_email.clear()
+            self._groups.clear()
+
+
+class AsyncIdentityMap(object):
+    """ IdentityMap of an AsyncConnection: the same lookups, returning awaitables.
+
+        Concurrent lookups of one login or group name wait for a single request. Lookups that failed are not
+        kept, the next one asks again.
+    """
+
+    def __init__(self, connection, ignore_missing=False):
+        self.connection = connection
+        self.ignore_missing = ignore_missing
+        # tasks resolving to the User, Group or None
+        self._users = {}
+        self._users_by_email = {}
+        self._groups = {}
+
+    async def _fetch(self, fetch, key):
+        try:
+            return await fetch(key)
+        except youtrack.YouTrackException as e:
+            if e.response.status != 404 or not self.ignore_missing:
+                raise
+            return None
+
+    async def _lookup(self, known, fetch, key):
+        if not key:
+            return None
+        task = known.get(key)
+        if task is None:
+            task = known[key] = asyncio.ensure_future(self._fetch(fetch, key))
+        try:
+            return await task
+        except Exception:
+            if known.get(key) is task:
+                del known[key]
+            raise
+
+    async def user(self, login):
+        user = await self._lookup(self._users, self.connection.get_user, login)
+        if user is not None and user.get('email', None):
+            self._users_by_email.setdefault(user['email'], user)
+        return user
+
+    async def user_list(self, logins):
+        return list(await asyncio.gather(*[self.user(login) for login in logins]))
+
+    async def users(self, logins):
+        logins = list(dict.fromkeys(login for login in logins if login))
+        return dict(zip(logins, await self.user_list(logins)))
+
+    def user_by_email(self, email):
+        return self._users_by_email.get(email)
+
+    async def group(self, name):
+        return await self._lookup(self._groups, self.connection.get_group, name)
+
+    async def groups(self, names):
+        names = list(dict.fromkeys(name for name in names if name))
+        return dict(zip(names, await asyncio.gather(*[self.group(name) for name in names])))
+
+    async def prefetch_issue_users(self, issues):
+        logins = []
+        for issue in issues:
+            for field in ISSUE_USER_FIELDS:
+                logins.extend(_logins(issue.get(field, None)))
+        return await self.users(logins)
+
+    def discard_user(self, login):
+        task = self._users.pop(login, None)
+        if task is not None and task.done() and not task.cancelled() and task.exception() is None:
+            user = task.result()
+            if user is not None and self._users_by_email.get(user.get('email', None)) is user:
+                del self._users_by_email[user['email']]
+
+    def discard_group(self, name):
+        self._groups.pop(name, None)
+
+    def clear(self):
+        self._users.clear()
+        self._users_by_email.clear()
+        self._groups.clear()
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+"""
+Request bodies and results of the YouTrack import API
+"""
+import asyncio
+import threading
+from xml.sax.saxutils import escape, quoteattr
+
+ISSUES_HEAD = b'<issues>\n'
+ISSUES_TAIL = b'</issues>'
+
+
+def _import_bad_fields(tt_settings):
+    bad_fields = ['id', 'projectShortName', 'votes', 'commentsCount',
+                  'historyUpdated', 'updatedByFullName', 'updaterFullName',
+                  'reporterFullName', 'links', 'attachments', 'jiraId',
+                  'entityId', 'tags', 'sprint']
+    if tt_settings and tt_settings['Enabled'] and tt_settings['TimeSpentField']:
+        bad_fields.append(tt_settings['TimeSpentField'])
+    return bad_fields
+
+
+def _iter_issue_xml(issue, bad_fields):
+    # parts of the <issue> record, in document order
+    yield '  <issue>\n'
+
+    comments = None
+    if getattr(issue, "getComments", None):
+        comments = issue.get_comments()
+
+    for issue_attr in issue:
+        attr_value = issue[issue_attr]
+        if attr_value is None:
+            continue
+        if issue_attr == 'comments':
+            comments = attr_value
+        elif issue_attr not in bad_fields:
+            # ignore bad fields from getIssue()
+            yield '    <field name=' + quoteattr(issue_attr) + '>\n'
+            if not isinstance(attr_value, (list, tuple)):
+                attr_value = [attr_value]
+            for v in attr_value:
+                yield '      <value>' + escape(v.strip()) + '</value>\n'
+            yield '    </field>\n'
+
+    if comments:
+        for comment in comments:
+            yield '    <comment' + ''.join(' ' + ca + '=' + quoteattr(comment[ca]) for ca in comment) + '/>\n'
+
+    yield '  </issue>\n'
+
+
+def _issue_xml(issue, bad_fields):
+    return ''.join(_iter_issue_xml(issue, bad_fields))
+
+
+class IssueBatch(object):
+    """ Encoded <issue> records sent in one import request """
+
+    def __init__(self):
+        self.numbers = []
+        self.records = []
+        self.size = len(ISSUES_HEAD) + len(ISSUES_TAIL)
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, number, record):
+        self.numbers.append(number)
+        self.records.append(record)
+        self.size += len(record)
+
+    def record(self, number):
+        return self.records[self.numbers.index(number)]
+
+    def split(self):
+        """ Two batches with the first and the second half of the records """
+        halves = IssueBatch(), IssueBatch()
+        middle = len(self) // 2
+        for i, (number, record) in enumerate(zip(self.numbers, self.records)):
+            halves[i >= middle].add(number, record)
+        return halves
+
+    def iter_body(self):
+        yield ISSUES_HEAD
+        yield from self.records
+        yield ISSUES_TAIL
+
+    def body(self):
+        return b''.join(self.iter_body())
+
+
+def iter_issue_batches(issues, bad_fields, batch_size=100, max_bytes=4 * 2 ** 20):
+    """ Encodes issues one by one and yields them as IssueBatch objects of at most batch_size issues and max_bytes
+        body size (a single larger issue makes a batch of its own). None disables a limit. issues may be any
+        iterable, only the batch being filled is held in memory.
+    """
+    batch = IssueBatch()
+    for issue in issues:
+        record = _issue_xml(issue, bad_fields).encode('utf-8')
+        if len(batch) and ((batch_size is not None and len(batch) >= batch_size) or
+                           (max_bytes is not None and batch.size + len(record) > max_bytes)):
+            yield batch
+            batch = IssueBatch()
+        batch.add(str(issue['numberInProject']), record)
+    if len(batch):
+        yield batch
+
+
+class IssueBatchResult(object):
+    """ Server's answer to the import of one IssueBatch.
+
+        items maps numberInProject to the <item> element reported for it. document is the parsed importResult,
+        or '' when the server rejected the batch without a parseable report.
+    """
+
+    def __init__(self, batch, document):
+        self.batch = batch
+        self.document = document
+        # requests made for these issues, including those for rejected batches they were part of
+        self.requests = 1
+        self.items = {}
+        if hasattr(document, 'getElementsByTagName'):
+            for item in document.getElementsByTagName('item'):
+                self.items[item.getAttribute('id')] = item
+
+    @property
+    def numbers(self):
+        return self.batch.numbers
+
+    @property
+    def rejected(self):
+        """ True when the server did not report on any issue of the batch, e.g. for malformed input """
+        return not self.items and len(self.batch) > 0
+
+    def reason(self, number):
+        """ Why the issue was not imported: the <item> reported for it or the whole response """
+        item = self.items.get(number)
+        if item is not None:
+            return item.toxml()
+        if hasattr(self.document, 'toxml'):
+            return self.document.toxml()
+        return 'no import result'
+
+    @property
+    def imported(self):
+        return [n for n in self.batch.numbers if n in self.items and
+                self.items[n].getAttribute('imported').lower() == 'true']
+
+    @property
+    def failed(self):
+        return [n for n in self.batch.numbers if n not in self.items or
+                self.items[n].getAttribute('imported').lower() != 'true']
+
+    @property
+    def ok(self):
+        return not self.failed
+
+
+def bisect_batch(send, batch, _requests=0):
+    """ Sends the batch with send(batch) -> IssueBatchResult and yields the results.
+
+        A rejected batch is halved and each half is sent again, recursively, so k bad issues among n are isolated
+        in O(k log n) requests and all the other issues still get imported.
+    """
+    result = send(batch)
+    result.requests += _requests
+    if result.rejected and len(batch) > 1:
+        first, second = batch.split()
+        yield from bisect_batch(send, first, result.requests)
+        yield from bisect_batch(send, second)
+    else:
+        yield result
+
+
+async def bisect_batch_async(send, batch, _requests=0):
+    """ bisect_batch() for a coroutine function send, returns the list of results. The halves of a rejected batch
+        are sent concurrently.
+    """
+    result = await send(batch)
+    result.requests += _requests
+    if result.rejected and len(batch) > 1:
+        first, second = batch.split()
+        first, second = await asyncio.gather(bisect_batch_async(send, first, result.requests),
+                                             bisect_batch_async(send, second))
+        return first + second
+    return [result]
+
+
+class ImportResult(object):
+    """ Outcome of an import made of several requests.
+
+        imported lists numberInProject of imported issues, failed maps the others to the reason reported for them,
+        requests counts the requests made.
+
+        Example:
+            result = ImportResult.collect(connection.iter_import_issues('A', 'devs', issues))
+            for number, reason in result.failed.items():
+                ...
+    """
+
+    def __init__(self):
+        self.imported = []
+        self.failed = {}
+        self.requests = 0
+
+    @classmethod
+    def collect(cls, batch_results):
+        result = cls()
+        for batch_result in batch_results:
+            result.add(batch_result)
+        return result
+
+    def add(self, batch_result):
+        self.requests += batch_result.requests
+        self.imported.extend(batch_result.imported)
+        for number in batch_result.failed:
+            self.failed[number] = batch_result.reason(number)
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __repr__(self):
+        return '<ImportResult imported=%d failed=%d requests=%d>' % (
+            len(self.imported), len(self.failed), self.requests)
+
+
+def _link_key(link):
+    if hasattr(link, 'type_name'):
+        return link
+    return link['typeName'], link['source'], link['target']
+
+
+def dedup_links(links):
+    """ links without repetitions, in order of first occurrence. Links are equal when their type, source and
+        target are, see Link.__eq__; dicts are compared by the same fields.
+    """
+    seen = set()
+    for link in links:
+        key = _link_key(link)
+        if key not in seen:
+            seen.add(key)
+            yield link
+
+
+class LinkBatchResult(object):
+    """ Server's answer to the import of one chunk of links.
+
+        document is the parsed response, or '' when the request failed. errors holds the <error> elements reported
+        for single links, or the reason the whole chunk was rejected. attempts counts the requests made for it.
+    """
+
+    def __init__(self, links, document, attempts=1, error=None):
+        self.links = links
+        self.document = document
+        self.attempts = attempts
+        self.errors = []
+        if error is not None:
+            self.errors.append(error)
+        elif hasattr(document, 'getElementsByTagName'):
+            if document.documentElement.tagName == 'error':
+                self.errors.append(document.toxml())
+            else:
+                self.errors.extend(e.toxml() for e in document.getElementsByTagName('error'))
+        else:
+            self.errors.append('no import result')
+
+    @property
+    def rejected(self):
+        """ True when the chunk failed as a whole and may be sent again """
+        return not hasattr(self.document, 'documentElement') or self.document.documentElement.tagName == 'error'
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+class WorkItemsResult(object):
+    """ Outcome of a bulk work item request: issue ids done, failed ones mapped to the error, work items sent """
+
+    def __init__(self):
+        self.done = []
+        self.failed = {}
+        self.work_items = 0
+
+    def add(self, issue_id, work_items, outcome):
+        if isinstance(outcome, Exception):
+            self.failed[issue_id] = outcome
+        else:
+            self.done.append(issue_id)
+            self.work_items += len(work_items)
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __repr__(self):
+        return '<WorkItemsResult issues=%d failed=%d work_items=%d>' % (
+            len(self.done), len(self.failed), self.work_items)
+
+
+class ImportSession(object):
+    """ Imports into one project with the project's import context requested once.
+
+        The context is the time tracking settings, which decide the fields left out of issue records, the types of
+        the project's custom fields and the bundles behind them. Each part is requested on first use and kept until
+        refresh() is called, e.g. after fields or bundle values were added during the import.
+
+        Example:
+            session = ImportSession(connection, 'A')
+            for chunk in chunks:
+                result = session.import_issues(chunk, 'devs')
+            session.import_links(links)
+    """
+
+    def __init__(self, connection, project_id, max_workers=4):
+        self.connection = connection
+        self.project_id = project_id
+        self.max_workers = max_workers
+        self._context = {}
+        # reentrant, parts of the context are loaded from other parts
+        self._lock = threading.RLock()
+
+    def _get(self, name, load):
+        with self._lock:
+            if name not in self._context:
+                self._context[name] = load()
+            return self._context[name]
+
+    def refresh(self, *names):
+        """ Drops the cached context, or only the named parts of it: 'time_tracking', 'fields', 'field_types',
+            'bundles'
+        """
+        with self._lock:
+            if names:
+                for name in names:
+                    self._context.pop(name, None)
+            else:
+                self._context.clear()
+
+    @property
+    def time_tracking(self):
+        return self._get('time_tracking',
+                         lambda: self.connection.get_project_time_tracking_settings(self.project_id))
+
+    @property
+    def bad_fields(self):
+        return _import_bad_fields(self.time_tracking)
+
+    @property
+    def fields(self):
+        """ ProjectCustomField objects by field name """
+        return self._get('fields', lambda: {f['name']: f for f in self.connection.get_project_custom_fields(
+            self.project_id, max_workers=self.max_workers)})
+
+    @property
+    def field_types(self):
+        """ Types of the project's custom fields by field name, e.g. 'enum[1]' """
+        def load():
+            types = {name: field['type'] for name, field in self.fields.items() if field.get('type', None)}
+            # older servers leave the type out of project fields, it is taken from the field prototype then
+            names = [name for name in self.fields if name not in types]
+            fields = self.connection._fan_out(self.connection.get_custom_field, [(n,) for n in names],
+                                              self.max_workers)
+            types.update((name, field['type']) for name, field in zip(names, fields))
+            return types
+        return self._get('field_types', load)
+
+    @property
+    def bundles(self):
+        """ Bundles of the project's custom fields that have one, by field name """
+        def load():
+            types = self.field_types
+            names = [name for name, field in self.fields.items()
+                     if field.get('bundle', None) and
+                     self.connection.get_field_type(types[name]) in self.connection.bundle_paths]
+            bundles = self.connection._fan_out(self.connection.get_bundle,
+                                               [(types[n], self.fields[n]['bundle']) for n in names],
+                                               self.max_workers)
+            return dict(zip(names, bundles))
+        return self._get('bundles', load)
+
+    def iter_import_issues(self, issues, assignee_group, batch_size=100, max_bytes=4 * 2 ** 20, bisect=True):
+        """ See Connection.iter_import_issues() """
+        return self.connection.iter_import_issues(self.project_id, assignee_group, issues, batch_size, max_bytes,
+                                                  bisect, bad_fields=self.bad_fields)
+
+    def import_issues(self, issues, assignee_group, batch_size=100, max_bytes=4 * 2 ** 20, bisect=True):
+        """ Imports issues from any iterable, returns ImportResult """
+        return ImportResult.collect(self.iter_import_issues(issues, assignee_group, batch_size, max_bytes, bisect))
+
+    def import_links(self, links):
+        return self.connection.import_links(links)
+
+    def import_work_items(self, issue_id, work_items):
+        return self.connection.import_work_items(issue_id, work_items)
+
+    def import_attachment(self, issue_id, name, content, author_login, content_type=None, content_length=None,
+                          created=None, group=''):
+        return self.connection.import_attachment(issue_id, name, content, author_login, content_type,
+                                                 content_length, created, group)
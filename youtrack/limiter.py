@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Client side limits on the requests a connection makes: in flight at a time and per second
+"""
+import contextlib
+import http.client
+import threading
+import time
+
+
+class TokenBucket(object):
+    """ Lets through rate requests per second on average, bursts of up to burst at once """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.clock = clock
+        self.sleep = sleep
+        # time at which the bucket is empty again: tokens are taken by moving it on by 1 / rate each, a full
+        # bucket lies burst / rate back. Waits are worked out from it, not from fractions of tokens.
+        self._empty_at = clock() - self.burst / rate
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self):
+        with self._lock:
+            return min(self.burst, (self.clock() - self._empty_at) * self.rate)
+
+    def acquire(self):
+        """ Takes a token, waiting for one when there is none left """
+        with self._lock:
+            now = self.clock()
+            self._empty_at = max(self._empty_at, now - self.burst / self.rate) + 1.0 / self.rate
+            # the token taken is free once the bucket empties before now
+            wait = self._empty_at - now
+        if wait > 0:
+            self.sleep(wait)
+
+
+class _Slot(object):
+    # a request let through by ConcurrencyLimiter.slot(), set overloaded when the server shows signs of it
+    def __init__(self, started):
+        self.started = started
+        self.overloaded = False
+
+
+class ConcurrencyLimiter(object):
+    """ Limit on the requests in flight at a time, adapted to how the server copes (AIMD).
+
+        The limit grows by increase for every limit requests answered in time, about one more request in flight per
+        round of requests, up to max_limit. It is multiplied by decrease, down to min_limit, when a request is
+        answered with a server error, a throttling status or a connection failure, or takes more than
+        latency_factor times the usual latency. The usual latency is a moving average of the latencies of
+        requests answered in time. Requests started before the limit was last lowered don't lower it again, so a
+        burst of failures counts once.
+
+        rate, when given, caps the requests per second as well, see TokenBucket.
+
+        A limiter is shared by every request of a connection, and may be shared by several connections to the
+        same server. Requests over the limit wait for one in flight to complete, so bulk methods may be given
+        more workers than the server would take and let the limiter find how many it does.
+
+        Example:
+            connection = Connection(url, login, password, limiter=ConcurrencyLimiter(max_limit=32, rate=200))
+            connection.get_work_items_for_issues(ids, max_workers=32)
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=64, increase=1, decrease=0.5, latency_factor=2.0,
+                 smoothing=0.1, warmup=10, rate=None, burst=None, clock=time.monotonic):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError('expected 1 <= min_limit <= initial <= max_limit')
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.smoothing = smoothing
+        self.warmup = warmup
+        self.clock = clock
+        self.bucket = TokenBucket(rate, burst, clock) if rate is not None else None
+        self.in_flight = 0
+        self.latency = None
+        self._samples = 0
+        self._lowered = None
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """ Waits for a free slot, returns the time the request starts """
+        if self.bucket is not None:
+            self.bucket.acquire()
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            return self.clock()
+
+    def release(self, started, overloaded=False):
+        """ Frees the slot of a request started at started and adapts the limit to how it went """
+        with self._cond:
+            self.in_flight -= 1
+            now = self.clock()
+            latency = now - started
+            slow = self.latency is not None and self._samples >= self.warmup and \
+                latency > self.latency_factor * self.latency
+            if overloaded or slow:
+                if self._lowered is None or started >= self._lowered:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                    self._lowered = now
+            else:
+                self._samples += 1
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency += self.smoothing * (latency - self.latency)
+                self.limit = min(float(self.max_limit), self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self):
+        """ Context manager holding a slot for one request. Set overloaded on the yielded object when the response
+            shows the server is overloaded; connection failures count as such.
+        """
+        slot = _Slot(self.acquire())
+        try:
+            yield slot
+        except (OSError, http.client.HTTPException):
+            slot.overloaded = True
+            raise
+        finally:
+            self.release(slot.started, slot.overloaded)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import mmap
+import os
+import stat
+import uuid
+
+
+class MultipartBody(object):
+    """ multipart/form-data request body with a single file part, streamed from a file object.
+
+        The body is an iterable of chunks, http.client sends it piece by piece: the file is read chunk_size bytes
+        at a time and never held in memory as a whole. Files mapped with from_path() are sent as slices of the
+        mapping, without copying. When the length is not given and can't be worked out from the file, the body is
+        sent with chunked transfer encoding.
+
+        Iterating again, e.g. when a request is retried, starts over from the position the file had initially.
+        That needs a seekable file, ValueError is raised otherwise.
+    """
+
+    def __init__(self, name, fileobj, content_type=None, length=None, chunk_size=2 ** 16, field_name=None):
+        self.name = name
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.boundary = uuid.uuid4().hex
+        self._mapping = fileobj if isinstance(fileobj, mmap.mmap) else None
+        self._start = self._tell()
+        self._consumed = False
+        if length is None:
+            length = self._remaining()
+        self.length = length
+        filename = name.replace('"', '%22').replace('\r', ' ').replace('\n', ' ')
+        self.head = ('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\nContent-Type: %s\r\n\r\n' %
+                     (self.boundary, (field_name or filename), filename,
+                      content_type or 'application/octet-stream')).encode('utf-8')
+        self.tail = ('\r\n--%s--\r\n' % self.boundary).encode('ascii')
+
+    @classmethod
+    def from_path(cls, path, name=None, content_type=None, chunk_size=2 ** 16):
+        """ Body with the content of a local file, mapped into memory rather than read """
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            fileobj = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else open(path, 'rb')
+        return cls(name or os.path.basename(path), fileobj, content_type, size, chunk_size)
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary=' + self.boundary
+
+    def headers(self):
+        # without Content-Length http.client sends the body with chunked transfer encoding
+        headers = {'Content-Type': self.content_type}
+        if self.length is not None:
+            headers['Content-Length'] = str(len(self.head) + self.length + len(self.tail))
+        return headers
+
+    def _tell(self):
+        try:
+            return self.fileobj.tell()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    def _remaining(self):
+        if self._mapping is not None:
+            return len(self._mapping) - self._start
+        try:
+            info = os.fstat(self.fileobj.fileno())
+            if stat.S_ISREG(info.st_mode) and self._start is not None:
+                return info.st_size - self._start
+        except (AttributeError, OSError, ValueError):
+            pass
+        if self._start is not None and getattr(self.fileobj, 'seekable', lambda: False)():
+            end = self.fileobj.seek(0, os.SEEK_END)
+            self.fileobj.seek(self._start)
+            return end - self._start
+        return None
+
+    def _rewind(self):
+        if self._consumed:
+            seekable = self._mapping is not None or getattr(self.fileobj, 'seekable', lambda: False)()
+            if self._start is None or not seekable:
+                raise ValueError("can't send the content of %s again, the file is not seekable" % self.name)
+            if self._mapping is None:
+                self.fileobj.seek(self._start)
+        self._consumed = True
+
+    def __iter__(self):
+        self._rewind()
+        yield self.head
+        if self._mapping is not None:
+            view = memoryview(self._mapping)
+            end = self._start + self.length
+            for offset in range(self._start, end, self.chunk_size):
+                yield view[offset:min(offset + self.chunk_size, end)]
+        else:
+            while True:
+                chunk = self.fileobj.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        yield self.tail
+
+    def close(self):
+        close = getattr(self.fileobj, 'close', None)
+        if close is not None:
+            close()
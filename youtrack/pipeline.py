@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Import of several projects at once, with a bounded number of requests in flight per stage
+"""
+import concurrent.futures
+import time
+
+from youtrack.importing import ImportSession
+
+STAGES = ('issues', 'work_items', 'attachments', 'links')
+
+
+def _project_of(issue_id):
+    return issue_id.rsplit('-', 1)[0]
+
+
+class ProjectImport(object):
+    """ Data to import into one project.
+
+        issues is any iterable accepted by Connection.import_issues. links are Link objects or dicts with source and
+        target issue ids. work_items maps issue id to the work items of the issue. attachments are dicts of
+        Connection.import_attachment keyword arguments (issue_id, name, content, author_login, ...).
+    """
+
+    def __init__(self, project_id, assignee_group, issues=(), links=(), work_items=None, attachments=()):
+        self.project_id = project_id
+        self.assignee_group = assignee_group
+        self.issues = issues
+        self.links = links
+        self.work_items = work_items or {}
+        self.attachments = attachments
+
+
+class ProjectStats(object):
+    """ Progress of one project: items done and failed per stage, errors raised and timing """
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self.done = dict((stage, 0) for stage in STAGES)
+        self.failed = dict((stage, 0) for stage in STAGES)
+        self.pending = 0
+        self.errors = []
+        self.issue_result = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def issues_per_second(self):
+        elapsed = self.elapsed
+        return self.done['issues'] / elapsed if elapsed else 0.0
+
+    @property
+    def complete(self):
+        return self.finished is not None
+
+    def __repr__(self):
+        return '<ProjectStats %s: %s failed=%s %.1f issues/s>' % (
+            self.project_id, self.done, self.failed, self.issues_per_second)
+
+
+class ImportPipeline(object):
+    """ Imports several projects concurrently through the Connection import methods.
+
+        Every project goes through stages: issues first, then its work items and attachments. A link is imported
+        once the issues of both its source and target projects are (projects not taking part in the run are taken
+        as already imported). Each stage runs on its own pool, concurrency maps stage name to pool size.
+        progress, when given, is called with the ProjectStats of a project whenever a request for it completes.
+
+        Example:
+            pipeline = ImportPipeline(connection, concurrency={'issues': 4, 'links': 2})
+            stats = pipeline.run([ProjectImport('A', 'devs', issues_a, links=links_a), ...])
+    """
+
+    default_concurrency = {'issues': 4, 'work_items': 8, 'attachments': 4, 'links': 2}
+
+    def __init__(self, connection, concurrency=None, batch_size=100, link_batch_size=1000, progress=None):
+        self.connection = connection
+        self.concurrency = dict(self.default_concurrency)
+        self.concurrency.update(concurrency or {})
+        self.batch_size = batch_size
+        self.link_batch_size = link_batch_size
+        self.progress = progress
+        self.stats = {}
+
+    # stage tasks, run on the stage pools
+
+    def _import_issues(self, project):
+        session = ImportSession(self.connection, project.project_id)
+        return session.import_issues(project.issues, project.assignee_group, batch_size=self.batch_size)
+
+    # the stages below return (items done, items failed)
+
+    def _import_work_items(self, issue_id, work_items):
+        document = self.connection.import_work_items(issue_id, work_items)
+        errors = document.getElementsByTagName('error') if hasattr(document, 'getElementsByTagName') else []
+        failed = min(len(errors), len(work_items))
+        return len(work_items) - failed, failed
+
+    def _import_attachment(self, attachment):
+        self.connection.import_attachment(**attachment)
+        return 1, 0
+
+    def _import_links(self, links):
+        # one chunk, repetitions dropped from it count as done
+        result = next(self.connection.iter_import_links(links, batch_size=len(links), max_workers=1, retries=0))
+        failed = len(links) if result.rejected else min(len(result.errors), len(result.links))
+        return len(links) - failed, failed
+
+    # coordination, run on the calling thread
+
+    def run(self, projects):
+        """ Imports all the projects, returns ProjectStats by project id """
+        projects = list(projects)
+        by_id = dict((p.project_id, p) for p in projects)
+        self.stats = dict((p.project_id, ProjectStats(p.project_id)) for p in projects)
+        imported = set()
+        failed = set()
+        # links by the project listing them and the projects of their ends taking part in the run
+        waiting_links = {}
+        for project in projects:
+            for link in project.links:
+                ends = frozenset(_project_of(link[end]) for end in ('source', 'target')) & set(by_id)
+                waiting_links.setdefault((project.project_id, ends), []).append(link)
+
+        pools = dict((stage, concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency[stage]))
+                     for stage in STAGES)
+        futures = {}
+
+        def submit(stage, project_id, count, fn, *args):
+            futures[pools[stage].submit(fn, *args)] = (stage, project_id, count)
+            self.stats[project_id].pending += 1
+
+        def release_links():
+            for key in list(waiting_links):
+                owner, ends = key
+                if ends & failed:
+                    self.stats[owner].failed['links'] += len(waiting_links.pop(key))
+                elif ends <= imported:
+                    links = waiting_links.pop(key)
+                    for i in range(0, len(links), self.link_batch_size):
+                        part = links[i:i + self.link_batch_size]
+                        submit('links', owner, len(part), self._import_links, part)
+
+        def settle(stats):
+            if stats.finished is None and stats.pending == 0 and \
+                    not any(owner == stats.project_id for owner, _ in waiting_links):
+                stats.finished = time.monotonic()
+
+        try:
+            for project in projects:
+                self.stats[project.project_id].started = time.monotonic()
+                submit('issues', project.project_id, 0, self._import_issues, project)
+            while futures:
+                done, _ = concurrent.futures.wait(list(futures), return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    stage, project_id, count = futures.pop(future)
+                    stats = self.stats[project_id]
+                    stats.pending -= 1
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        stats.errors.append((stage, e))
+                        if stage == 'issues':
+                            failed.add(project_id)
+                        else:
+                            stats.failed[stage] += count
+                    else:
+                        if stage == 'issues':
+                            stats.issue_result = result
+                            stats.done['issues'] += len(result.imported)
+                            stats.failed['issues'] += len(result.failed)
+                            imported.add(project_id)
+                            project = by_id[project_id]
+                            for issue_id, work_items in project.work_items.items():
+                                submit('work_items', project_id, len(work_items), self._import_work_items,
+                                       issue_id, work_items)
+                            for attachment in project.attachments:
+                                submit('attachments', project_id, 1, self._import_attachment, attachment)
+                        else:
+                            done_count, failed_count = result
+                            stats.done[stage] += done_count
+                            stats.failed[stage] += failed_count
+                    if stage == 'issues':
+                        release_links()
+                        for other in self.stats.values():
+                            settle(other)
+                    else:
+                        settle(stats)
+                    if self.progress is not None:
+                        self.progress(stats)
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+        return self.stats
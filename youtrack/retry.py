@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+When and how long to wait before a failed request is made again
+"""
+import collections
+import email.utils
+import http.client
+import random
+import threading
+import time
+
+import youtrack
+
+AUTH = 'auth'
+THROTTLED = 'throttled'
+SERVER = 'server'
+TRANSPORT = 'transport'
+
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+
+
+class CircuitOpenError(youtrack.YouTrackBroadException):
+    """ Raised instead of making a request while the circuit breaker is open """
+
+    def __init__(self, retry_in):
+        self.retry_in = retry_in
+        super().__init__('Too many failed requests, not sending any for %.1f s' % retry_in)
+
+
+def _retry_after(response, now):
+    # seconds to wait asked by a Retry-After header, given as seconds or as a date
+    value = response.get('retry-after') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy(object):
+    """ Decides which failed requests of a connection are made again and when.
+
+        Errors are classified as auth (401, 403: the session is renewed and the request made again right away, once),
+        throttled (429, 503: retried after the time asked by Retry-After, or backoff), server (500, 502, 504:
+        retried after backoff) and transport (connection failures: retried after backoff). Server and transport
+        errors are retried for idempotent methods only, the request may have been carried out already. Other
+        errors are raised at once. Backoff is exponential with full jitter: a random time up to
+        backoff * 2 ** retry seconds, max_backoff at most. A Retry-After longer than max_retry_after is not waited
+        for, the error is raised.
+
+        Retries draw from a budget of at most budget retries, refilled by budget_ratio per successful request, so
+        a failing server gets a bounded share of retries on top of the regular load.
+
+        The circuit breaker opens when at least breaker_min_calls of the last breaker_window requests were made
+        and the share of them failing with a server, throttled or transport error reaches breaker_threshold.
+        While open, requests fail at once with CircuitOpenError. After breaker_cooldown seconds a single request
+        is let through: the breaker closes if it succeeds and opens again otherwise.
+
+        A policy keeps the state of one connection, see Connection(retry=...).
+
+        Example:
+            connection = Connection(url, login, password, retry=RetryPolicy(max_attempts=8, max_backoff=60))
+    """
+
+    def __init__(self, max_attempts=5, backoff=0.5, max_backoff=30.0, max_retry_after=120.0, budget=10,
+                 budget_ratio=0.1, breaker_window=50, breaker_min_calls=20, breaker_threshold=0.5,
+                 breaker_cooldown=30.0, sleep=time.sleep, clock=time.monotonic, random=random.random):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.budget = budget
+        self.budget_ratio = budget_ratio
+        self.breaker_min_calls = breaker_min_calls
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.sleep = sleep
+        self.clock = clock
+        self.random = random
+        self.tokens = float(budget)
+        self.retries = 0
+        self._outcomes = collections.deque(maxlen=breaker_window)
+        self._opened = None
+        # the probe let through while half-open, a token object
+        self._probe = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def classify(error):
+        """ AUTH, THROTTLED, SERVER, TRANSPORT or None for errors not worth retrying """
+        if isinstance(error, youtrack.YouTrackException):
+            status = error.response.status
+            if status in (401, 403):
+                return AUTH
+            if status in (429, 503):
+                return THROTTLED
+            if status in (500, 502, 504):
+                return SERVER
+            return None
+        if isinstance(error, (OSError, http.client.HTTPException)):
+            return TRANSPORT
+        return None
+
+    @property
+    def state(self):
+        """ 'closed', 'open' or 'half-open' """
+        with self._lock:
+            if self._opened is None:
+                return 'closed'
+            return 'open' if self.clock() - self._opened < self.breaker_cooldown else 'half-open'
+
+    def check(self):
+        """ Raises CircuitOpenError unless a request may be made now. Returns a token when the request is the probe
+            of a half-open breaker, to be given to abandon() should it end without an outcome.
+        """
+        with self._lock:
+            if self._opened is None:
+                return None
+            retry_in = self._opened + self.breaker_cooldown - self.clock()
+            if retry_in > 0 or self._probe is not None:
+                raise CircuitOpenError(max(retry_in, 0.0))
+            self._probe = object()
+            return self._probe
+
+    def abandon(self, probe):
+        """ Lets another request probe when this probe was interrupted before it was recorded """
+        with self._lock:
+            if probe is not None and self._probe is probe:
+                self._probe = None
+
+    def _record(self, failed):
+        # with the lock held
+        if self._opened is not None:
+            if self._probe is not None:
+                self._probe = None
+                if failed:
+                    self._opened = self.clock()
+                else:
+                    self._opened = None
+                    self._outcomes.clear()
+            return
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.breaker_min_calls and \
+                sum(self._outcomes) >= self.breaker_threshold * len(self._outcomes):
+            self._opened = self.clock()
+
+    def succeeded(self):
+        with self._lock:
+            self._record(False)
+            self.tokens = min(self.budget, self.tokens + self.budget_ratio)
+
+    def failed(self, error, attempt, method='GET'):
+        """ Records a failed attempt (numbered from 0) and returns (kind, seconds to wait) when the request is to be
+            made again, None when the error is to be raised
+        """
+        kind = self.classify(error)
+        with self._lock:
+            if kind in (THROTTLED, SERVER, TRANSPORT):
+                self._record(True)
+            elif self._probe is not None:
+                # the server answered, it is up
+                self._record(False)
+            if kind is None or attempt + 1 >= self.max_attempts or self._opened is not None:
+                return None
+            if kind == AUTH:
+                return kind, 0.0
+            if kind in (SERVER, TRANSPORT) and method not in IDEMPOTENT_METHODS:
+                return None
+            delay = None
+            if kind == THROTTLED:
+                delay = _retry_after(error.response, time.time())
+                if delay is not None and delay > self.max_retry_after:
+                    return None
+            if delay is None:
+                delay = self.random() * min(self.max_backoff, self.backoff * 2 ** attempt)
+            if self.tokens < 1:
+                return None
+            self.tokens -= 1
+            self.retries += 1
+            return kind, delay
+
+    def call(self, connection, method, attempt):
+        """ attempt() until it succeeds or the error is not retried. The session of the connection is renewed on
+            auth errors, with Connection._relogin().
+        """
+        tries = 0
+        relogged = False
+        while True:
+            probe = self.check()
+            headers = connection.headers
+            try:
+                result = attempt()
+            except Exception as e:
+                retry = self.failed(e, tries, method)
+                if retry is None:
+                    raise
+                kind, delay = retry
+                if kind == AUTH:
+                    # a session renewed once and still refused is no stale session
+                    if relogged or not connection._relogin(headers):
+                        raise
+                    relogged = True
+                if delay:
+                    self.sleep(delay)
+                tries += 1
+            else:
+                self.succeeded()
+                return result
+            finally:
+                # a no-op once the outcome was recorded
+                self.abandon(probe)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Parallel issue export split into shards by project and creation date
+"""
+import concurrent.futures
+from datetime import date, datetime, timedelta, timezone
+
+
+def _join_filter(*parts):
+    return ' '.join(part for part in parts if part)
+
+
+class IssueShard(object):
+    """ Part of the issue space: issues of one project created within [start, end] (both inclusive days) """
+
+    def __init__(self, base_filter='', project=None, start=None, end=None, date_field='created'):
+        self.base_filter = base_filter
+        self.project = project
+        self.start = start
+        self.end = end
+        self.date_field = date_field
+        self.count = None
+
+    @property
+    def filter(self):
+        project = 'project: {%s}' % self.project if self.project is not None else ''
+        window = ''
+        if self.start is not None and self.end is not None:
+            window = '%s: %s .. %s' % (self.date_field, self.start.isoformat(), self.end.isoformat())
+        return _join_filter(self.base_filter, project, window)
+
+    def can_split(self):
+        return self.start is not None and self.end is not None and self.start < self.end
+
+    def split(self):
+        middle = self.start + (self.end - self.start) // 2
+        return [IssueShard(self.base_filter, self.project, self.start, middle, self.date_field),
+                IssueShard(self.base_filter, self.project, middle + timedelta(days=1), self.end, self.date_field)]
+
+    def __repr__(self):
+        return '<IssueShard %s: %s>' % (self.filter, self.count)
+
+
+class ShardedIssueScan(object):
+    """ Fetches all issues matching a filter with several shards in flight at once.
+
+        The issue space is cut by project and by windows of the date_field ('created' by default, which never
+        changes, so issues do not move between shards while the scan runs). Windows holding more than shard_size
+        issues are halved until they fit or span a single day. Shards are fetched on a pool of max_workers threads,
+        largest first, each one paged by Connection.iter_issues.
+
+        Example:
+            for issue in ShardedIssueScan(connection, '#Unresolved', projects=['A', 'B'], max_workers=8):
+                ...
+    """
+
+    def __init__(self, connection, _filter='', projects=None, start=None, end=None, date_field='created',
+                 shard_size=5000, page_size=500, max_workers=4):
+        self.connection = connection
+        self.filter = _filter
+        self.projects = projects
+        self.start = start
+        self.end = end
+        self.date_field = date_field
+        self.shard_size = shard_size
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.shards = None
+
+    def _first_date(self, project):
+        shard = IssueShard(self.filter, project)
+        first = self.connection.get_all_issues(_join_filter(shard.filter, 'sort by: %s asc' % self.date_field), 0, 1)
+        if not first or first[0].get(self.date_field, None) is None:
+            return None
+        # windows are days in the server's time zone, which may be behind UTC
+        return datetime.fromtimestamp(int(first[0][self.date_field]) / 1000, timezone.utc).date() - timedelta(days=1)
+
+    def _count(self, shard):
+        shard.count = self.connection.get_number_of_issues(shard.filter)
+        return shard
+
+    def plan(self, executor):
+        projects = self.projects if self.projects is not None else [None]
+        # today of a server ahead of the client's clock may already be tomorrow
+        end = self.end or date.today() + timedelta(days=1)
+        if self.start is not None:
+            pending = [IssueShard(self.filter, p, self.start, end, self.date_field) for p in projects]
+        else:
+            pending = [IssueShard(self.filter, p, first, end, self.date_field) if first is not None else None
+                       for p, first in zip(projects, executor.map(self._first_date, projects))]
+            pending = [shard for shard in pending if shard is not None]
+        shards = []
+        while pending:
+            counted = list(executor.map(self._count, pending))
+            pending = []
+            for shard in counted:
+                if shard.count > self.shard_size and shard.can_split():
+                    pending.extend(shard.split())
+                elif shard.count > 0:
+                    shards.append(shard)
+        self.shards = sorted(shards, key=lambda s: s.count, reverse=True)
+        return self.shards
+
+    def _fetch(self, shard):
+        return list(self.connection.iter_issues(shard.filter, page_size=self.page_size))
+
+    def __iter__(self):
+        seen = set()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            shards = self.plan(executor)
+            futures = [executor.submit(self._fetch, shard) for shard in shards]
+            for future in concurrent.futures.as_completed(futures):
+                for issue in future.result():
+                    if issue['id'] not in seen:
+                        seen.add(issue['id'])
+                        yield issue
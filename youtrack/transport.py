@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import contextlib
+import http.client
+import queue
+import ssl
+import threading
+import urllib.parse
+
+import httplib2
+
+
+class HttpPool(object):
+    """ Thread-safe drop-in replacement for httplib2.Http.
+
+        httplib2.Http is not thread-safe, so the pool keeps up to pool_size instances and lends one to each
+        request. Every instance keeps its own keep-alive connection per host, so pool_size is also the number of
+        keep-alive connections kept open to each host. Requests block while all instances are in use.
+    """
+
+    def __init__(self, pool_size=10, **http_kwargs):
+        if pool_size < 1:
+            raise ValueError('pool_size must be positive, got %s' % pool_size)
+        self.pool_size = pool_size
+        self._http_kwargs = http_kwargs
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        # keep-alive connections for streamed responses, by (scheme, host, port), at most pool_size in use
+        self._streams = {}
+        self._streaming = threading.BoundedSemaphore(pool_size)
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        try:
+            return httplib2.Http(**self._http_kwargs)
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _checkin(self, http):
+        self._idle.put(http)
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        http = self._checkout()
+        try:
+            return http.request(uri, method, body=body, headers=headers, **kwargs)
+        except BaseException:
+            # state of the cached keep-alive connections is unknown after a failure
+            http.close()
+            raise
+        finally:
+            self._checkin(http)
+
+    def close(self):
+        with self._lock:
+            streams, self._streams = self._streams, {}
+        for connections in streams.values():
+            for connection in connections:
+                connection.close()
+        while True:
+            try:
+                http = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            http.close()
+            with self._lock:
+                self._created -= 1
+
+    def _stream_connection(self, key):
+        with self._lock:
+            idle = self._streams.setdefault(key, [])
+            if idle:
+                return idle.pop()
+        scheme, host, port = key
+        timeout = self._http_kwargs.get('timeout')
+        if scheme == 'https':
+            context = None
+            if self._http_kwargs.get('disable_ssl_certificate_validation'):
+                context = ssl._create_unverified_context()
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=context)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    @contextlib.contextmanager
+    def stream(self, uri, method='GET', headers=None):
+        """ Context manager making a request whose response body is read by the caller, e.g. in chunks to a file.
+
+            Yields an http.client.HTTPResponse. Its connection is kept alive for the next stream() call when the body
+            was read to the end, and closed otherwise. Up to pool_size streams are open at a time. proxy_info is
+            not applied to streamed requests.
+        """
+        url = urllib.parse.urlsplit(uri)
+        key = (url.scheme, url.hostname, url.port)
+        target = url.path + ('?' + url.query if url.query else '')
+        with self._streaming:
+            connection = self._stream_connection(key)
+            try:
+                try:
+                    connection.request(method, target, headers=headers or {})
+                    response = connection.getresponse()
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    # a kept-alive connection was closed by the server meanwhile
+                    connection.close()
+                    connection.request(method, target, headers=headers or {})
+                    response = connection.getresponse()
+                yield response
+            except BaseException:
+                connection.close()
+                raise
+            idle = None
+            if response.isclosed() and not response.will_close:
+                with self._lock:
+                    # None once close() dropped the idle connections meanwhile
+                    idle = self._streams.get(key)
+                    if idle is not None:
+                        idle.append(connection)
+            if idle is None:
+                connection.close()
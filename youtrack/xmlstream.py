@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from xml.dom import minidom, Node
+from xml.parsers import expat
+
+# characters not allowed in XML 1.0, plus the discouraged C1 controls, U+FDD0-U+FDDF, U+FFFE and U+FFFF.
+# Multi-byte ones are kept as UTF-8 sequences: their lead bytes never occur inside another sequence,
+# so they can be searched for and removed in the raw body without decoding it.
+_ILLEGAL_ASCII = bytes(range(0x00, 0x09)) + b'\x0b\x0c' + bytes(range(0x0e, 0x20)) + b'\x7f'
+_ILLEGAL_ASCII_BYTES = tuple(bytes([c]) for c in _ILLEGAL_ASCII)
+_ILLEGAL_SEQUENCES = (
+    (b'\xc2', tuple(chr(c).encode('utf-8') for c in list(range(0x80, 0x85)) + list(range(0x86, 0xa0)))),
+    (b'\xef\xb7', tuple(chr(c).encode('utf-8') for c in range(0xfdd0, 0xfde0))),
+    (b'\xef\xbf', tuple(chr(c).encode('utf-8') for c in (0xfffe, 0xffff))),
+)
+
+
+def sanitize(content, content_type=None):
+    """ Removes characters illegal in XML from a UTF-8 body.
+
+        Bodies of other than XML content type are returned as is. So are bodies without illegal characters:
+        they are only scanned, no copy is made.
+    """
+    if not content or (content_type is not None and 'xml' not in content_type):
+        return content
+    if any(c in content for c in _ILLEGAL_ASCII_BYTES):
+        content = content.translate(None, _ILLEGAL_ASCII)
+    for lead, sequences in _ILLEGAL_SEQUENCES:
+        if lead in content:
+            for sequence in sequences:
+                if sequence in content:
+                    content = content.replace(sequence, b'')
+    return content
+
+
+def _incomplete_tail(buf):
+    # number of trailing bytes that start a UTF-8 sequence continued in the next chunk
+    for i in range(1, min(4, len(buf)) + 1):
+        b = buf[-i]
+        if b < 0x80:
+            return 0
+        if b >= 0xc0:
+            length = 2 if b < 0xe0 else 3 if b < 0xf0 else 4
+            return i if length > i else 0
+    return 0
+
+
+def iter_sanitized(chunks, content_type=None):
+    """ sanitize() for a body arriving as an iterable of bytes chunks.
+        Sequences split between chunks are carried over to the next one.
+    """
+    if content_type is not None and 'xml' not in content_type:
+        yield from chunks
+        return
+    carry = b''
+    for chunk in chunks:
+        buf = carry + chunk if carry else chunk
+        tail = _incomplete_tail(buf)
+        if tail:
+            buf, carry = buf[:-tail], buf[-tail:]
+        else:
+            carry = b''
+        if buf:
+            yield sanitize(buf)
+    if carry:
+        yield sanitize(carry)
+
+
+def iter_elements(source, bufsize=2 ** 16):
+    """ Yields top-level child elements of the document one by one as minidom elements.
+
+        source is a bytes body, a binary file-like object or an iterable of bytes chunks.
+        expat only tracks where top-level elements start and end. Each one is then built by minidom on its own,
+        under a copy of the root start tag so namespace prefixes still resolve. Only the element being yielded
+        and the unparsed tail of the input are held in memory.
+    """
+    parser = expat.ParserCreate()
+    # byte offsets where top-level elements start, and where the root element is closed
+    boundaries = []
+    state = {'depth': 0, 'root': None, 'prefix_end': None}
+
+    def start(name, attrs):
+        if state['depth'] == 0:
+            state['root'] = name
+        elif state['depth'] == 1:
+            if state['prefix_end'] is None:
+                state['prefix_end'] = parser.CurrentByteIndex
+            boundaries.append(parser.CurrentByteIndex)
+        state['depth'] += 1
+
+    def end(name):
+        state['depth'] -= 1
+        if state['depth'] == 0:
+            boundaries.append(parser.CurrentByteIndex)
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+
+    whole = isinstance(source, (bytes, bytearray))
+    if whole:
+        chunks = [source]
+        buf = source
+    else:
+        chunks = iter(lambda: source.read(bufsize), b'') if hasattr(source, 'read') else source
+        buf = bytearray()
+    base = 0
+    prefix = suffix = None
+    for chunk in chunks:
+        if not whole:
+            buf += chunk
+        parser.Parse(chunk, False)
+        if prefix is None and state['prefix_end'] is not None:
+            prefix = bytes(buf[:state['prefix_end'] - base])
+            suffix = ('</%s>' % state['root']).encode('utf-8')
+        while len(boundaries) > 1:
+            fragment = buf[boundaries[0] - base:boundaries[1] - base]
+            document = minidom.parseString(prefix + fragment + suffix)
+            yield next(e for e in document.documentElement.childNodes if e.nodeType == Node.ELEMENT_NODE)
+            boundaries.pop(0)
+        if not whole and boundaries and prefix is not None:
+            del buf[:boundaries[0] - base]
+            base = boundaries[0]
+    parser.Parse(b'', True)
@@ -4,6 +4,9 @@ YouTrack 2.0 REST API (python 3 version)
 """
 
 import re
+import sys
+import threading
+from collections.abc import MutableMapping
 from xml.dom import Node
 from xml.dom import minidom
 from xml.dom.minidom import Document
@@ -40,6 +43,8 @@ def to_bytes(a):
 
 # mixin class for Python3 supporting __cmp__
 class Py3Cmp:
+    __slots__ = ()
+
     def __eq__(self, other):
         return self.__cmp__(other) == 0
 
@@ -88,13 +93,111 @@ class YouTrackException(Exception):
         super().__init__(msg)
 
 
+_MISSING = object()
+_field_tables_lock = threading.Lock()
+
+
+class FieldTable(object):
+    """ Field names and repeated values shared by all objects of one model class.
+
+        Objects keep only a list of values indexed by field position in the table. Field names are interned.
+        Short string values are interned per field until the field shows more than intern_limit distinct values,
+        so enum-like values ("Open", "Normal", project short names, logins) are stored once, while unique ones
+        (summaries, ids, timestamps) stop being tracked.
+    """
+
+    intern_limit = 1024
+
+    def __init__(self):
+        self.index = {}
+        self.names = []
+        self._interned = []
+        self._lock = threading.Lock()
+
+    def position(self, name):
+        try:
+            return self.index[name]
+        except KeyError:
+            with self._lock:
+                if name not in self.index:
+                    self.names.append(sys.intern(name) if type(name) is str else name)
+                    self._interned.append({})
+                    self.index[name] = len(self.names) - 1
+                return self.index[name]
+
+    def intern(self, position, value):
+        interned = self._interned[position]
+        if interned is None:
+            return value
+        if type(value) is str:
+            if len(value) <= 256:
+                value = interned.setdefault(value, value)
+        elif isinstance(value, list):
+            value = [interned.setdefault(v, v) if isinstance(v, str) and len(v) <= 256 else v for v in value]
+        if len(interned) > self.intern_limit:
+            self._interned[position] = None
+        return value
+
+
+class _DataView(MutableMapping):
+    """ dict-like view of YouTrackObject fields, kept for code using obj._data """
+
+    __slots__ = ('_obj',)
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __getitem__(self, key):
+        return self._obj[key]
+
+    def __setitem__(self, key, value):
+        self._obj[key] = value
+
+    def __delitem__(self, key):
+        self._obj._delete(key)
+
+    def __iter__(self):
+        return self._obj._names()
+
+    def __len__(self):
+        return sum(1 for _ in self._obj._names())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
 class YouTrackObject(Py3Cmp):
+    # '__dict__' keeps arbitrary attributes working, it is only allocated when such an attribute is set
+    __slots__ = ('_values', '_fields', '_types', 'youtrack', '__dict__', '__weakref__')
+
     def __init__(self, xml=None, youtrack=None):
-        self._data = {}
+        self._values = []
+        self._fields = self._field_table()
+        # xsi:type of the fields that have one, None until there is one; they differ between projects
+        self._types = None
         self.youtrack = youtrack
-        self._attribute_types = dict()
         self._update(xml)
 
+    @classmethod
+    def _field_table(cls):
+        table = cls.__dict__.get('_shared_fields')
+        if table is None:
+            with _field_tables_lock:
+                table = cls.__dict__.get('_shared_fields')
+                if table is None:
+                    table = FieldTable()
+                    cls._shared_fields = table
+        return table
+
+    @property
+    def _data(self):
+        return _DataView(self)
+
+    @property
+    def _attribute_types(self):
+        types = self._types or {}
+        return {name: types[name] for name in self._names() if name in types}
+
     def to_xml(self):
         raise NotImplementedError
 
@@ -114,26 +217,30 @@ class YouTrackObject(Py3Cmp):
                 self[a.name] = a.value
 
     def _update_from_children(self, el):
-        children = [e for e in el.childNodes if e.nodeType == Node.ELEMENT_NODE]
-        if children:
-            for c in children:
-                name = c.getAttribute('name')
-                value = None
-                if not len(name):
-                    continue
-                name = to_str(name)
-                values = c.getElementsByTagName('value')
-                if (values is not None) and len(values):
-                    if values.length == 1:
-                        value = self._text(values.item(0))
-                    elif values.length > 1:
-                        value = [self._text(value) for value in values]
-                elif c.hasAttribute('value'):
-                    value = c.getAttribute('value')
-                if value is not None:
-                    self[name] = value
-                    if c.hasAttribute('xsi:type'):
-                        self._attribute_types[name] = c.getAttribute('xsi:type')
+        for c in el.childNodes:
+            if c.nodeType == Node.ELEMENT_NODE:
+                self._update_field(c)
+
+    def _update_field(self, c, values=None):
+        name = c.getAttribute('name')
+        value = None
+        if not len(name):
+            return
+        name = to_str(name)
+        if values is None:
+            values = c.getElementsByTagName('value')
+        if len(values) == 1:
+            value = self._text(values[0])
+        elif len(values) > 1:
+            value = [self._text(value) for value in values]
+        elif c.hasAttribute('value'):
+            value = c.getAttribute('value')
+        if value is not None:
+            self[name] = value
+            if c.hasAttribute('xsi:type'):
+                if self._types is None:
+                    self._types = {}
+                self._types[name] = sys.intern(c.getAttribute('xsi:type'))
 
     @staticmethod
     def _text(el):
@@ -141,14 +248,18 @@ class YouTrackObject(Py3Cmp):
 
     def __repr__(self):
         _repr = ''
-        for k, v in self._data.items():
+        for k in self._names():
             if k in ('youtrack', '_attribute_types'):
                 continue
-            _repr += to_str(k) + ' = ' + to_str(v) + '\n'
+            _repr += to_str(k) + ' = ' + to_str(self[k]) + '\n'
         return _repr
 
+    def _names(self):
+        names = self._fields.names
+        return (names[i] for i, v in enumerate(self._values) if v is not _MISSING)
+
     def __iter__(self):
-        for item in self._data:
+        for item in self._names():
             if item == '_attribute_types':
                 continue
             attr = self[item]
@@ -157,13 +268,53 @@ class YouTrackObject(Py3Cmp):
                 yield item
 
     def get(self, key, default):
-        return self._data.get(key, default)
+        i = self._fields.index.get(key)
+        if i is None or i >= len(self._values):
+            return default
+        value = self._values[i]
+        return default if value is _MISSING else value
 
     def __getitem__(self, key):
-        return self._data[key]
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
 
     def __setitem__(self, key, value):
-        self._data[key] = value
+        table = self._fields
+        i = table.index.get(key)
+        if i is None:
+            i = table.position(key)
+        values = self._values
+        if i >= len(values):
+            values.extend([_MISSING] * (i + 1 - len(values)))
+        values[i] = table.intern(i, value)
+
+    def _delete(self, key):
+        i = self._fields.index.get(key)
+        if i is None or i >= len(self._values) or self._values[i] is _MISSING:
+            raise KeyError(key)
+        self._values[i] = _MISSING
+
+    def __getstate__(self):
+        # values are positional in a per-process FieldTable, so they are pickled and copied by name
+        slots = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if name not in ('_values', '_fields', '__dict__', '__weakref__') and hasattr(self, name):
+                    slots[name] = getattr(self, name)
+        return dict(self._data.items()), slots, self.__dict__
+
+    def __setstate__(self, state):
+        data, slots, attrs = state
+        self._values = []
+        self._fields = self._field_table()
+        self._types = None
+        for name, value in slots.items():
+            setattr(self, name, value)
+        self.__dict__.update(attrs)
+        for key, value in data.items():
+            self[key] = value
 
 
 class YouTrackError(YouTrackObject):
@@ -178,21 +329,11 @@ class YouTrackError(YouTrackObject):
 
 
 class Issue(YouTrackObject):
+    __slots__ = ('links', 'tags', 'attachments')
+
     def __init__(self, xml=None, youtrack=None):
         super().__init__(xml, youtrack)
         if xml is not None:
-            if len(xml.getElementsByTagName('links')) > 0:
-                self.links = [Link(e, youtrack) for e in xml.getElementsByTagName('issueLink')]
-            else:
-                self.links = None
-            if len(xml.getElementsByTagName('tag')) > 0:
-                self.tags = [self._text(e) for e in xml.getElementsByTagName('tag')]
-            else:
-                self.tags = None
-            if len(xml.getElementsByTagName('attachments')) > 0:
-                self.attachments = [Attachment(e, youtrack) for e in xml.getElementsByTagName('fileUrl')]
-            else:
-                self.attachments = None
             for m in ['fixedVersion', 'affectsVersion']:
                 self._normalize_multiple(m)
             if self.get('fixedInBuild', '') == 'Next build':
@@ -201,43 +342,78 @@ class Issue(YouTrackObject):
     def to_xml(self):
         super().to_xml()
 
+    def _update(self, xml):
+        # fields, links, tags and attachments are all collected in a single walk over the issue subtree
+        if xml is None:
+            return
+        if isinstance(xml, Document):
+            xml = xml.documentElement
+
+        self._update_from_attrs(xml)
+        found = {'links': False, 'attachments': False}
+        issue_links, tags, file_urls = [], [], []
+        for child in xml.childNodes:
+            if child.nodeType != Node.ELEMENT_NODE:
+                continue
+            values = []
+            stack = [child]
+            while stack:
+                node = stack.pop()
+                tag_name = node.tagName
+                if tag_name == 'value':
+                    if node is not child:
+                        values.append(node)
+                elif tag_name == 'issueLink':
+                    issue_links.append(node)
+                elif tag_name == 'tag':
+                    tags.append(node)
+                elif tag_name == 'fileUrl':
+                    file_urls.append(node)
+                elif tag_name in found:
+                    found[tag_name] = True
+                stack.extend(reversed([e for e in node.childNodes if e.nodeType == Node.ELEMENT_NODE]))
+            self._update_field(child, values)
+
+        self.links = [Link(e, self.youtrack) for e in issue_links] if found['links'] else None
+        self.tags = [self._text(e) for e in tags] if tags else None
+        self.attachments = [Attachment(e, self.youtrack) for e in file_urls] if found['attachments'] else None
+
     def _normalize_multiple(self, name):
-        if name in self._data:
-            attr_value = self[name]
+        attr_value = self.get(name, _MISSING)
+        if attr_value is not _MISSING:
             if not isinstance(attr_value, list):
                 if attr_value is None or not len(attr_value):
-                    self._data.pop(name)
+                    self._delete(name)
                 else:
                     attr_value = to_str(attr_value)
                     self[name] = [value.strip() for value in attr_value.split(',')]
 
     def get_reporter(self):
-        return self.youtrack.get_user(self['reporterName'])
+        return self.youtrack.identities.user(self['reporterName'])
 
     def has_assignee(self):
-        return 'Assignee' in self._data
+        return self.get('Assignee', _MISSING) is not _MISSING
 
     def get_assignee(self):
         assignee = self.get('Assignee', None)
         if assignee is None:
             return None
         elif isinstance(assignee, (list, tuple)):
-            return [self.youtrack.get_user(u) for u in assignee]
-        return self.youtrack.get_user(assignee)
+            return self.youtrack.identities.user_list(assignee)
+        return self.youtrack.identities.user(assignee)
 
     def get_updater(self):
-        return self.youtrack.get_user(self.get('updaterName', None))
+        return self.youtrack.identities.user(self.get('updaterName', None))
 
     def has_voters(self):
-        return 'voterName' in self._data
+        return self.get('voterName', _MISSING) is not _MISSING
 
     def get_voters(self):
         voters = self.get('voterName', None)
         if voters:
-            if isinstance(voters, list):
-                voters = [self.youtrack.get_user(v) for v in voters]
-            else:
-                voters = [self.youtrack.get_user(voters)]
+            if not isinstance(voters, list):
+                voters = [voters]
+            return self.youtrack.identities.user_list(voters)
         return voters
 
     def get_comments(self):
@@ -285,7 +461,7 @@ class Comment(YouTrackObject):
         super().to_xml()
 
     def get_author(self):
-        return self.youtrack.get_user(self.author)
+        return self.youtrack.identities.user(self.get('author', None))
 
 
 class IssueChange(YouTrackObject):
@@ -340,10 +516,17 @@ class ChangeField(YouTrackObject):
             self.new_value.append(self._text(value))
 
 
+def _field_property(name):
+    def fset(self, value):
+        self[name] = value
+    return property(lambda self: self.get(name, ''), fset)
+
+
 class Link(YouTrackObject):
-    type_name = ''
-    source = ''
-    target = ''
+    # views of the fields parsed from <issueLink typeName="..." source="..." target="..."/>
+    type_name = _field_property('typeName')
+    source = _field_property('source')
+    target = _field_property('target')
 
     def to_xml(self):
         super().to_xml()
@@ -373,9 +556,10 @@ class Attachment(YouTrackObject):
         return self.youtrack.get_attachment_content(self['url'])
 
     def get_author(self):
-        if self.author_login == '<no user>':
+        author = self.get('authorLogin', None)
+        if author == '<no user>':
             return None
-        return self.youtrack.get_user(self.author_login)
+        return self.youtrack.identities.user(author)
 
 
 class User(YouTrackObject):
@@ -388,13 +572,13 @@ class User(YouTrackObject):
         super().to_xml()
 
     def __hash__(self):
-        return hash(self.login)
+        return hash(self.get('login', ''))
 
     def __cmp__(self, other):
         if isinstance(other, User):
-            return cmp(self.login, other.login)
+            return cmp(self.get('login', ''), other.get('login', ''))
         else:
-            return cmp(self.login, other)
+            return cmp(self.get('login', ''), other)
 
 
 class Group(YouTrackObject):
@@ -536,16 +720,13 @@ class UserBundle(YouTrackObject):
             xml = xml.documentElement
 
         self.name = xml.getAttribute("name")
-        users = xml.getElementsByTagName("user")
-        if users is not None:
-            self.users = [self.youtrack.getUser(v.getAttribute("login")) for v in users]
-        else:
-            self.users = []
-        groups = xml.getElementsByTagName("userGroup")
-        if groups is not None:
-            self.groups = [self.youtrack.getGroup(v.getAttribute("name")) for v in groups]
-        else:
-            self.groups = []
+        # members of all bundles are shared through the connection's identity map, missing ones are requested at once
+        logins = [v.getAttribute("login") for v in xml.getElementsByTagName("user")]
+        users = self.youtrack.identities.users(logins) if logins else {}
+        self.users = [users[login] for login in logins if users[login] is not None]
+        names = [v.getAttribute("name") for v in xml.getElementsByTagName("userGroup")]
+        groups = self.youtrack.identities.groups(names) if names else {}
+        self.groups = [groups[name] for name in names if groups[name] is not None]
 
     def to_xml(self):
         result = '<userBundle name="%s">' % self.name.encode('utf-8')
@@ -561,18 +742,16 @@ class UserBundle(YouTrackObject):
         return "user"
 
     def get_all_users(self):
-        all_users = self.users
+        all_users = list(self.users)
         for group in self.groups:
-            # returns objects containing only login and url info
-            group_users = self.youtrack.get_users({'group': group.name.encode('utf-8')})
-            for user in group_users:
-                # re-request credentials separately for each user to get more details
-                try:
-                    refined_user = self.youtrack.get_user(user.login)
-                    all_users.append(refined_user)
-                except YouTrackException as e:
-                    print("Error on extracting user info for [{}] user won't be imported".format(str(user.login)))
-                    print(e)
+            # listed users only contain login and url info, details are requested for all of them at once
+            logins = [user['login'] for user in self.youtrack.iter_users({'group': group['name']})]
+            users = self.youtrack.identities.users(logins)
+            for login in logins:
+                if users[login] is None:
+                    print("Error on extracting user info for [{}] user won't be imported".format(login))
+                else:
+                    all_users.append(users[login])
         return list(set(all_users))
 
 